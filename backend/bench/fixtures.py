@@ -0,0 +1,106 @@
+# backend/bench/fixtures.py
+"""WebM/Opus audio fixtures for the load-test harness.
+
+Real MediaRecorder recordings can be used directly (see loadtest.py --fixture).
+When none are given, a fixture is synthesized here: a proper WebM container
+(EBML header, Segment, Tracks, Clusters of SimpleBlocks) whose Opus packets
+alternate between speech and silence. With opuslib + libopus installed the
+packets are real Opus encodings of a voiced test signal; otherwise they are
+shaped like VBR Opus (large packets for speech, tiny ones for silence), which
+is what the packet-size VAD keys on.
+"""
+import array
+import math
+import random
+
+try:
+    import opuslib
+except Exception:  # ImportError, or a plain Exception when libopus is missing
+    opuslib = None
+
+FRAME_MS = 20
+SAMPLE_RATE = 48000
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+UNKNOWN_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+
+
+def _size(n):
+    length = 1
+    while n >= (1 << (7 * length)) - 1:
+        length += 1
+    return (n | (1 << (7 * length))).to_bytes(length, "big")
+
+
+def _element(element_id, payload):
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big") + _size(len(payload)) + payload
+
+
+def _uint(value, length):
+    return value.to_bytes(length, "big")
+
+
+class _PacketSource:
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+        self.encoder = opuslib.Encoder(SAMPLE_RATE, 1, "voip") if opuslib else None
+        self.phase = 0
+
+    def packet(self, speech):
+        if self.encoder is None:
+            size = self.rng.randint(60, 110) if speech else self.rng.randint(2, 8)
+            # TOC 0xFC: CELT fullband, 20 ms, one frame
+            return bytes([0xFC]) + bytes(self.rng.getrandbits(8) for _ in range(size))
+        samples = array.array("h")
+        for _ in range(FRAME_SAMPLES):
+            self.phase += 1
+            if speech:
+                envelope = 0.5 + 0.5 * math.sin(self.phase * 2 * math.pi * 4 / SAMPLE_RATE)
+                value = sum(math.sin(self.phase * 2 * math.pi * f / SAMPLE_RATE) / k
+                            for k, f in enumerate((140, 280, 420, 700), start=1))
+                samples.append(int(6000 * envelope * value))
+            else:
+                samples.append(self.rng.randint(-20, 20))
+        return self.encoder.encode(samples.tobytes(), FRAME_SAMPLES)
+
+
+def build_fixture(utterances=2, speech_ms=2500, silence_ms=2000, cluster_ms=1000, seed=0):
+    """Returns (webm_bytes, chunks, speech_end_ms).
+
+    `chunks` splits the file the way MediaRecorder.start(1000) does: the first
+    chunk holds the header, each one after that a cluster of `cluster_ms`.
+    `speech_end_ms` is the audio time at which each utterance's speech ends
+    (i.e. the pause starts), used to measure pause-to-audio latency.
+    """
+    source = _PacketSource(seed)
+    timeline = []
+    for _ in range(utterances):
+        timeline += [True] * (speech_ms // FRAME_MS) + [False] * (silence_ms // FRAME_MS)
+
+    header = _element(0x1A45DFA3, _element(0x4286, _uint(1, 1)) + _element(0x4282, b"webm"))
+    header += _uint(0x18538067, 4) + UNKNOWN_SIZE
+    header += _element(0x1549A966, _element(0x2AD7B1, _uint(1000000, 3)))
+    track = (_element(0xD7, _uint(1, 1)) + _element(0x83, _uint(2, 1)) + _element(0x86, b"A_OPUS")
+             + _element(0xE1, _element(0xB5, b"\x47\x3b\x80\x00") + _element(0x9F, _uint(1, 1))))
+    header += _element(0x1654AE6B, _element(0xAE, track))
+
+    frames_per_cluster = cluster_ms // FRAME_MS
+    chunks = []
+    speech_ends = []
+    for start in range(0, len(timeline), frames_per_cluster):
+        cluster = _uint(0x1F43B675, 4) + UNKNOWN_SIZE + _element(0xE7, _uint(start * FRAME_MS, 4))
+        frames = timeline[start:start + frames_per_cluster]
+        for offset, speech in enumerate(frames):
+            block = b"\x81" + _uint(offset * FRAME_MS, 2) + b"\x80" + source.packet(speech)
+            cluster += _element(0xA3, block)
+            index = start + offset
+            if speech and (index + 1 == len(timeline) or not timeline[index + 1]):
+                speech_ends.append((index + 1) * FRAME_MS)
+        chunks.append(cluster)
+    chunks[0] = header + chunks[0]
+    return b"".join(chunks), chunks, speech_ends
+
+
+def split_recording(data, chunk_count):
+    """Splits a recorded WebM file into `chunk_count` roughly equal MediaRecorder-style chunks."""
+    size = -(-len(data) // chunk_count)
+    return [data[i:i + size] for i in range(0, len(data), size)]
@@ -0,0 +1,361 @@
+# backend/bench/loadtest.py
+"""End-to-end load test for TranslateConsumer using the fake providers.
+
+Drives N concurrent simulated WebSocket clients through the ASGI `application`
+in-process (no server, no cloud credentials) and reports:
+
+* sessions/sec completed,
+* p50/p95/p99 pause-to-audio latency (from the moment an utterance's speech
+  ends in the audio to the first translated audio reaching the client),
+* traced Python memory per session at peak,
+* event-loop lag (how late a 10 ms ticker wakes up).
+
+Usage (from backend/):
+
+    python bench/loadtest.py --clients 50 --mode buffered
+    python bench/loadtest.py --clients 50 --mode streaming --speed 4 --json results.json
+    python bench/loadtest.py --fixture recording.webm --speech-end-ms 2400,7100
+    python bench/loadtest.py --clients 50 --workers 4 --channel-layer fakeredis
+    python bench/loadtest.py --accept-codecs OGG_OPUS,MP3,LINEAR16 --audio-profile auto --link-kbps 256
+
+Audio is paced like MediaRecorder.start(1000) (one chunk per second of audio),
+divided by --speed. Without --fixture, WebM fixtures are synthesized by
+bench/fixtures.py. Clients answer pings and acknowledge audio like the browser
+does; with --link-kbps each session's downlink is simulated by delaying the
+acks as if the audio had to squeeze through a link of that bandwidth.
+"""
+import argparse
+import asyncio
+import collections
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=20, help="concurrent simulated sessions")
+    parser.add_argument("--mode", choices=("buffered", "streaming"), default="buffered")
+    parser.add_argument("--transport", choices=("json", "binary"), default="binary")
+    parser.add_argument("--incremental", action="store_true", help="request clause-level segments")
+    parser.add_argument("--text-only", action="store_true", help="request translated text without audio")
+    parser.add_argument("--target-lang", default="fr", help="target language (fake STT hears en-US)")
+    parser.add_argument("--audio-profile", help="output profile to request: a name from audio_profiles.py or 'auto'")
+    parser.add_argument("--accept-codecs", default="MP3", help="comma-separated codecs the clients can play")
+    parser.add_argument("--link-kbps", type=float, default=0, help="simulated downlink bandwidth (0: unlimited)")
+    parser.add_argument("--speed", type=float, default=1.0, help="audio pacing speed-up factor")
+    parser.add_argument("--ramp", type=float, default=1.0, help="seconds over which clients connect")
+    parser.add_argument("--utterances", type=int, default=2, help="utterances per synthesized fixture")
+    parser.add_argument("--fixture", action="append", help="recorded MediaRecorder WebM file(s)")
+    parser.add_argument("--speech-end-ms", help="comma-separated speech end times for --fixture")
+    parser.add_argument("--providers", default="{}", help="JSON FAKE_PROVIDER_OPTIONS")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="run utterances on this many in-process translation workers")
+    parser.add_argument("--channel-layer", choices=("memory", "fakeredis", "redis"), default="memory",
+                        help="channel layer between consumers and workers "
+                             "(fakeredis needs fakeredis and lupa, redis needs --redis-url)")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/0")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-session result timeout")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the application's own output")
+    return parser.parse_args()
+
+
+def configure_django(args, workdir):
+    # Everything the consumer needs, without external services
+    os.environ.setdefault("SECRET_KEY", "loadtest")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'loadtest.sqlite3')}"
+    os.environ["TRANSLATOR_PROVIDER"] = "fake"
+    os.environ["FAKE_PROVIDER_OPTIONS"] = args.providers
+    os.environ["STT_STREAMING_ENABLED"] = "True" if args.mode == "streaming" else "False"
+    os.environ["TTS_CACHE_DIR"] = ""
+    os.environ["VOICE_CATALOG_PATH"] = ""
+    os.environ["TRANSLATION_WORKERS_ENABLED"] = "True" if args.workers else "False"
+    if args.channel_layer == "redis":
+        os.environ["REDIS_URL"] = args.redis_url
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "femseek_api.settings")
+
+    from femseek_api.asgi import application
+    from django.conf import settings
+    from django.core.management import call_command
+
+    if args.channel_layer == "fakeredis":
+        # The real Redis layer, talking to an in-process stand-in server
+        from fakeredis import FakeServer
+        from fakeredis.aioredis import FakeConnection
+
+        settings.CHANNEL_LAYERS = {"default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [{"connection_class": FakeConnection, "server": FakeServer()}], "capacity": 500},
+        }}
+
+    call_command("migrate", run_syncdb=True, verbosity=0)
+    return application
+
+
+def create_users(count):
+    from users.models import User
+
+    User.objects.bulk_create([
+        User(name=f"Load {i}", email=f"load{i}@example.com", usage_purpose="loadtest", is_subscribed=True)
+        for i in range(count)
+    ])
+
+
+def load_fixtures(args):
+    from bench.fixtures import build_fixture, split_recording
+
+    if args.fixture:
+        speech_ends = [int(ms) for ms in args.speech_end_ms.split(",")] if args.speech_end_ms else None
+        fixtures = []
+        for path in args.fixture:
+            with open(path, "rb") as f:
+                data = f.read()
+            # MediaRecorder Opus runs at ~32 kbit/s, i.e. about 4 KB per one-second chunk.
+            # Without annotations, treat the end of the recording as the single pause.
+            chunks = split_recording(data, max(1, int(len(data) / 4000)))
+            fixtures.append((chunks, speech_ends or [len(chunks) * 1000]))
+        return fixtures
+    # One variant per client so the translation/TTS caches don't turn the run into a cache benchmark
+    return [build_fixture(utterances=args.utterances, seed=i)[1:] for i in range(args.clients)]
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def monitor_loop_lag(samples, stop, interval=0.01):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+async def monitor_memory(peak, stop, interval=0.1):
+    while not stop.is_set():
+        peak[0] = max(peak[0], tracemalloc.get_traced_memory()[0])
+        await asyncio.sleep(interval)
+
+
+async def run_session(application, index, fixture, args, report):
+    from channels.testing import WebsocketCommunicator
+
+    chunks, speech_ends = fixture
+    loop = asyncio.get_running_loop()
+    communicator = WebsocketCommunicator(application, "/ws/translate/")
+    connected, _ = await communicator.connect(timeout=args.timeout)
+    if not connected:
+        report["failed_sessions"] += 1
+        return
+
+    await communicator.send_json_to({
+        "type": "auth",
+        "email": f"load{index}@example.com",
+        "target_lang": args.target_lang,
+        "audio_transport": args.transport,
+        "incremental": args.incremental,
+        "text_only": args.text_only,
+        "accept_codecs": args.accept_codecs.split(","),
+        **({"audio_profile": args.audio_profile} if args.audio_profile else {}),
+    })
+    first_audio = {}  # seq -> receive time of the first audio for that utterance
+    errors = []
+    rejected = []
+    incoming = {}  # audio id -> [bytes still expected, bytes in total]; binary transport
+    link_free_at = [0.0]
+
+    async def acknowledge(audio_id, size):
+        # A serial link: this audio arrives once everything sent before it has
+        if args.link_kbps:
+            link_free_at[0] = max(link_free_at[0], loop.time()) + size * 8 / (args.link_kbps * 1000)
+            await asyncio.sleep(link_free_at[0] - loop.time())
+        await communicator.send_json_to({"type": "audio_ack", "audio_id": audio_id})
+
+    async def receive():
+        while True:
+            message = await communicator.receive_output(timeout=args.timeout + 60)
+            if message["type"] == "websocket.close":
+                return
+            if message.get("text") is None:
+                if message.get("bytes") and incoming:
+                    audio_id, remaining = next(iter(incoming.items()))
+                    remaining[0] -= len(message["bytes"])
+                    if remaining[0] <= 0:
+                        del incoming[audio_id]
+                        asyncio.create_task(acknowledge(audio_id, remaining[1]))
+                continue
+            data = json.loads(message["text"])
+            if data["type"] == "ping":
+                await communicator.send_json_to({"type": "pong", "id": data["id"]})
+            elif data["type"] in ("translation_result", "translation_segment"):
+                first_audio.setdefault(data["seq"], loop.time())
+                if "audio_id" in data:
+                    report["profiles"][data["profile"]] += 1
+                    size = len(message["text"]) + data.get("length", 0)
+                    report["audio_bytes"] += size
+                    if data.get("length"):
+                        incoming[data["audio_id"]] = [data["length"], size]
+                    else:
+                        asyncio.create_task(acknowledge(data["audio_id"], size))
+            elif data["type"] == "error":
+                errors.append(data["message"])
+            elif data["type"] == "server_busy":
+                rejected.append(data["message"])
+
+    receiver = asyncio.create_task(receive())
+    started = loop.time()
+    interval = 1.0 / args.speed
+    for i, chunk in enumerate(chunks):
+        # MediaRecorder delivers each chunk once its second of audio has been recorded
+        await asyncio.sleep(max(0.0, started + (i + 1) * interval - loop.time()))
+        if receiver.done():
+            break
+        await communicator.send_to(bytes_data=chunk)
+
+    deadline = loop.time() + args.timeout
+    while len(first_audio) < len(speech_ends) and loop.time() < deadline and not receiver.done():
+        await asyncio.sleep(0.02)
+    receiver.cancel()
+    await communicator.disconnect()
+    if rejected:
+        report["rejected_sessions"] += 1
+        return
+
+    for seq, end_ms in zip(sorted(first_audio), speech_ends):
+        pause_at = started + end_ms / 1000 / args.speed
+        report["latencies"].append(first_audio[seq] - pause_at)
+    report["missing_results"] += max(0, len(speech_ends) - len(first_audio))
+    report["errors"] += len(errors)
+    report["completed_sessions"] += 1
+
+
+def start_workers(application, count):
+    from channels.layers import get_channel_layer
+    from channels.worker import Worker
+    from django.conf import settings
+
+    return [
+        asyncio.create_task(Worker(
+            application=application,
+            channels=[settings.TRANSLATION_WORKER_CHANNEL],
+            channel_layer=get_channel_layer(),
+        ).arun())
+        for _ in range(count)
+    ]
+
+
+async def run(application, fixtures, args):
+    report = {"latencies": [], "completed_sessions": 0, "failed_sessions": 0, "rejected_sessions": 0,
+              "missing_results": 0, "errors": 0, "audio_bytes": 0, "profiles": collections.Counter()}
+    lag_samples = []
+    peak_memory = [0]
+    stop = asyncio.Event()
+    monitors = [
+        asyncio.create_task(monitor_loop_lag(lag_samples, stop)),
+        asyncio.create_task(monitor_memory(peak_memory, stop)),
+    ]
+    workers = start_workers(application, args.workers)
+
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+
+    async def staggered(index):
+        await asyncio.sleep(args.ramp * index / max(1, args.clients))
+        await run_session(application, index, fixtures[index % len(fixtures)], args, report)
+
+    await asyncio.gather(*(staggered(i) for i in range(args.clients)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*monitors)
+    for worker in workers:
+        worker.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+
+    latencies_ms = [value * 1000 for value in report["latencies"]]
+    lag_ms = [value * 1000 for value in lag_samples]
+    return {
+        "clients": args.clients,
+        "mode": args.mode,
+        "transport": args.transport,
+        "incremental": args.incremental,
+        "speed": args.speed,
+        "workers": args.workers,
+        "channel_layer": args.channel_layer,
+        "elapsed_s": round(elapsed, 2),
+        "sessions_per_s": round(report["completed_sessions"] / elapsed, 2),
+        "completed_sessions": report["completed_sessions"],
+        "failed_sessions": report["failed_sessions"],
+        "rejected_sessions": report["rejected_sessions"],
+        "utterances": len(latencies_ms),
+        "missing_results": report["missing_results"],
+        "errors": report["errors"],
+        "audio_kb": round(report["audio_bytes"] / 1024, 1),
+        "audio_profiles": dict(report["profiles"]),
+        "pause_to_audio_ms": {
+            "p50": percentile(latencies_ms, 50),
+            "p95": percentile(latencies_ms, 95),
+            "p99": percentile(latencies_ms, 99),
+            "mean": statistics.fmean(latencies_ms) if latencies_ms else None,
+        },
+        "memory_per_session_kb": round((peak_memory[0] - baseline) / 1024 / max(1, args.clients), 1),
+        "event_loop_lag_ms": {
+            "p50": percentile(lag_ms, 50),
+            "p99": percentile(lag_ms, 99),
+            "max": max(lag_ms) if lag_ms else None,
+        },
+    }
+
+
+def print_report(result):
+    def fmt(value):
+        return "-" if value is None else f"{value:.1f}"
+
+    latency = result["pause_to_audio_ms"]
+    lag = result["event_loop_lag_ms"]
+    print(f"\nFemseek load test: {result['clients']} clients, {result['mode']} STT, "
+          f"{result['transport']} audio{', incremental' if result['incremental'] else ''}, x{result['speed']}"
+          + (f", {result['workers']} workers over {result['channel_layer']}" if result['workers'] else ""))
+    print(f"  sessions/sec           {result['sessions_per_s']:.2f} "
+          f"({result['completed_sessions']} ok, {result['failed_sessions']} failed, "
+          f"{result['rejected_sessions']} rejected in {result['elapsed_s']}s)")
+    print(f"  utterances             {result['utterances']} "
+          f"({result['missing_results']} without audio, {result['errors']} errors)")
+    profiles = ", ".join(f"{name} x{count}" for name, count in sorted(result["audio_profiles"].items()))
+    print(f"  audio received         {result['audio_kb']} KiB ({profiles or 'none'})")
+    print(f"  pause-to-audio ms      p50 {fmt(latency['p50'])}  p95 {fmt(latency['p95'])}  p99 {fmt(latency['p99'])}")
+    print(f"  memory/session         {result['memory_per_session_kb']} KiB")
+    print(f"  event-loop lag ms      p50 {fmt(lag['p50'])}  p99 {fmt(lag['p99'])}  max {fmt(lag['max'])}")
+
+
+def main():
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as workdir:
+        application = configure_django(args, workdir)
+        create_users(args.clients)
+        fixtures = load_fixtures(args)
+        output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+        with output:
+            tracemalloc.start()
+            result = asyncio.run(run(application, fixtures, args))
+            tracemalloc.stop()
+    print_report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# backend/bench/paystack_stub.py
+"""Local stand-in for the Paystack transaction API, for testing payments offline.
+
+    python bench/paystack_stub.py --port 8765 --email you@example.com
+    PAYSTACK_BASE_URL=http://127.0.0.1:8765 PAYSTACK_SECRET_KEY=sk_test_stub daphne ...
+
+GET /transaction/verify/<reference> answers like Paystack: references starting
+with 'failed-' or 'pending-' come back failed or ongoing, 'missing-' ones are
+unknown, and everything else is a successful charge by --email. `webhook()`
+builds a signed charge.success event to POST to /payments/paystack/webhook/.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "/transaction/verify/"
+
+
+def transaction(reference, email, status="success", amount=500000):
+    return {
+        "reference": reference,
+        "status": status,
+        "amount": amount,
+        "currency": "NGN",
+        "gateway_response": "Approved" if status == "success" else "Declined",
+        "customer": {"email": email},
+    }
+
+
+def webhook(secret_key, reference, email):
+    """Returns the body and X-Paystack-Signature of a charge.success event."""
+    body = json.dumps({"event": "charge.success", "data": transaction(reference, email)}).encode()
+    return body, hmac.new(secret_key.encode(), body, hashlib.sha512).hexdigest()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, email, latency_ms=0, secret_key="sk_test_stub"):
+        super().__init__(address, StubHandler)
+        self.email = email
+        self.latency = latency_ms / 1000
+        self.secret_key = secret_key
+        self.requests = 0
+        self.connections = 0
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled clients reuse connections
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.requests += 1
+        if self.headers.get("Authorization") != f"Bearer {self.server.secret_key}":
+            return self.reply(401, {"status": False, "message": "Invalid key"})
+        if not self.path.startswith(PREFIX):
+            return self.reply(404, {"status": False, "message": "Not found"})
+        time.sleep(self.server.latency)
+        reference = self.path[len(PREFIX):]
+        if reference.startswith("missing-"):
+            return self.reply(400, {"status": False, "message": "Transaction reference not found"})
+        status = "success"
+        if reference.startswith("failed-"):
+            status = "failed"
+        elif reference.startswith("pending-"):
+            status = "ongoing"
+        self.reply(200, {
+            "status": True,
+            "message": "Verification successful",
+            "data": transaction(reference, self.server.email, status),
+        })
+
+    def reply(self, code, body):
+        payload = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--email", default="loadtest0@example.com", help="customer email of successful charges")
+    parser.add_argument("--secret-key", default="sk_test_stub", help="expected PAYSTACK_SECRET_KEY")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    args = parser.parse_args()
+    server = StubServer((args.host, args.port), args.email, args.latency_ms, args.secret_key)
+    print(f"Paystack stub listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
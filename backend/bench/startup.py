@@ -0,0 +1,180 @@
+# backend/bench/startup.py
+"""Startup benchmark: how long a fresh worker takes until it can serve a session.
+
+Boots the application in a new Python process per run and times each phase:
+
+* interpreter: starting Python up to the first line of the benchmark,
+* settings: importing femseek_api.settings,
+* django_setup: loading the apps and models,
+* asgi_app: importing femseek_api.asgi (routing, consumers, workers),
+* ready: the ASGI lifespan startup, i.e. until /ready/ would answer 200,
+* first_session: connecting and authenticating the first WebSocket client.
+
+It also lists which heavy SDKs were already imported once the ASGI app was
+loaded; those should only show up during the warm-up.
+
+Usage (from backend/):
+
+    python bench/startup.py --runs 5
+    python bench/startup.py --provider google --runs 3 --json startup.json
+
+The default fake providers need no credentials and measure the application's
+own overhead; --provider google uses the real clients and needs credentials.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASES = ("interpreter", "settings", "django_setup", "asgi_app", "ready", "first_session")
+HEAVY_MODULES = ("google.cloud.speech", "google.cloud.texttospeech", "google.cloud.translate_v2", "grpc", "httpx")
+EMAIL = "startup@example.com"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes to boot")
+    parser.add_argument("--provider", choices=("fake", "google"), default="fake")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the application's own output")
+    parser.add_argument("--child", choices=("prepare", "boot"), help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def environment(args, workdir):
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "startup")
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'startup.sqlite3')}"
+    env["TRANSLATOR_PROVIDER"] = args.provider
+    env["TTS_CACHE_DIR"] = ""
+    env["VOICE_CATALOG_PATH"] = ""
+    env["DJANGO_SETTINGS_MODULE"] = "femseek_api.settings"
+    env["PYTHONPATH"] = BACKEND_DIR
+    return env
+
+
+# --- Child process ---
+
+def prepare():
+    import django
+    from django.core.management import call_command
+
+    django.setup()
+    call_command("migrate", run_syncdb=True, verbosity=0)
+    from users.models import User
+    User.objects.create(name="Startup", email=EMAIL, usage_purpose="startup", is_subscribed=True)
+
+
+async def start_and_connect(application, phases):
+    from channels.testing import ApplicationCommunicator, WebsocketCommunicator
+
+    started = time.perf_counter()
+    lifespan = ApplicationCommunicator(application, {"type": "lifespan"})
+    await lifespan.send_input({"type": "lifespan.startup"})
+    await lifespan.receive_output(timeout=120)
+    phases["ready"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    communicator = WebsocketCommunicator(application, "/ws/translate/")
+    await communicator.connect(timeout=30)
+    await communicator.send_json_to({"type": "auth", "email": EMAIL, "target_lang": "fr"})
+    while (await communicator.receive_json_from(timeout=30))["type"] != "auth_success":
+        pass
+    phases["first_session"] = time.perf_counter() - started
+    await communicator.disconnect()
+
+    await lifespan.send_input({"type": "lifespan.shutdown"})
+    await lifespan.receive_output(timeout=30)
+
+
+def boot(spawned_at):
+    phases = {"interpreter": time.time() - spawned_at}
+
+    started = time.perf_counter()
+    from django.conf import settings
+    settings.INSTALLED_APPS  # Imports the settings module
+    phases["settings"] = time.perf_counter() - started
+
+    import django
+    started = time.perf_counter()
+    django.setup()
+    phases["django_setup"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    from femseek_api.asgi import application
+    phases["asgi_app"] = time.perf_counter() - started
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    asyncio.run(start_and_connect(application, phases))
+    return {"phases": phases, "loaded_at_import": loaded}
+
+
+# --- Parent process ---
+
+def run_child(args, env, mode):
+    command = [sys.executable, os.path.abspath(__file__), "--child", mode]
+    env = dict(env, STARTUP_SPAWNED_AT=repr(time.time()))
+    completed = subprocess.run(command, env=env, cwd=BACKEND_DIR, capture_output=True, text=True)
+    if args.verbose or completed.returncode:
+        sys.stderr.write(completed.stdout + completed.stderr)
+    if completed.returncode:
+        raise SystemExit(f"{mode} run failed with exit code {completed.returncode}")
+    return completed.stdout.strip().splitlines()[-1] if completed.stdout.strip() else None
+
+
+def run(args):
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        env = environment(args, workdir)
+        run_child(args, env, "prepare")
+        for _ in range(args.runs):
+            runs.append(json.loads(run_child(args, env, "boot")))
+
+    phases = {}
+    for phase in PHASES:
+        values = [r["phases"][phase] * 1000 for r in runs if phase in r["phases"]]
+        phases[phase] = {"p50": round(statistics.median(values), 1), "max": round(max(values), 1)}
+    totals = [sum(r["phases"].values()) * 1000 for r in runs]
+    return {
+        "provider": args.provider,
+        "runs": args.runs,
+        "phases_ms": phases,
+        "total_ms": {"p50": round(statistics.median(totals), 1), "max": round(max(totals), 1)},
+        "loaded_at_import": sorted({name for r in runs for name in r["loaded_at_import"]}),
+    }
+
+
+def print_report(result):
+    print(f"Startup: {result['runs']} runs, {result['provider']} providers")
+    for phase, values in result["phases_ms"].items():
+        print(f"  {phase:<22} p50 {values['p50']:>8.1f} ms  max {values['max']:>8.1f} ms")
+    print(f"  {'total':<22} p50 {result['total_ms']['p50']:>8.1f} ms  max {result['total_ms']['max']:>8.1f} ms")
+    print(f"  SDKs loaded at import  {', '.join(result['loaded_at_import']) or 'none'}")
+
+
+def main():
+    args = parse_args()
+    if args.child == "prepare":
+        prepare()
+        return
+    if args.child == "boot":
+        spawned_at = float(os.environ["STARTUP_SPAWNED_AT"])
+        result = boot(spawned_at)
+        sys.stdout.flush()
+        print(json.dumps(result))
+        return
+    result = run(args)
+    print_report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 # backend/femseek_api/asgi.py
 import os
+import time
 import django
 from django.core.asgi import get_asgi_application
 
@@ -7,21 +8,36 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'femseek_api.settings')
 
 # This is the crucial line that fixes the AppRegistryNotReady error
+started = time.perf_counter()
 django.setup()
+setup_done = time.perf_counter()
 
 # Now it's safe to import other parts of the application
-from channels.routing import ProtocolTypeRouter, URLRouter
+from channels.routing import ChannelNameRouter, ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
+from django.conf import settings
 import translator.routing
+from translator.lifespan import LifespanApp
+from translator.readiness import readiness
+from translator.workers import TranslationWorkerConsumer
 
 # get_asgi_application() should be called after setup
 http_application = get_asgi_application()
 
 application = ProtocolTypeRouter({
     "http": http_application,
+    "lifespan": LifespanApp(),
     "websocket": AuthMiddlewareStack(
         URLRouter(
             translator.routing.websocket_urlpatterns
         )
     ),
+    # Background translation workers: `python manage.py runworker translation-worker`
+    "channel": ChannelNameRouter({
+        settings.TRANSLATION_WORKER_CHANNEL: TranslationWorkerConsumer.as_asgi(),
+    }),
 })
+
+# Boot phases before the event loop runs; /ready/ and /metrics/ report them with the warm-up
+readiness.record('django_setup', setup_done - started)
+readiness.record('asgi_app', time.perf_counter() - setup_done)
@@ -3,8 +3,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 import dj_database_url # Add this import
-import base64 # Added for Google Cloud credentials
-import json # Added for Google Cloud credentials
+import json
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -48,7 +47,7 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware', # Ensure this is placed high
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsfRMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -117,15 +116,30 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# Channels settings for In-Memory Layer (No Redis)
-# !!! WARNING: This is NOT suitable for multi-process/multi-server deployments
+# Channels settings: Redis when REDIS_URL is set, otherwise the In-Memory Layer
+# !!! WARNING: The in-memory layer is NOT suitable for multi-process/multi-server deployments
 # !!! Render often scales to multiple instances, which will break WebSocket communication
-# !!! unless you manually ensure only one instance is running for WebSockets.
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer"
-    },
-}
+# !!! unless REDIS_URL points all of them at the same Redis.
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    # Shared layer for multi-process/multi-node deployments and translation workers
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {
+                "hosts": [REDIS_URL],
+                # Binary audio goes out as several frames per utterance
+                "capacity": int(os.getenv('CHANNEL_LAYER_CAPACITY', '500')),
+                "expiry": 30,
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer"
+        },
+    }
 
 # CORS Headers settings
 CORS_ALLOW_ALL_ORIGINS = True # Be more restrictive in production by specifying origins
@@ -134,29 +148,146 @@ CORS_ALLOW_ALL_ORIGINS = True # Be more restrictive in production by specifying
 #     "http://localhost:3000", # For local development
 # ]
 
-# Make sure your Google Cloud credentials environment variable is set
-# This is read automatically by the Google Cloud libraries
-# Handle Google Cloud Credentials
-# For Render deployment, decode the base64-encoded JSON key
-google_credentials_base64 = os.getenv('GOOGLE_APPLICATION_CREDENTIALS_JSON_BASE64')
-if google_credentials_base64:
-    try:
-        decoded_credentials = base64.b64decode(google_credentials_base64).decode('utf-8')
-        credentials_path = BASE_DIR / 'google-credentials.json'
-        with open(credentials_path, 'w') as f:
-            f.write(decoded_credentials)
-        os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = str(credentials_path)
-        print("Google Cloud credentials loaded from environment variable.")
-    except Exception as e:
-        print(f"Error decoding Google Cloud credentials: {e}")
-        # Fallback or raise error if critical
-else:
-    # For local development or if using a direct file path
-    # Ensure GOOGLE_APPLICATION_CREDENTIALS is set in your local .env or system
-    if os.getenv('GOOGLE_APPLICATION_CREDENTIALS'):
-        print("Google Cloud credentials path found in environment variable.")
-    else:
-        print("Warning: GOOGLE_APPLICATION_CREDENTIALS not found. Google Cloud APIs might fail.")
+# Google Cloud credentials: either GOOGLE_APPLICATION_CREDENTIALS (a key file path, read
+# by the Google libraries), or, on Render, the base64-encoded JSON key, which is written
+# to GOOGLE_CREDENTIALS_FILE once, when the first Google client is created
+# (see translator/credentials.py).
+GOOGLE_CREDENTIALS_BASE64 = os.getenv('GOOGLE_APPLICATION_CREDENTIALS_JSON_BASE64') or None
+GOOGLE_CREDENTIALS_FILE = os.getenv('GOOGLE_CREDENTIALS_FILE') or str(BASE_DIR / 'google-credentials.json')
 
 # Make Paystack secret key available
 PAYSTACK_SECRET_KEY = os.getenv('PAYSTACK_SECRET_KEY')
+# Point PAYSTACK_BASE_URL at a local stub server to test payments offline
+PAYSTACK_BASE_URL = os.getenv('PAYSTACK_BASE_URL', 'https://api.paystack.co')
+PAYSTACK_TIMEOUT = float(os.getenv('PAYSTACK_TIMEOUT', '10'))
+PAYSTACK_MAX_CONNECTIONS = int(os.getenv('PAYSTACK_MAX_CONNECTIONS', '20'))
+
+# --- Translator pipeline ---
+# Stream audio frames to Speech-to-Text as they arrive instead of buffering a whole
+# utterance and recognizing it after the pause. Off by default; set to 'True' to opt in.
+STT_STREAMING_ENABLED = os.getenv('STT_STREAMING_ENABLED', 'False') == 'True'
+
+# TTS output profiles (see translator/audio_profiles.py): with audio_profile 'auto', pick
+# the best profile expected to deliver a typical utterance within this many ms, measuring
+# the round-trip time every AUDIO_PROFILE_PING_SECONDS.
+AUDIO_PROFILE_TARGET_MS = int(os.getenv('AUDIO_PROFILE_TARGET_MS', '400'))
+AUDIO_PROFILE_PING_SECONDS = float(os.getenv('AUDIO_PROFILE_PING_SECONDS', '10'))
+
+# Voice activity detection (buffered mode): finalize an utterance after this much real
+# silence, and never let a single utterance grow past the maximum length.
+VAD_SILENCE_MS = int(os.getenv('VAD_SILENCE_MS', '1500'))
+VAD_MAX_UTTERANCE_MS = int(os.getenv('VAD_MAX_UTTERANCE_MS', '15000'))
+
+# Utterance pipeline: how many finalized utterances a connection may have in flight, and
+# what to do when another one arrives ('drop_oldest' or 'drop_newest').
+PIPELINE_MAX_DEPTH = int(os.getenv('PIPELINE_MAX_DEPTH', '3'))
+PIPELINE_OVERFLOW = os.getenv('PIPELINE_OVERFLOW', 'drop_oldest')
+
+# Shared Google Cloud clients: clients per kind in each worker's pool, and whether to
+# open their channels at startup instead of on the first utterance.
+GOOGLE_CLIENT_POOL_SIZE = int(os.getenv('GOOGLE_CLIENT_POOL_SIZE', '2'))
+GOOGLE_CLIENT_WARMUP = os.getenv('GOOGLE_CLIENT_WARMUP', 'True') == 'True'
+
+# Translation cache: bounded in-process LRU with TTL, plus an optional shared tier that
+# names one of the CACHES aliases below (e.g. 'shared') so all workers reuse results.
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv('TRANSLATION_CACHE_MAX_ENTRIES', '10000'))
+TRANSLATION_CACHE_TTL = int(os.getenv('TRANSLATION_CACHE_TTL', str(24 * 3600)))
+TRANSLATION_CACHE_SHARED_ALIAS = os.getenv('TRANSLATION_CACHE_SHARED_ALIAS') or None
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+if os.getenv('SHARED_CACHE_URL'):
+    # e.g. redis://host:6379/1 (Django >= 4.0 ships the Redis backend)
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('SHARED_CACHE_URL'),
+    }
+elif os.getenv('SHARED_CACHE_DIR'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('SHARED_CACHE_DIR'),
+    }
+
+# User lookups by email (signup and WebSocket auth): in-process LRU with a short TTL,
+# plus an optional shared tier naming one of the CACHES aliases.
+USER_CACHE_MAX_ENTRIES = int(os.getenv('USER_CACHE_MAX_ENTRIES', '10000'))
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '60'))
+USER_CACHE_SHARED_ALIAS = os.getenv('USER_CACHE_SHARED_ALIAS') or None
+
+# Synthesized speech cache: memory tier and size-bounded on-disk tier (set TTS_CACHE_DIR
+# to an empty value to disable the disk tier).
+TTS_CACHE_MEMORY_BYTES = int(os.getenv('TTS_CACHE_MEMORY_BYTES', str(32 * 1024 * 1024)))
+TTS_CACHE_DIR = os.getenv('TTS_CACHE_DIR', str(BASE_DIR / 'tts_cache')) or None
+TTS_CACHE_DISK_BYTES = int(os.getenv('TTS_CACHE_DISK_BYTES', str(512 * 1024 * 1024)))
+
+# TTS voice catalog: listed once, kept on disk across restarts (empty path disables the
+# disk copy) and refreshed in the background after VOICE_CATALOG_REFRESH seconds.
+VOICE_CATALOG_PATH = os.getenv('VOICE_CATALOG_PATH', str(BASE_DIR / 'voice_catalog.json')) or None
+VOICE_CATALOG_REFRESH = int(os.getenv('VOICE_CATALOG_REFRESH', str(24 * 60 * 60)))
+
+# Size of each raw audio frame when the client negotiated the binary audio transport
+AUDIO_FRAME_BYTES = int(os.getenv('AUDIO_FRAME_BYTES', str(16 * 1024)))
+
+# Primary Speech-to-Text language until a session's source language is known
+DEFAULT_SOURCE_LANG = os.getenv('DEFAULT_SOURCE_LANG', 'en')
+
+# Clause-level translation + TTS for clients that ask for it ('incremental': true), so the
+# first clause can play while later ones are still being synthesized.
+INCREMENTAL_SYNTHESIS_ENABLED = os.getenv('INCREMENTAL_SYNTHESIS_ENABLED', 'True') == 'True'
+INCREMENTAL_MIN_CLAUSE_CHARS = int(os.getenv('INCREMENTAL_MIN_CLAUSE_CHARS', '25'))
+
+# Translation micro-batching across sessions: wait up to the window for more requests to
+# the same language, never put more than the max size in one call.
+TRANSLATION_BATCH_WINDOW_MS = float(os.getenv('TRANSLATION_BATCH_WINDOW_MS', '5'))
+TRANSLATION_BATCH_MAX_SIZE = int(os.getenv('TRANSLATION_BATCH_MAX_SIZE', '32'))
+TRANSLATION_EXECUTOR_WORKERS = int(os.getenv('TRANSLATION_EXECUTOR_WORKERS', '8'))
+
+# Upstream API providers: 'google' for production, 'fake' for deterministic local stand-ins
+# (see translator/fakes.py) configured by a JSON object in FAKE_PROVIDER_OPTIONS.
+TRANSLATOR_PROVIDER = os.getenv('TRANSLATOR_PROVIDER', 'google')
+FAKE_PROVIDER_OPTIONS = json.loads(os.getenv('FAKE_PROVIDER_OPTIONS', '{}'))
+
+# Trial usage is counted in memory and written to the database in batches this often (seconds)
+USAGE_FLUSH_INTERVAL = float(os.getenv('USAGE_FLUSH_INTERVAL', '2.0'))
+
+# --- Upstream API scheduling ---
+# Per-API concurrency and rate budgets, as JSON overriding the defaults in
+# translator/scheduler.py, e.g. {"tts": {"concurrency": 16, "rate": 20, "burst": 40}}
+API_LIMITS = json.loads(os.getenv('API_LIMITS', '{}'))
+# Per-user budget for upstream calls (calls per second and burst size); 0 disables
+USER_CALL_RATE = float(os.getenv('USER_CALL_RATE', '5'))
+USER_CALL_BURST = int(os.getenv('USER_CALL_BURST', '15'))
+# Utterances whose upstream calls are still queued this long after finalization are
+# dropped rather than translated late; 0 disables
+UTTERANCE_DEADLINE_MS = int(os.getenv('UTTERANCE_DEADLINE_MS', '8000'))
+
+# --- Memory limits ---
+# Per session: captured audio is capped at AUDIO_BUFFER_MAX_BYTES. On overflow the buffer
+# is either sent off as an utterance ('finalize') or trimmed by whole WebM clusters from
+# the front ('drop_oldest'). Streaming STT that falls this far behind is restarted.
+AUDIO_BUFFER_MAX_BYTES = int(os.getenv('AUDIO_BUFFER_MAX_BYTES', str(1024 * 1024)))
+AUDIO_BUFFER_OVERFLOW = os.getenv('AUDIO_BUFFER_OVERFLOW', 'finalize')
+# Per worker process: new connections wait up to ADMISSION_WAIT_SECONDS for a slot, then
+# are turned away. 0 disables a limit.
+MAX_SESSIONS_PER_WORKER = int(os.getenv('MAX_SESSIONS_PER_WORKER', '200'))
+MAX_BUFFERED_BYTES_PER_WORKER = int(os.getenv('MAX_BUFFERED_BYTES_PER_WORKER', str(256 * 1024 * 1024)))
+ADMISSION_WAIT_SECONDS = float(os.getenv('ADMISSION_WAIT_SECONDS', '5'))
+
+# --- Metrics ---
+# Utterances slower than this (finalization to last result, in ms) are logged with
+# their per-stage breakdown to the 'femseek.slow_utterances' logger; 0 disables.
+SLOW_UTTERANCE_MS = int(os.getenv('SLOW_UTTERANCE_MS', '2000'))
+# If set, /metrics/ requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# --- Translation workers ---
+# Run STT/translation/TTS in `python manage.py runworker translation-worker` processes
+# instead of the WebSocket process. Needs a shared channel layer (REDIS_URL) unless the
+# workers run in the same process (e.g. bench/loadtest.py --workers).
+TRANSLATION_WORKERS_ENABLED = os.getenv('TRANSLATION_WORKERS_ENABLED', 'False') == 'True'
+TRANSLATION_WORKER_CHANNEL = os.getenv('TRANSLATION_WORKER_CHANNEL', 'translation-worker')
+TRANSLATION_WORKER_CONCURRENCY = int(os.getenv('TRANSLATION_WORKER_CONCURRENCY', '32'))
+TRANSLATION_WORKER_TIMEOUT = float(os.getenv('TRANSLATION_WORKER_TIMEOUT', '30'))
@@ -1,7 +1,12 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from translator.views import metrics_view, paystack_webhook, ready_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('users/', include('users.urls')),
+    path('metrics/', metrics_view),
+    path('ready/', ready_view),
+    path('payments/paystack/webhook/', paystack_webhook),
 ]
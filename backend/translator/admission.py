@@ -0,0 +1,72 @@
+# backend/translator/admission.py
+"""Per-worker admission control for WebSocket sessions.
+
+Every session holds audio in memory (its capture buffer, queued streaming
+frames and utterances waiting for STT). Rather than letting all sessions slow
+down together when a worker is overloaded, new connections are only admitted
+while the worker is below MAX_SESSIONS_PER_WORKER and its sessions together
+hold less than MAX_BUFFERED_BYTES_PER_WORKER; otherwise they wait for a slot
+for a few seconds and are then turned away with a clear message.
+"""
+import asyncio
+
+from django.conf import settings
+
+
+class AdmissionController:
+    def __init__(self, max_sessions=0, max_buffered_bytes=0, poll_interval=0.1):
+        self.max_sessions = max_sessions  # 0 means unlimited
+        self.max_buffered_bytes = max_buffered_bytes
+        self.poll_interval = poll_interval
+        self.sessions = set()
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def buffered_bytes(self):
+        return sum(session.buffered_bytes() for session in self.sessions)
+
+    def has_room(self):
+        if self.max_sessions and len(self.sessions) >= self.max_sessions:
+            return False
+        if self.max_buffered_bytes and self.buffered_bytes() >= self.max_buffered_bytes:
+            return False
+        return True
+
+    async def admit(self, session, wait=0):
+        """Admits `session` as soon as there is room; returns False if none frees up within `wait` seconds."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        self.waiting += 1
+        try:
+            while not self.has_room():
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.rejected += 1
+                    return False
+                await asyncio.sleep(min(remaining, self.poll_interval))
+        finally:
+            self.waiting -= 1
+        self.sessions.add(session)
+        self.admitted += 1
+        return True
+
+    def release(self, session):
+        self.sessions.discard(session)
+
+    def stats(self):
+        return {
+            'active': len(self.sessions),
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'buffered_audio_bytes': self.buffered_bytes(),
+            'max_sessions': self.max_sessions,
+            'max_buffered_bytes': self.max_buffered_bytes,
+        }
+
+
+admission = AdmissionController(
+    max_sessions=settings.MAX_SESSIONS_PER_WORKER,
+    max_buffered_bytes=settings.MAX_BUFFERED_BYTES_PER_WORKER,
+)
@@ -0,0 +1,156 @@
+# backend/translator/audio_profiles.py
+"""TTS output profiles and per-connection link estimation.
+
+Synthesized speech used to be MP3 at Google's default quality for everyone. On
+the mobile networks many users are on, that audio is most of the bytes on the
+wire and most of the time to playback. A client can now ask for a profile in
+its auth/config message, either by name or as
+{"codec": "OGG_OPUS", "sample_rate_hertz": 16000, "bitrate_kbps": 24}, or ask
+for "auto": the server then measures the connection (ping/pong round trips and
+how long acknowledged audio took to arrive) and picks the best profile that
+still arrives within AUDIO_PROFILE_TARGET_MS.
+
+Google TTS doesn't take a bitrate; each profile's bitrate_kbps is what that
+encoding and sample rate typically come out at, used to compare profiles and
+to budget the link.
+"""
+import itertools
+import time
+from collections import deque, namedtuple
+
+from django.conf import settings
+
+from . import metrics
+
+AudioProfile = namedtuple("AudioProfile", ["name", "encoding", "sample_rate_hertz", "bitrate_kbps", "mime_type"])
+
+# Most efficient codec first (Opus, then MP3, then uncompressed LINEAR16, which is only
+# used when a client can't play anything compressed), best quality first within a codec.
+# Auto selection walks down the list until a profile fits the link.
+PROFILES = (
+    AudioProfile('opus_24k', 'OGG_OPUS', 24000, 32, 'audio/ogg; codecs=opus'),
+    AudioProfile('opus_16k', 'OGG_OPUS', 16000, 24, 'audio/ogg; codecs=opus'),
+    AudioProfile('opus_8k', 'OGG_OPUS', 8000, 12, 'audio/ogg; codecs=opus'),
+    AudioProfile('mp3_24k', 'MP3', 24000, 32, 'audio/mpeg'),
+    AudioProfile('linear16_24k', 'LINEAR16', 24000, 384, 'audio/wav'),
+    AudioProfile('linear16_16k', 'LINEAR16', 16000, 256, 'audio/wav'),
+)
+PROFILES_BY_NAME = {profile.name: profile for profile in PROFILES}
+CODECS = ('OGG_OPUS', 'MP3', 'LINEAR16')
+
+# What every client can play (the original output format)
+DEFAULT_PROFILE = PROFILES_BY_NAME['mp3_24k']
+DEFAULT_CODECS = ('MP3',)
+
+# Length of a typical translated utterance, for budgeting its delivery time
+TYPICAL_AUDIO_SECONDS = 3.0
+
+
+def estimated_bitrate_kbps(encoding, sample_rate_hertz):
+    """Typical bitrate of synthesized speech in this encoding and sample rate."""
+    for profile in PROFILES:
+        if (profile.encoding, profile.sample_rate_hertz) == (encoding, sample_rate_hertz):
+            return profile.bitrate_kbps
+    if encoding == 'LINEAR16':
+        return sample_rate_hertz * 16 // 1000
+    return DEFAULT_PROFILE.bitrate_kbps
+
+
+def accepted_codecs(codecs):
+    """The supported codecs among a client's `accept_codecs` list."""
+    accepted = tuple(codec for codec in codecs or () if codec in CODECS)
+    return accepted or DEFAULT_CODECS
+
+
+def match_profile(request, codecs=CODECS):
+    """Closest catalog profile to an explicit request (a name or a codec/rate/bitrate dict)."""
+    if isinstance(request, str):
+        profile = PROFILES_BY_NAME.get(request)
+        if profile is None:
+            raise ValueError(f"Unknown audio profile: {request}")
+        return profile
+    codec = request.get('codec')
+    if codec is not None and codec not in CODECS:
+        raise ValueError(f"Unsupported codec: {codec}")
+    candidates = [profile for profile in PROFILES if profile.encoding == (codec or profile.encoding)]
+    if codec is None:
+        candidates = [profile for profile in candidates if profile.encoding in codecs] or candidates
+    if request.get('bitrate_kbps'):
+        within = [profile for profile in candidates if profile.bitrate_kbps <= request['bitrate_kbps']]
+        candidates = within or [min(candidates, key=lambda profile: profile.bitrate_kbps)]
+    if request.get('sample_rate_hertz'):
+        rate = int(request['sample_rate_hertz'])
+        return min(candidates, key=lambda profile: abs(profile.sample_rate_hertz - rate))
+    return candidates[0]
+
+
+class LinkEstimator:
+    """Round-trip time and delivery throughput of one WebSocket connection (EWMAs)."""
+
+    def __init__(self, alpha=0.3):
+        self.alpha = alpha
+        self.rtt = None  # seconds
+        self.throughput = None  # bytes per second
+        self._pings = {}  # ping id -> send time
+        self._ping_ids = itertools.count(1)
+        self._audio = {}  # audio id -> (send time, bytes, profile name)
+        self._recent = deque(maxlen=32)  # ids of audio awaiting an ack, oldest first
+
+    def _update(self, current, sample):
+        return sample if current is None else current + self.alpha * (sample - current)
+
+    def ping(self):
+        """Returns the id of a new ping to send."""
+        ping_id = next(self._ping_ids)
+        self._pings[ping_id] = time.perf_counter()
+        if len(self._pings) > 8:
+            self._pings.pop(min(self._pings))
+        return ping_id
+
+    def pong(self, ping_id):
+        sent = self._pings.pop(ping_id, None)
+        if sent is not None:
+            self.rtt = self._update(self.rtt, time.perf_counter() - sent)
+
+    def audio_sent(self, audio_id, size, profile):
+        metrics.audio_bytes_sent.inc(size, profile=profile)
+        if len(self._recent) == self._recent.maxlen:
+            self._audio.pop(self._recent[0], None)
+        self._recent.append(audio_id)
+        self._audio[audio_id] = (time.perf_counter(), size, profile)
+
+    def audio_ack(self, audio_id):
+        entry = self._audio.pop(audio_id, None)
+        if entry is None:
+            return
+        sent, size, profile = entry
+        elapsed = time.perf_counter() - sent
+        metrics.audio_delivery_seconds.observe(elapsed, profile=profile)
+        # The ack's own trip back takes about half a round trip
+        transfer = max(elapsed - (self.rtt or 0) / 2, 0.001)
+        self.throughput = self._update(self.throughput, size / transfer)
+
+    def delivery_seconds(self, profile):
+        """Expected time for a typical utterance in `profile` to reach the client."""
+        size = profile.bitrate_kbps * 1000 / 8 * TYPICAL_AUDIO_SECONDS
+        return (self.rtt or 0) / 2 + size / self.throughput
+
+    def choose(self, codecs, current=None):
+        """Best profile in `codecs` that arrives within the target; None until the link was measured."""
+        if self.throughput is None:
+            return None
+        target = settings.AUDIO_PROFILE_TARGET_MS / 1000
+        candidates = [profile for profile in PROFILES if profile.encoding in codecs]
+        for profile in candidates:
+            # Hysteresis: only move up to a bigger profile with some room to spare
+            budget = target if current is None or profile.bitrate_kbps <= current.bitrate_kbps else target * 0.7
+            if self.delivery_seconds(profile) <= budget:
+                return profile
+        # Nothing fits: the smallest there is
+        return min(candidates, key=lambda profile: profile.bitrate_kbps) if candidates else None
+
+    def stats(self):
+        return {
+            'rtt_ms': round(self.rtt * 1000, 1) if self.rtt is not None else None,
+            'throughput_kbps': round(self.throughput * 8 / 1000, 1) if self.throughput is not None else None,
+        }
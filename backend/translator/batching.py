@@ -0,0 +1,125 @@
+# backend/translator/batching.py
+"""Cross-session micro-batching of Translation API calls.
+
+Every session used to make its own translate() call on the default thread pool.
+The batcher instead collects the requests for the same target language for a
+few milliseconds (or until the batch is full), sends them as one list request
+and resolves each caller's future with its own result. If a batch fails, its
+items are retried one by one so a single bad input can't fail everyone else.
+
+Each upstream call takes one 'translate' scheduler slot, at the highest priority
+and latest deadline among the callers it serves; the callers themselves only
+pass the scheduler's admission (see scheduler.admit).
+"""
+import asyncio
+
+from django.conf import settings
+
+from .providers import get_providers
+from .scheduler import DeadlineExceeded, Ticket, current_ticket, scheduler, use_ticket
+
+
+def batch_ticket(tickets):
+    """The Ticket of a call made for all of `tickets`; None if any caller is unscheduled."""
+    if any(ticket is None for ticket in tickets):
+        return None
+    deadlines = [ticket.deadline for ticket in tickets]
+    deadline = None if None in deadlines else max(deadlines)
+    return Ticket(None, min(ticket.priority for ticket in tickets), deadline)
+
+
+class TranslationBatcher:
+    def __init__(self, window_ms=5, max_batch=32):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending = {}  # (loop, target_lang) -> [(text, future, ticket), ...]
+        self._timers = {}   # (loop, target_lang) -> TimerHandle
+        self._inflight = set()
+        self.batches = 0
+        self.batched_requests = 0
+        self.fallbacks = 0
+
+    async def translate(self, text, target_lang):
+        """Queues `text` for the next batch to `target_lang` and waits for its translation."""
+        loop = asyncio.get_running_loop()
+        key = (loop, target_lang)
+        future = loop.create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((text, future, current_ticket()))
+        if len(batch) >= self.max_batch:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await future
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, None)
+        if batch:
+            task = key[0].create_task(self._send(key[1], batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _call(self, texts, target_lang):
+        async with scheduler.slot('translate'):
+            return await get_providers().translation.translate(texts, target_lang)
+
+    async def _send(self, target_lang, batch):
+        # Identical phrases in the same batch are only sent once
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        self.batches += 1
+        self.batched_requests += len(batch)
+        try:
+            with use_ticket(batch_ticket([ticket for _, _, ticket in batch])):
+                translations = await self._translate(texts, target_lang)
+        except asyncio.CancelledError:
+            # The worker is shutting down: the callers are cancelled along with the batch
+            for _, future, _ in batch:
+                future.cancel()
+            raise
+
+        for text, future, _ in batch:
+            if future.done():
+                continue
+            result = translations[text]
+            if isinstance(result, asyncio.CancelledError):
+                future.cancel()
+            elif isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _translate(self, texts, target_lang):
+        """Returns {text: translation or exception}, retrying texts one by one if the batch fails."""
+        try:
+            return dict(zip(texts, await self._call(texts, target_lang)))
+        except Exception as e:
+            if len(texts) == 1 or isinstance(e, DeadlineExceeded):
+                # Retrying can't help (for a batch, every caller's deadline has passed)
+                return {text: e for text in texts}
+            print(f"Batched translation of {len(texts)} texts failed ({e}); retrying individually.")
+            self.fallbacks += 1
+        outcomes = await asyncio.gather(
+            *(self._call([text], target_lang) for text in texts), return_exceptions=True
+        )
+        # A failed or cancelled call comes back as the exception itself, not a list
+        return {
+            text: outcome if isinstance(outcome, BaseException) else outcome[0]
+            for text, outcome in zip(texts, outcomes)
+        }
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'requests': self.batched_requests,
+            'average_batch_size': round(self.batched_requests / self.batches, 2) if self.batches else 0,
+            'fallbacks': self.fallbacks,
+        }
+
+
+translation_batcher = TranslationBatcher(
+    window_ms=settings.TRANSLATION_BATCH_WINDOW_MS,
+    max_batch=settings.TRANSLATION_BATCH_MAX_SIZE,
+)
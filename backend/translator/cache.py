@@ -0,0 +1,124 @@
+# backend/translator/cache.py
+"""Translation result cache.
+
+Short phrases ("hello", "thank you", ...) repeat constantly across users, so
+translations are cached per (normalized text, target language). The first tier
+is a bounded in-process LRU with TTL; an optional shared tier uses any Django
+cache backend (file, database, Redis, ...) so every worker benefits from what
+the others have already paid for.
+"""
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Canonical form used for cache keys: NFC, collapsed whitespace, trimmed."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+class TTLCache:
+    """Bounded LRU mapping whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, max_entries=10000, ttl=24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        if entry[0] < time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            return default
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def set(self, key, value):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+class TranslationCache:
+    """Two-tier cache in front of translate_client.translate."""
+
+    def __init__(self, max_entries=10000, ttl=24 * 3600, shared_alias=None):
+        self.local = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.ttl = ttl
+        self.shared = caches[shared_alias] if shared_alias else None
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text, target_lang):
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return f"femseek:translation:{target_lang}:{digest}"
+
+    async def get(self, text, target_lang):
+        key = self.make_key(text, target_lang)
+        value = self.local.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        if self.shared is not None:
+            try:
+                value = await self.shared.aget(key)
+            except Exception as e:
+                print(f"Shared translation cache read failed: {e}")
+                value = None
+            if value is not None:
+                self.shared_hits += 1
+                self.local.set(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    async def set(self, text, target_lang, translated_text):
+        key = self.make_key(text, target_lang)
+        self.local.set(key, translated_text)
+        if self.shared is not None:
+            try:
+                await self.shared.aset(key, translated_text, timeout=self.ttl)
+            except Exception as e:
+                print(f"Shared translation cache write failed: {e}")
+
+    def stats(self):
+        return {
+            'entries': len(self.local),
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'evictions': self.local.evictions,
+            'expirations': self.local.expirations,
+        }
+
+
+translation_cache = TranslationCache(
+    max_entries=settings.TRANSLATION_CACHE_MAX_ENTRIES,
+    ttl=settings.TRANSLATION_CACHE_TTL,
+    shared_alias=settings.TRANSLATION_CACHE_SHARED_ALIAS,
+)
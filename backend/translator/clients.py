@@ -0,0 +1,197 @@
+# backend/translator/clients.py
+"""Process-wide registry of pooled Google Cloud clients.
+
+Creating the clients per WebSocket meant a new gRPC/HTTP channel, TLS handshake
+and credential refresh for every session. The registry instead creates a small
+pool of clients once per event loop (the async gRPC clients are bound to the
+loop they were created on) and hands them out round-robin, so many sessions
+multiplex over the same few HTTP/2 channels. The synchronous Translation client
+is loop-independent and shared by the whole process.
+
+The client libraries take over a second to import and loading credentials can
+take seconds more (the metadata server is asked when no key is configured), so
+neither happens when this module is imported: the warm-up does both once, in a
+thread, and every client shares the credentials. Getting a client awaits that
+load too, so a session arriving before the warm-up has finished waits for it
+instead of blocking the event loop.
+"""
+import asyncio
+import itertools
+import time
+import weakref
+
+from django.conf import settings
+
+from . import metrics
+from .credentials import google_credentials
+
+SPEECH = "speech"
+TRANSLATE = "translate"
+TTS = "tts"
+
+
+def load_sdk():
+    """Imports the Google Cloud client libraries and loads the credentials (blocking, cached)."""
+    credentials = google_credentials()
+    from google.cloud import speech, translate_v2, texttospeech
+    return speech, translate_v2, texttospeech, credentials
+
+
+class ClientPool:
+    """A fixed-size pool of clients of one kind, handed out round-robin."""
+
+    def __init__(self, kind, factory, size):
+        self.kind = kind
+        self.clients = [factory() for _ in range(size)]
+        self.checkouts = [0] * size
+        self._next = itertools.cycle(range(size))
+        self.created_at = time.time()
+        self.warmed_up = False
+        self.last_error = None
+
+    def get(self):
+        index = next(self._next)
+        self.checkouts[index] += 1
+        return self.clients[index]
+
+    def stats(self):
+        return {
+            'size': len(self.clients),
+            'checkouts': sum(self.checkouts),
+            'checkouts_per_client': list(self.checkouts),
+            'warmed_up': self.warmed_up,
+            'healthy': self.last_error is None,
+            'last_error': self.last_error,
+            'age_seconds': round(time.time() - self.created_at, 1),
+        }
+
+
+class ClientRegistry:
+    """Lazily creates and warms the Google Cloud client pools for the current worker."""
+
+    def __init__(self, pool_size=2):
+        self.pool_size = pool_size
+        self._loop_pools = weakref.WeakKeyDictionary()  # event loop -> {kind: ClientPool}
+        self._translate_pool = None
+        self._warmups = weakref.WeakKeyDictionary()  # event loop -> warm-up task
+        self._sdk = None
+
+    async def _load_sdk(self):
+        if self._sdk is None:
+            # load_sdk() is cached and thread-safe, so concurrent first callers just wait for it
+            self._sdk = await asyncio.to_thread(load_sdk)
+        return self._sdk
+
+    async def _pools(self):
+        speech, _, texttospeech, credentials = await self._load_sdk()
+        loop = asyncio.get_running_loop()
+        pools = self._loop_pools.get(loop)
+        if pools is None:
+            pools = {
+                SPEECH: ClientPool(SPEECH, lambda: speech.SpeechAsyncClient(credentials=credentials), self.pool_size),
+                TTS: ClientPool(
+                    TTS, lambda: texttospeech.TextToSpeechAsyncClient(credentials=credentials), self.pool_size
+                ),
+            }
+            self._loop_pools[loop] = pools
+        return pools
+
+    async def _translate(self):
+        _, translate_v2, _, credentials = await self._load_sdk()
+        if self._translate_pool is None:
+            # The v2 client wraps a requests session; one pool serves every loop and thread
+            self._translate_pool = ClientPool(
+                TRANSLATE, lambda: translate_v2.Client(credentials=credentials), self.pool_size
+            )
+        return self._translate_pool
+
+    async def speech(self):
+        return (await self._pools())[SPEECH].get()
+
+    async def tts(self):
+        return (await self._pools())[TTS].get()
+
+    async def translate(self):
+        return (await self._translate()).get()
+
+    async def _warm_up_pool(self, pool, warm):
+        try:
+            await asyncio.gather(*(warm(client) for client in pool.clients))
+            pool.warmed_up = True
+            pool.last_error = None
+        except Exception as e:
+            pool.last_error = str(e)
+            print(f"Warm-up of {pool.kind} clients failed: {e}")
+
+    async def warm_up(self, timeout=10):
+        """Opens every channel and refreshes credentials before the first session needs them."""
+        started = time.monotonic()
+        pools = await self._pools()
+        translate_pool = await self._translate()
+        loop = asyncio.get_running_loop()
+
+        async def warm_grpc(client):
+            await asyncio.wait_for(client.transport.grpc_channel.channel_ready(), timeout)
+
+        async def warm_tts(client):
+            # A real (free) call also performs the OAuth token exchange
+            await client.list_voices(language_code="en-US", timeout=timeout)
+
+        async def warm_translate(client):
+            await loop.run_in_executor(None, client.get_languages)
+
+        await asyncio.gather(
+            self._warm_up_pool(pools[SPEECH], warm_grpc),
+            self._warm_up_pool(pools[TTS], warm_tts),
+            self._warm_up_pool(translate_pool, warm_translate),
+        )
+        print(f"Google Cloud clients warmed up in {time.monotonic() - started:.2f}s.")
+
+    def ensure_warm(self):
+        """Starts warming the current loop's pools; safe to call on every connect.
+
+        A warm-up that failed is started again on the next call.
+        """
+        loop = asyncio.get_running_loop()
+        task = self._warmups.get(loop)
+        if task is None or (task.done() and not self.warmed_up()):
+            task = loop.create_task(self.warm_up())
+            self._warmups[loop] = task
+        return task
+
+    def warmed_up(self):
+        """Whether the current loop's pools (and the Translation pool) are warm and healthy."""
+        pools = list(self._loop_pools.get(asyncio.get_running_loop(), {}).values())
+        if self._translate_pool is not None:
+            pools.append(self._translate_pool)
+        return len(pools) == 3 and all(pool.warmed_up and pool.last_error is None for pool in pools)
+
+    def stats(self):
+        """Pool health and channel reuse figures for all loops in this worker."""
+        pools = {}
+        for index, loop_pools in enumerate(list(self._loop_pools.values())):
+            for kind, pool in loop_pools.items():
+                pools[f"{kind}[{index}]"] = pool.stats()
+        if self._translate_pool is not None:
+            pools[TRANSLATE] = self._translate_pool.stats()
+        return {
+            'event_loops': len(self._loop_pools),
+            'pools': pools,
+            'healthy': all(pool['healthy'] for pool in pools.values()),
+        }
+
+
+registry = ClientRegistry(pool_size=settings.GOOGLE_CLIENT_POOL_SIZE)
+
+
+def _registry_stats():
+    stats = registry.stats()
+    return {
+        'event_loops': stats['event_loops'],
+        'pools': len(stats['pools']),
+        'checkouts': sum(pool['checkouts'] for pool in stats['pools'].values()),
+        'healthy': stats['healthy'],
+    }
+
+
+metrics.registry.register_stats('google_clients', _registry_stats)
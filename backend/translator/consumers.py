@@ -1,17 +1,32 @@
 # backend/translator/consumers.py
 import json
-import base64
 import asyncio
 import os # Added for accessing env vars
+import time
+import uuid
 from channels.generic.websocket import AsyncWebsocketConsumer
 from django.conf import settings
-import requests
-
-# Import Google Cloud clients
-from google.cloud import speech, translate_v2 as translate, texttospeech
-from google.cloud.speech_v1 import RecognitionConfig, RecognitionAudio # For specific types
 
+from users.cache import user_cache
 from users.models import User
+from .admission import admission
+from .audio_profiles import DEFAULT_CODECS, DEFAULT_PROFILE, LinkEstimator, accepted_codecs, match_profile
+from .batching import translation_batcher
+from . import metrics
+from .cache import translation_cache
+from .entitlements import entitlements
+from .languages import base_language
+from .payments import PaymentError, activate_subscription, paystack, user_group
+from .tts_cache import tts_cache
+from .pipeline import UtterancePipeline
+from .processing import UtteranceProcessor
+from .scheduler import SUBSCRIBER, TRIAL, Ticket, scheduler, use_ticket
+from .providers import get_providers
+from .readiness import readiness
+from .vad import VoiceActivityDetector, SPEECH_END, MAX_LENGTH, IDLE
+from .voices import voice_catalog
+from .webm import UtteranceBuffer, WebMDemuxer
+from .workers import utterance_message
 
 # --- AI AGENT SYSTEM PROMPT ---
 FEMSEEK_SYSTEM_PROMPT = """
@@ -28,32 +43,116 @@ Core Directives:
 """
 
 
+metrics.registry.register_stats('sessions', admission.stats)
+metrics.registry.register_stats('translation_cache', translation_cache.stats)
+metrics.registry.register_stats('tts_cache', tts_cache.stats)
+metrics.registry.register_stats('translation_batches', translation_batcher.stats)
+metrics.registry.register_stats('voice_catalog', voice_catalog.stats)
+metrics.registry.register_stats('scheduler', scheduler.stats)
+metrics.registry.register_stats('user_cache', user_cache.stats)
+
+
 class TranslateConsumer(AsyncWebsocketConsumer):
     async def connect(self):
-        # Initialize clients once per connection
-        # Google Cloud clients are typically thread-safe and can be reused
-        self.speech_client = speech.SpeechAsyncClient()
-        self.translate_client = translate.Client() # This client is synchronous, handle with run_until_complete or ThreadPoolExecutor
-        self.tts_client = texttospeech.TextToSpeechAsyncClient()
+        self.session_id = uuid.uuid4().hex[:12]
+        # The consumer handles all of its messages in this task, so every span it opens carries the id
+        metrics.set_session(self.session_id)
+        metrics.ensure_loop_monitor()
+
+        # STT/translation/TTS providers are shared by the whole worker (Google clients are
+        # pooled and warmed up once, see clients.py and readiness.py); translations are also batched
+        readiness.ensure_ready()
+        voice_catalog.ensure_fresh()
+        self.providers = get_providers()
         
         self.user = None
+        self.payment_reference = None  # last payment this session was told about
+        self.entitlement = None
         self.target_lang = "en"
+        # 'json' sends audio base64-encoded inside translation_result; 'binary' sends a
+        # JSON header followed by raw audio frames (negotiated in the auth/config message)
+        self.audio_transport = "json"
+        # When the client opts in, long transcripts are translated and spoken clause by clause
+        self.incremental = False
+        # Spoken language, declared by the client or learned from STT; it becomes the
+        # primary recognition language and lets us skip translating into the same language
+        self.source_lang = None
+        # Clients that only want the translated text skip TTS entirely
+        self.text_only = False
+        # TTS output profile: chosen by the client, or picked from the measured link
+        # when it asks for 'auto' (see audio_profiles.py)
+        self.accept_codecs = DEFAULT_CODECS
+        self.audio_profile = DEFAULT_PROFILE
+        self.auto_profile = False
+        self.link = LinkEstimator()
+        self.ping_task = None
         
         # --- Pause Detection Logic ---
-        self.audio_buffer = bytearray()
+        self.inflight_audio_bytes = 0  # Finalized utterance audio not yet done with STT
         self.pause_timer = None
         self.PAUSE_THRESHOLD = 1.5  # 1.5 seconds of silence
-        self.recognition_config_initialized = False # Flag to ensure config is set once
+
+        # --- Voice Activity Detection ---
+        # MediaRecorder sends a chunk every second even during silence, so the pause
+        # timer above only catches the client going quiet; real silence comes from the VAD.
+        # The buffer cuts the WebM stream into utterances that each carry the init segment.
+        self.demuxer = WebMDemuxer()
+        self.audio_buffer = UtteranceBuffer(self.demuxer)
+        self.vad = VoiceActivityDetector(
+            silence_ms=settings.VAD_SILENCE_MS,
+            max_utterance_ms=settings.VAD_MAX_UTTERANCE_MS,
+        )
+
+        # --- Streaming Recognition ---
+        # Audio frames are fed to an open streaming_recognize call as they arrive,
+        # so STT is already done by the time the speaker stops talking.
+        self.streaming_enabled = settings.STT_STREAMING_ENABLED
+        self.stt_audio_queue = None
+        self.stt_stream_task = None
+        self.stt_queued_bytes = 0
+
+        # --- Translation Workers ---
+        # With workers enabled, utterances are processed by `runworker` processes on the
+        # channel layer instead of in this event loop (see workers.py)
+        self.worker_channel = settings.TRANSLATION_WORKER_CHANNEL if settings.TRANSLATION_WORKERS_ENABLED else None
+        self.remote_jobs = {}  # seq -> (UtteranceJob, future resolved when the worker is done)
+
+        # --- Utterance Pipeline ---
+        # Finalized utterances are processed concurrently and delivered in order
+        self.pipeline = UtterancePipeline(
+            self.send,
+            max_depth=settings.PIPELINE_MAX_DEPTH,
+            overflow=settings.PIPELINE_OVERFLOW,
+            on_audio=self.link.audio_sent,
+        )
 
         await self.accept()
 
+        # --- Admission Control ---
+        # Other messages from this client are held back until connect() returns
+        if not admission.has_room():
+            await self.send(json.dumps({'type': 'queued', 'message': 'The server is busy. Waiting for a free slot...'}))
+        if not await admission.admit(self, wait=settings.ADMISSION_WAIT_SECONDS):
+            print(f"Session {self.session_id} rejected: worker at capacity.")
+            await self.send(json.dumps({
+                'type': 'server_busy',
+                'message': 'The server is at capacity. Please try again in a minute.',
+            }))
+            await self.close(code=1013)  # Try Again Later
+
     async def disconnect(self, close_code):
+        admission.release(self)
         if self.user:
-            # Ensure asave is awaited
-            await self.user.asave()
-            print(f"User {self.user.email} trial sessions count updated to {self.user.trial_sessions_count}")
+            await self.channel_layer.group_discard(user_group(self.user.pk), self.channel_name)
         if self.pause_timer:
             self.pause_timer.cancel()
+        if self.ping_task:
+            self.ping_task.cancel()
+        if self.stt_audio_queue:
+            self.stt_audio_queue.put_nowait(None)
+        if self.stt_stream_task:
+            self.stt_stream_task.cancel()
+        self.pipeline.close()
         print(f"WebSocket disconnected with code: {close_code}")
 
     async def receive(self, text_data=None, bytes_data=None):
@@ -67,9 +166,16 @@ class TranslateConsumer(AsyncWebsocketConsumer):
                     await self.handle_auth(data)
                 elif message_type == 'config':
                     self.target_lang = data.get('target_lang', 'en')
+                    self.set_session_options(data)
                     print(f"Target language set to: {self.target_lang}")
                 elif message_type == 'payment_verification':
                     await self.verify_payment(data.get('reference'))
+                elif message_type == 'pong':
+                    self.link.pong(data.get('id'))
+                elif message_type == 'audio_ack':
+                    self.link.audio_ack(data.get('audio_id'))
+                    if self.auto_profile:
+                        self.adapt_audio_profile()
                 else:
                     print(f"Unknown text message type: {message_type}")
             except json.JSONDecodeError:
@@ -86,14 +192,59 @@ class TranslateConsumer(AsyncWebsocketConsumer):
                 await self.send(json.dumps({'type': 'error', 'message': 'Please authenticate first.'}))
                 return
             
-            # Use await self.user.is_trial_active() since it's an async method in the model
-            if not await self.user.is_trial_active():
+            if not self.entitlement.is_active():
                 # Send payment required message if trial is over
                 await self.send(json.dumps({'type': 'payment_required'}))
                 return
 
-            # Append incoming audio to the buffer
-            self.audio_buffer.extend(bytes_data)
+            if self.streaming_enabled:
+                # Forward the frame upstream right away; results arrive in run_streaming_recognition.
+                # The demuxer only tracks the init segment, Clusters and block boundaries here, so
+                # a restarted stream can be given a header.
+                chunk_start = self.demuxer.position
+                try:
+                    block_ends = [end for _, end in self.demuxer.feed_with_offsets(bytes_data)]
+                except ValueError as e:
+                    await self.reject_audio_stream(e)
+                    return
+                if self.stt_queued_bytes > settings.AUDIO_BUFFER_MAX_BYTES:
+                    # Recognition has fallen far behind the microphone; start over rather
+                    # than queue audio without bound
+                    print(f"Streaming STT is {self.stt_queued_bytes} bytes behind; restarting it.")
+                    self.stop_streaming_recognition()
+                    metrics.utterances_dropped.inc(policy='buffer_full')
+                    await self.send(json.dumps({'type': 'utterance_dropped', 'seq': None, 'reason': 'buffer_full'}))
+                if self.stt_audio_queue is None:
+                    # Restart on a block boundary: the chunk may begin in the middle of a block
+                    bytes_data = self.demuxer.resume(bytes_data, chunk_start, block_ends)
+                    if bytes_data is None:
+                        return
+                    self.start_streaming_recognition()
+                self.stt_audio_queue.put_nowait(bytes_data)
+                self.stt_queued_bytes += len(bytes_data)
+                return
+
+            # Append incoming audio to the buffer and run the VAD over its Opus packets;
+            # utterances are cut right after the block that ended them
+            with metrics.span('vad'):
+                try:
+                    packets = self.audio_buffer.feed(bytes_data)
+                except ValueError as e:
+                    await self.reject_audio_stream(e)
+                    return
+                for packet, end in packets:
+                    event = self.vad.process(packet)
+                    if event in (SPEECH_END, MAX_LENGTH):
+                        print(f"VAD endpoint ({event}). Processing {self.audio_buffer.audio_bytes} bytes of audio.")
+                        self.finalize_utterance(end)
+                    elif event == IDLE:
+                        # Nothing but silence so far; don't let it pile up in the buffer
+                        self.audio_buffer.discard(end)
+                        self.vad.reset()
+
+            # A client that never pauses must not grow the buffer without bound
+            if len(self.audio_buffer) > settings.AUDIO_BUFFER_MAX_BYTES:
+                self.handle_buffer_overflow()
 
             # Reset the pause timer every time new audio arrives
             if self.pause_timer:
@@ -104,11 +255,23 @@ class TranslateConsumer(AsyncWebsocketConsumer):
 
     async def handle_auth(self, data):
         try:
-            # Use get_object_or_404 style for async ORM operations
-            self.user = await User.objects.aget(email=data['email'])
+            # Reconnects and fresh signups are usually served from the user cache
+            with metrics.span('auth'):
+                user = await user_cache.get(data['email'])
+            if user is None:
+                raise User.DoesNotExist
+            self.user = user
+            self.entitlement = entitlements.load(self.user)
+            # Subscription changes (e.g. the Paystack webhook) are pushed to this group
+            await self.channel_layer.group_add(user_group(self.user.pk), self.channel_name)
             self.target_lang = data.get('target_lang', 'en')
-            await self.send(json.dumps({'type': 'auth_success', 'message': 'Authentication successful.'}))
-            print(f"User {self.user.email} authenticated. Trial active: {await self.user.is_trial_active()}")
+            self.set_session_options(data)
+            await self.send(json.dumps({
+                'type': 'auth_success',
+                'message': 'Authentication successful.',
+                'audio_transport': self.audio_transport,
+            }))
+            print(f"User {self.user.email} authenticated. Trial active: {self.entitlement.is_active()}")
         except User.DoesNotExist:
             print(f"Authentication failed for email: {data['email']}")
             await self.send_error("User not found. Please sign up or check your email.")
@@ -117,16 +280,105 @@ class TranslateConsumer(AsyncWebsocketConsumer):
             print(f"Error during authentication: {e}")
             await self.send_error(f"Authentication failed: {e}")
 
+    def set_session_options(self, data):
+        if data.get('audio_transport') in ('json', 'binary'):
+            self.audio_transport = data['audio_transport']
+        if 'incremental' in data:
+            self.incremental = bool(data['incremental']) and settings.INCREMENTAL_SYNTHESIS_ENABLED
+        if 'text_only' in data:
+            self.text_only = bool(data['text_only'])
+        if data.get('source_lang'):
+            self.source_lang = data['source_lang']
+        if 'accept_codecs' in data:
+            self.accept_codecs = accepted_codecs(data['accept_codecs'])
+        if data.get('audio_profile'):
+            self.set_audio_profile(data['audio_profile'])
+
+    def set_audio_profile(self, request):
+        """Applies the output profile the client asked for: 'auto', a profile name or a codec/rate/bitrate dict."""
+        if request == 'auto':
+            self.auto_profile = True
+            # Until the link is measured, stay at the bitrate every client used to get
+            profile = self.link.choose(self.accept_codecs) or match_profile(
+                {'bitrate_kbps': DEFAULT_PROFILE.bitrate_kbps}, self.accept_codecs
+            )
+            if self.ping_task is None:
+                self.ping_task = asyncio.create_task(self.ping_loop())
+        else:
+            try:
+                profile = match_profile(request, self.accept_codecs)
+            except (ValueError, TypeError, AttributeError) as e:
+                print(f"Ignoring audio profile {request!r}: {e}")
+                return
+            self.auto_profile = False
+        self.use_audio_profile(profile, 'auto' if self.auto_profile else 'client')
+
+    def use_audio_profile(self, profile, source):
+        self.audio_profile = profile
+        metrics.audio_profile_choices.inc(profile=profile.name, source=source)
+        print(f"Session {self.session_id} audio profile: {profile.name} ({source}, link {self.link.stats()})")
+
+    def adapt_audio_profile(self):
+        profile = self.link.choose(self.accept_codecs, self.audio_profile)
+        if profile is not None and profile != self.audio_profile:
+            self.use_audio_profile(profile, 'auto')
+
+    async def ping_loop(self):
+        """Measures the round-trip time while the output profile is picked automatically."""
+        try:
+            while self.auto_profile:
+                await self.send(json.dumps({'type': 'ping', 'id': self.link.ping()}))
+                await asyncio.sleep(settings.AUDIO_PROFILE_PING_SECONDS)
+        finally:
+            self.ping_task = None
+
+    async def reject_audio_stream(self, error):
+        """Ends a session whose audio can't be parsed; the client reconnects with a fresh recording."""
+        print(f"Could not parse audio stream: {error}")
+        self.audio_buffer.reset()
+        self.vad.reset()
+        if self.stt_stream_task:
+            self.stop_streaming_recognition()
+        await self.send_error("Could not parse the audio stream. Please reconnect.")
+        await self.close(code=1003)  # Unsupported Data
+
+    def buffered_bytes(self):
+        """Audio this session holds in memory: capture buffer, demuxer state, queued STT frames and pending utterances."""
+        return (len(self.audio_buffer) + self.demuxer.pending_bytes
+                + self.stt_queued_bytes + self.inflight_audio_bytes)
+
+    def finalize_utterance(self, offset=None):
+        """Hands the buffered utterance (up to stream `offset`) to the pipeline and starts capturing the next one."""
+        with metrics.span('finalize'):
+            # The buffer itself is handed over (no copy) and never written to again
+            audio_data = self.audio_buffer.cut(offset)
+            self.vad.reset()
+            self.inflight_audio_bytes += len(audio_data)
+            job = self.pipeline.submit(lambda job: self.process_translation(job, audio_data))
+
+            def release(_=None):
+                self.inflight_audio_bytes -= len(audio_data)
+
+            if job is None:
+                release()
+            else:
+                job.task.add_done_callback(release)
+
+    def handle_buffer_overflow(self):
+        if settings.AUDIO_BUFFER_OVERFLOW == 'drop_oldest' and self.audio_buffer.trim(settings.AUDIO_BUFFER_MAX_BYTES):
+            metrics.utterances_dropped.inc(policy='buffer_trim')
+            return
+        print(f"Audio buffer reached {len(self.audio_buffer)} bytes without a pause; finalizing early.")
+        self.finalize_utterance()
+
     async def detect_pause(self):
         """Waits for a pause and then triggers the translation process."""
         try:
             await asyncio.sleep(self.PAUSE_THRESHOLD)
-            if len(self.audio_buffer) > 0:
-                print(f"Pause detected. Processing {len(self.audio_buffer)} bytes of audio.")
-                # A pause has been detected, process the buffered audio
-                await self.process_translation(bytes(self.audio_buffer))
-                # Clear the buffer for the next utterance
-                self.audio_buffer.clear()
+            if self.audio_buffer.audio_bytes > 0:
+                print(f"Pause detected. Processing {self.audio_buffer.audio_bytes} bytes of audio.")
+                # A pause has been detected, queue the buffered audio for processing
+                self.finalize_utterance()
             else:
                 print("Pause detected, but audio buffer is empty. Ignoring.")
         except asyncio.CancelledError:
@@ -136,127 +388,196 @@ class TranslateConsumer(AsyncWebsocketConsumer):
             print(f"Error in detect_pause: {e}")
             await self.send_error(f"Internal error during pause detection: {e}")
 
-    async def process_translation(self, audio_data):
-        """The core function orchestrating the three Google Cloud APIs."""
+    def start_streaming_recognition(self):
+        """Opens a new streaming_recognize call fed from stt_audio_queue.
+
+        The first frame queued must start a standalone stream (see WebMDemuxer.resume),
+        since only the very first frame of the session carries a header.
+        """
+        self.stt_audio_queue = asyncio.Queue()
+        self.stt_stream_task = asyncio.create_task(self.run_streaming_recognition(self.stt_audio_queue))
+
+    def stop_streaming_recognition(self):
+        self.stt_stream_task.cancel()
+        self.stt_audio_queue = None
+        self.stt_stream_task = None
+        self.stt_queued_bytes = 0
+
+    async def audio_chunks(self, audio_queue):
+        while True:
+            chunk = await audio_queue.get()
+            if chunk is None:
+                return
+            if audio_queue is self.stt_audio_queue:
+                self.stt_queued_bytes -= len(chunk)
+            yield chunk
+
+    async def run_streaming_recognition(self, audio_queue):
+        """Relays interim transcripts to the client and translates each final result."""
         try:
-            # 1. Google Speech-to-Text (STT)
-            # Use WEBM_OPUS as specified in frontend
-            # Set language_code to 'auto' for automatic detection as per prompt
-            config = RecognitionConfig(
-                encoding=RecognitionConfig.AudioEncoding.WEBM_OPUS,
-                sample_rate_hertz=48000,
-                language_code="auto",  # Detect source language automatically
-                # Enable automatic punctuation for better transcription quality
-                enable_automatic_punctuation=True,
-                # Consider using diarization_config if speaker separation is ever needed
-            )
-            audio = RecognitionAudio(content=audio_data)
-            
-            print("Sending audio to STT...")
-            stt_response = await self.speech_client.recognize(config=config, audio=audio)
-
-            if not stt_response.results or not stt_response.results[0].alternatives:
-                print("No speech detected or no alternatives found.")
-                await self.send(json.dumps({'type': 'transcription_update', 'text': ''})) # Clear input area
-                return # Ignore if no speech was detected
-
-            transcribed_text = stt_response.results[0].alternatives[0].transcript
-            print(f"Transcribed text: {transcribed_text}")
-            await self.send(json.dumps({'type': 'transcription_update', 'text': transcribed_text}))
-
-            # 2. Google Translation API (Synchronous call, run in executor)
-            # The translate_v2.Client() is not async, so use run_until_complete
-            print(f"Translating to {self.target_lang}: {transcribed_text}")
-            loop = asyncio.get_event_loop()
-            translation_result = await loop.run_in_executor(
-                None, # Use default ThreadPoolExecutor
-                lambda: self.translate_client.translate(transcribed_text, target_language=self.target_lang)
+            print("Opening streaming STT session...")
+            results = self.providers.speech.streaming_recognize(
+                self.audio_chunks(audio_queue), self.processor().recognition_options()
             )
-            translated_text = translation_result['translatedText']
-            print(f"Translated text: {translated_text}")
+            async for result in results:
+                language = base_language(result.language_code) if result.is_final else None
+                if language:
+                    self.source_lang = language
+                await self.send(json.dumps({
+                    'type': 'transcription_update',
+                    'text': result.text,
+                    'is_final': result.is_final,
+                    'language': language,
+                }))
+                if result.is_final and result.text.strip():
+                    # Translate in the pipeline so we keep reading interim results
+                    self.pipeline.submit(lambda job, text=result.text: self.translate_and_speak(job, text))
+            print("Streaming STT session ended.")
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Error in streaming recognition: {e}")
+            metrics.upstream_errors.inc(stage='stt_stream')
+            await self.send_error(f"Speech recognition failed: {e}")
+        finally:
+            # The stream ends on errors or when Google's stream duration limit is hit;
+            # the next audio frame opens a fresh one.
+            if self.stt_audio_queue is audio_queue:
+                self.stt_audio_queue = None
+                self.stt_stream_task = None
+                self.stt_queued_bytes = 0
 
+    def processor(self):
+        """Snapshot of this session's settings for processing one utterance."""
+        return UtteranceProcessor(
+            self.providers,
+            target_lang=self.target_lang,
+            audio_transport=self.audio_transport,
+            incremental=self.incremental,
+            source_lang=self.source_lang,
+            text_only=self.text_only,
+            audio_profile=self.audio_profile.name,
+        )
 
-            # 3. Google Text-to-Speech (TTS)
-            synthesis_input = texttospeech.SynthesisInput(text=translated_text)
-            
-            # Attempt to select a more natural voice using WaveNet or Neural2
-            # Check available voices for your target_lang for best results
-            # Example for English (en-US): 'en-US-Wavenet-D'
-            # For other languages, list voices: gcloud text-to-speech list-voices --language-code=<lang_code>
-            voice_params = texttospeech.VoiceSelectionParams(
-                language_code=self.target_lang,
-                ssml_gender=texttospeech.SsmlVoiceGender.NEUTRAL, # Can be MALE, FEMALE, NEUTRAL
-                name=f"{self.target_lang}-Wavenet-A" # Try WaveNet. Adjust as needed.
-            )
-            
-            audio_config = texttospeech.AudioConfig(
-                audio_encoding=texttospeech.AudioEncoding.MP3,
-                # Adjust speaking rate, pitch for naturalness
-                speaking_rate=1.0, # 1.0 is normal
-                pitch=0.0 # 0.0 is normal
-            )
-            
-            print("Synthesizing speech...")
-            tts_response = await self.tts_client.synthesize_speech(
-                input=synthesis_input, voice=voice_params, audio_config=audio_config
-            )
-            
-            # Send the final result back to the client
-            encoded_audio = base64.b64encode(tts_response.audio_content).decode('utf-8')
-            await self.send(json.dumps({
-                'type': 'translation_result',
-                'text': translated_text,
-                'audio': encoded_audio
-            }))
-            print("Translation sent to frontend.")
+    async def process_translation(self, job, audio_data):
+        """The core function orchestrating the three Google Cloud APIs."""
+        await self.run_utterance(job, audio=audio_data)
 
-            # Increment trial sessions count after successful translation
-            if self.user and not self.user.is_subscribed:
-                self.user.trial_sessions_count += 1
-                await self.user.asave() # Await the async save
-                print(f"Trial session count incremented for {self.user.email} to {self.user.trial_sessions_count}")
+    async def translate_and_speak(self, job, transcribed_text):
+        """Translates a finished transcript and sends back the synthesized audio."""
+        await self.run_utterance(job, text=transcribed_text)
 
+    def ticket(self):
+        """Scheduling identity of this session's next utterance: user, priority class and deadline."""
+        deadline = None
+        if settings.UTTERANCE_DEADLINE_MS:
+            deadline = time.time() + settings.UTTERANCE_DEADLINE_MS / 1000
+        subscribed = self.entitlement is not None and self.entitlement.is_subscribed
+        return Ticket(self.user.pk if self.user else self.session_id, SUBSCRIBER if subscribed else TRIAL, deadline)
 
-        except Exception as e:
-            print(f"An error occurred during translation: {e}")
-            await self.send_error(f"Failed to process translation: {e}. Please try again.")
+    async def run_utterance(self, job, audio=None, text=None):
+        processor = self.processor()
+        ticket = self.ticket()
+        with metrics.utterance_trace(self.session_id, job.seq), use_ticket(ticket):
+            if self.worker_channel:
+                ok = await self.run_on_worker(job, processor, ticket, audio, text)
+            elif audio is not None:
+                ok = await processor.process_audio(job, audio)
+            else:
+                ok = await processor.translate_and_speak(job, text)
+        if processor.detected_lang:
+            self.source_lang = processor.detected_lang
+
+        # Increment trial sessions count after successful translation
+        if ok and self.entitlement and not self.entitlement.is_subscribed:
+            self.entitlement.record_usage()
+            print(f"Trial session count incremented for {self.user.email} to {self.entitlement.trial_sessions_count}")
+
+    # --- Translation workers ---
+
+    async def run_on_worker(self, job, processor, ticket, audio=None, text=None):
+        """Hands the utterance to a translation worker and relays its output into `job`."""
+        done = asyncio.get_running_loop().create_future()
+        self.remote_jobs[job.seq] = (job, done)
+        try:
+            with metrics.span('worker'):
+                await self.channel_layer.send(self.worker_channel, utterance_message(
+                    self.session_id, job.seq, self.channel_name, processor, ticket,
+                    audio=bytes(audio) if audio is not None else None, text=text,
+                ))
+                result = await asyncio.wait_for(done, settings.TRANSLATION_WORKER_TIMEOUT)
+            processor.detected_lang = result['detected_lang']
+            return result['ok']
+        except asyncio.TimeoutError:
+            print(f"No result from the translation workers for utterance #{job.seq}.")
+            await job.send_error("Translation timed out. Please try again.")
+            return False
+        finally:
+            self.remote_jobs.pop(job.seq, None)
+
+    async def utterance_output(self, event):
+        # Output of an utterance running on a worker; unknown seqs were dropped or timed out
+        entry = self.remote_jobs.get(event['seq'])
+        if entry:
+            await entry[0].send(text_data=event['text'], bytes_data=event['bytes'])
+
+    async def utterance_audio(self, event):
+        # A worker is about to relay synthesized audio; time it like local output
+        entry = self.remote_jobs.get(event['seq'])
+        if entry:
+            await entry[0].audio_sent(event['audio_id'], event['size'], event['profile'])
+
+    async def utterance_done(self, event):
+        entry = self.remote_jobs.get(event['seq'])
+        if entry and not entry[1].done():
+            entry[1].set_result(event)
 
     async def verify_payment(self, reference):
         if not self.user:
             await self.send_error("No user associated with this session for payment verification.")
             return
+        if not reference:
+            await self.send_error("Missing payment reference.")
+            return
 
-        url = f"https://api.paystack.co/transaction/verify/{reference}"
-        headers = {"Authorization": f"Bearer {settings.PAYSTACK_SECRET_KEY}"}
-        
-        # requests.get is synchronous, run in executor
-        loop = asyncio.get_event_loop()
         try:
-            response = await loop.run_in_executor(
-                None, # Use default ThreadPoolExecutor
-                lambda: requests.get(url, headers=headers, timeout=10) # Add timeout
-            )
-            response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-            response_json = response.json()
-
-            if response_json['status'] and response_json['data']['status'] == 'success':
-                self.user.is_subscribed = True
-                self.user.trial_sessions_count = 0 # Reset trial count on subscription
-                await self.user.asave()
-                await self.send(json.dumps({'type': 'payment_success', 'message': 'Payment successful! Your access is restored.'}))
-                print(f"Payment verified for {self.user.email}. User is now subscribed.")
-            else:
-                await self.send_error(f"Payment verification failed: {response_json.get('message', 'Unknown error')}")
-                print(f"Payment verification failed for {self.user.email}: {response_json}")
-        except requests.exceptions.RequestException as req_e:
-            print(f"Network error during Paystack verification: {req_e}")
-            await self.send_error(f"Network error during payment verification. Please try again.")
-        except json.JSONDecodeError:
-            print(f"Invalid JSON response from Paystack: {response.text}")
-            await self.send_error("Could not parse payment verification response.")
+            verification = await paystack.verify(reference)
+        except PaymentError as e:
+            print(f"Paystack verification of {reference} failed: {e}")
+            await self.send_error("Network error during payment verification. Please try again.")
+            return
         except Exception as e:
             print(f"An unexpected error occurred during payment verification: {e}")
             await self.send_error(f"Payment verification encountered an error: {e}")
+            return
+
+        if not verification.ok:
+            await self.send_error(f"Payment verification failed: {verification.message or verification.status}")
+            print(f"Payment verification failed for {self.user.email}: {reference} is {verification.status}")
+            return
+        if not verification.belongs_to(self.user.email):
+            # A reference only ever pays for its own customer's subscription
+            await self.send_error("Payment verification failed: this payment belongs to a different account.")
+            print(f"Payment {reference} ({verification.email}) presented by {self.user.email}; rejected.")
+            return
+        self.payment_reference = reference
+        await activate_subscription(self.user, reference)
+        await self.send_payment_success()
+
+    async def subscription_activated(self, event):
+        # A payment verified elsewhere (webhook, another tab or worker); this session's
+        # entitlement may be stale, so apply it here too
+        if event['reference'] == self.payment_reference or not self.user:
+            return
+        self.payment_reference = event['reference']
+        self.user.is_subscribed = True
+        self.user.trial_sessions_count = 0
+        entitlements.invalidate(self.user)
+        await user_cache.invalidate(self.user)
+        await self.send_payment_success()
+
+    async def send_payment_success(self):
+        await self.send(json.dumps({'type': 'payment_success', 'message': 'Payment successful! Your access is restored.'}))
 
     async def send_error(self, message):
         await self.send(json.dumps({'type': 'error', 'message': message}))
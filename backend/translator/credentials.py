@@ -0,0 +1,92 @@
+# backend/translator/credentials.py
+"""Google Cloud service account credentials, materialized once.
+
+Settings used to decode GOOGLE_APPLICATION_CREDENTIALS_JSON_BASE64 and rewrite
+google-credentials.json on every import: every manage.py command, every worker
+and every autoscaled instance paid for it, and concurrent workers raced on the
+same file. The key is now decoded the first time a Google client is created,
+written only if the file is missing or differs (atomically, readable by the
+owner only), and the outcome is remembered for the rest of the process.
+google_credentials() then loads the key (or the metadata server's credentials)
+once for all clients, instead of once per client on the event loop.
+"""
+import base64
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+
+CLOUD_PLATFORM_SCOPE = 'https://www.googleapis.com/auth/cloud-platform'
+
+_lock = threading.Lock()
+_path = None
+_resolved = False
+_credentials_lock = threading.Lock()
+_credentials = None
+
+
+def _materialize(encoded, path):
+    content = base64.b64decode(encoded)
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.google-credentials-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return True
+
+
+def ensure_google_credentials():
+    """Points GOOGLE_APPLICATION_CREDENTIALS at the service account key; returns its path (or None).
+
+    Cheap after the first call; safe to call from any thread.
+    """
+    global _path, _resolved
+    if _resolved:
+        return _path
+    with _lock:
+        if _resolved:
+            return _path
+        encoded = settings.GOOGLE_CREDENTIALS_BASE64
+        if encoded:
+            path = str(settings.GOOGLE_CREDENTIALS_FILE)
+            try:
+                written = _materialize(encoded, path)
+                os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = path
+                _path = path
+                print(f"Google Cloud credentials {'written to' if written else 'found at'} {path}.")
+            except (ValueError, OSError) as e:
+                print(f"Error decoding Google Cloud credentials: {e}")
+        elif os.getenv('GOOGLE_APPLICATION_CREDENTIALS'):
+            _path = os.environ['GOOGLE_APPLICATION_CREDENTIALS']
+        else:
+            print("Warning: GOOGLE_APPLICATION_CREDENTIALS not found. Google Cloud APIs might fail.")
+        _resolved = True
+        return _path
+
+
+def google_credentials():
+    """The application default credentials, loaded once; a failed load is retried on the next call.
+
+    Blocking (it may query the metadata server), so call it off the event loop.
+    """
+    global _credentials
+    if _credentials is None:
+        ensure_google_credentials()
+        with _credentials_lock:
+            if _credentials is None:
+                import google.auth
+
+                _credentials, _ = google.auth.default(scopes=[CLOUD_PLATFORM_SCOPE])
+    return _credentials
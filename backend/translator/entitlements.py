@@ -0,0 +1,183 @@
+# backend/translator/entitlements.py
+"""In-memory entitlement state for WebSocket sessions, with write-behind usage counting.
+
+The entitlement (subscription flag and trial usage) is loaded once at auth and
+shared by all sessions of the same user in this worker, so the per-frame access
+check is a couple of comparisons instead of a model method on a stale row.
+Usage increments are applied in memory right away and written to the database
+by a background flusher, which batches them across sessions into atomic
+`UPDATE ... SET trial_sessions_count = trial_sessions_count + n` statements.
+Increments are only forgotten once their UPDATE succeeded; the lifespan
+shutdown drains whatever is left.
+"""
+import asyncio
+import weakref
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from users.cache import user_cache
+from users.models import User
+
+from . import metrics
+
+
+class Entitlement:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.is_subscribed = False
+        self.trial_ends_at = None
+        self.trial_sessions_count = 0
+
+    def apply(self, user, pending=0):
+        """Takes the persisted state from `user`, plus usage not flushed yet."""
+        self.is_subscribed = user.is_subscribed
+        self.trial_ends_at = user.trial_start_date + User.TRIAL_DURATION
+        self.trial_sessions_count = user.trial_sessions_count + pending
+
+    def merge(self, user, pending=0):
+        """Folds a row loaded by another session into the live state without rolling usage back.
+
+        The row may come from the user cache and predate usage this worker already counted.
+        """
+        self.is_subscribed = self.is_subscribed or user.is_subscribed
+        self.trial_ends_at = user.trial_start_date + User.TRIAL_DURATION
+        self.trial_sessions_count = max(self.trial_sessions_count, user.trial_sessions_count + pending)
+
+    def is_active(self):
+        # Same rules as User.is_trial_active
+        if self.is_subscribed:
+            return True
+        return self.trial_sessions_count < User.TRIAL_SESSIONS and timezone.now() < self.trial_ends_at
+
+    def record_usage(self):
+        """Counts one trial session (no-op for subscribers); the database write is deferred."""
+        if self.is_subscribed:
+            return
+        self.trial_sessions_count += 1
+        usage_flusher.add(self.user_id)
+
+
+class UsageFlusher:
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self._pending = Counter()  # user id -> increments not yet written
+        self._inflight = Counter()  # user id -> increments being written right now
+        self._task = None
+        self._flushing = None  # task of the flush in progress
+        self.flushes = 0
+        self.rows = 0
+        self.failures = 0
+
+    def pending(self, user_id):
+        """Increments of `user_id` that the database doesn't have yet."""
+        return self._pending.get(user_id, 0) + self._inflight.get(user_id, 0)
+
+    def add(self, user_id, amount=1):
+        self._pending[user_id] += amount
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def discard(self, user_id):
+        """Forgets unflushed usage, e.g. when a payment resets the trial counter."""
+        self._pending.pop(user_id, None)
+
+    async def _run(self):
+        while self._pending:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    async def flush(self):
+        """Writes all pending increments, one UPDATE per distinct increment size.
+
+        Waits for a flush that is already running first. The writes run in their own
+        task, so a caller being cancelled (e.g. the flusher loop at shutdown) doesn't
+        abandon an UPDATE halfway.
+        """
+        if self._flushing is not None:
+            await asyncio.shield(self._flushing)
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, Counter()
+        self._inflight.update(pending)
+        self._flushing = asyncio.ensure_future(self._write(pending))
+        try:
+            await asyncio.shield(self._flushing)
+        finally:
+            if self._flushing.done():
+                self._flushing = None
+
+    async def _write(self, pending):
+        by_amount = defaultdict(list)
+        for user_id, amount in pending.items():
+            by_amount[amount].append(user_id)
+        for amount, user_ids in by_amount.items():
+            try:
+                with metrics.span('usage_flush'):
+                    await User.objects.filter(pk__in=user_ids).aupdate(
+                        trial_sessions_count=F('trial_sessions_count') + amount
+                    )
+                self.flushes += 1
+                self.rows += len(user_ids)
+            except Exception as e:
+                # Keep the increments for the next round rather than losing them
+                print(f"Flushing usage for {len(user_ids)} users failed: {e}")
+                self.failures += 1
+                for user_id in user_ids:
+                    self._pending[user_id] += amount
+            finally:
+                self._inflight.subtract(dict.fromkeys(user_ids, amount))
+                self._inflight += Counter()  # Drops the users that are done
+        # Cached rows now have a stale trial count
+        await user_cache.invalidate_ids(list(pending))
+
+    async def drain(self, attempts=3):
+        """Writes out everything still pending, for shutdown."""
+        for _ in range(attempts):
+            await self.flush()
+            if not self._pending:
+                return
+        print(f"Giving up on usage of {len(self._pending)} users after {attempts} attempts.")
+
+    def stats(self):
+        return {
+            'pending_users': len(self._pending),
+            'pending_increments': sum(self._pending.values()),
+            'flushes': self.flushes,
+            'rows': self.rows,
+            'failures': self.failures,
+        }
+
+
+class EntitlementStore:
+    def __init__(self):
+        self._entitlements = weakref.WeakValueDictionary()  # user id -> Entitlement
+
+    def load(self, user):
+        """Returns the shared entitlement for `user`, updated with the freshly loaded row."""
+        entitlement = self._entitlements.get(user.pk)
+        if entitlement is None:
+            entitlement = Entitlement(user.pk)
+            entitlement.apply(user, usage_flusher.pending(user.pk))
+            self._entitlements[user.pk] = entitlement
+        else:
+            entitlement.merge(user, usage_flusher.pending(user.pk))
+        return entitlement
+
+    def invalidate(self, user):
+        """Replaces the cached state after an entitlement change (payment) saved on `user`."""
+        usage_flusher.discard(user.pk)
+        entitlement = self._entitlements.get(user.pk)
+        if entitlement is not None:
+            entitlement.apply(user)
+
+    def __len__(self):
+        return len(self._entitlements)
+
+
+usage_flusher = UsageFlusher(interval=settings.USAGE_FLUSH_INTERVAL)
+entitlements = EntitlementStore()
+
+metrics.registry.register_stats('usage_flusher', usage_flusher.stats)
@@ -0,0 +1,181 @@
+# backend/translator/fakes.py
+"""Deterministic local stand-ins for the Google STT / Translation / TTS providers.
+
+Used by the load-test harness (bench/loadtest.py) and for local development
+without cloud credentials: set TRANSLATOR_PROVIDER=fake. Each fake has a
+configurable latency distribution, error rate and payload size, and draws from
+a seeded RNG so runs are reproducible. Options come from
+settings.FAKE_PROVIDER_OPTIONS, e.g.
+
+    {"speech": {"latency": {"distribution": "lognormal", "median_ms": 300, "sigma": 0.4}},
+     "synthesis": {"error_rate": 0.01, "bytes_per_char": 400},
+     "seed": 7}
+"""
+import asyncio
+import hashlib
+import random
+import zlib
+
+from .audio_profiles import estimated_bitrate_kbps
+from .providers import Providers, SpeechProvider, SynthesisProvider, TranslationProvider, Transcript
+from .vad import MAX_LENGTH, SPEECH_END, VoiceActivityDetector
+from .webm import WebMDemuxer
+
+_WORDS = (
+    "hello thank you please where is the market how much does this cost my name is "
+    "good morning friend today tomorrow water food help family school work travel"
+).split()
+
+
+# A small but realistic slice of the Google TTS catalog for the supported languages
+FAKE_VOICES = (
+    ('en-US-Neural2-C', 'FEMALE'), ('en-US-Wavenet-A', 'MALE'), ('en-US-Standard-C', 'FEMALE'),
+    ('en-GB-Neural2-A', 'FEMALE'), ('sw-KE-Standard-A', 'FEMALE'), ('sw-KE-Standard-B', 'MALE'),
+    ('es-ES-Neural2-A', 'FEMALE'), ('es-US-Wavenet-A', 'FEMALE'), ('pt-BR-Neural2-A', 'FEMALE'),
+    ('pt-PT-Wavenet-A', 'FEMALE'), ('cmn-CN-Wavenet-A', 'FEMALE'), ('cmn-CN-Standard-A', 'FEMALE'),
+    ('cmn-TW-Wavenet-A', 'FEMALE'), ('fr-FR-Neural2-A', 'FEMALE'), ('fr-CA-Neural2-A', 'FEMALE'),
+    ('hi-IN-Neural2-A', 'FEMALE'), ('hi-IN-Standard-A', 'FEMALE'),
+)
+
+
+class FakeUpstreamError(Exception):
+    """Injected failure, raised at the configured error_rate."""
+
+
+class LatencyModel:
+    """Samples simulated API latencies in seconds.
+
+    distribution: 'fixed' (ms), 'uniform' (low_ms..high_ms) or 'lognormal'
+    (median_ms, sigma).
+    """
+
+    def __init__(self, rng, distribution="lognormal", ms=100, low_ms=50, high_ms=150, median_ms=100, sigma=0.3):
+        self.rng = rng
+        self.distribution = distribution
+        self.ms = ms
+        self.low_ms = low_ms
+        self.high_ms = high_ms
+        self.median_ms = median_ms
+        self.sigma = sigma
+
+    def sample(self):
+        if self.distribution == "fixed":
+            value = self.ms
+        elif self.distribution == "uniform":
+            value = self.rng.uniform(self.low_ms, self.high_ms)
+        elif self.distribution == "lognormal":
+            value = self.rng.lognormvariate(0, self.sigma) * self.median_ms
+        else:
+            raise ValueError(f"Unknown latency distribution: {self.distribution}")
+        return value / 1000
+
+
+class FakeProvider:
+    def __init__(self, rng, latency=None, error_rate=0.0):
+        self.rng = rng
+        self.latency = LatencyModel(rng, **(latency or {}))
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+
+    async def simulate(self):
+        """Sleeps for a sampled latency and raises at the configured error rate."""
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample())
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.errors += 1
+            raise FakeUpstreamError(f"{type(self).__name__}: injected failure")
+
+
+def fake_transcript(seed_bytes, words=8):
+    """Deterministic pseudo-sentence derived from the audio content."""
+    rng = random.Random(zlib.crc32(seed_bytes))
+    return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+
+class FakeSpeechProvider(FakeProvider, SpeechProvider):
+    """Fake STT; the streaming mode endpoints utterances with the real VAD."""
+
+    def __init__(self, rng, language_code="en-US", words=8, endpoint_silence_ms=500, **kwargs):
+        super().__init__(rng, **kwargs)
+        self.language_code = language_code
+        self.words = words
+        self.endpoint_silence_ms = endpoint_silence_ms
+
+    async def recognize(self, audio, options):
+        await self.simulate()
+        if not audio:
+            return None
+        return Transcript(fake_transcript(bytes(audio[:4096]), self.words), self.language_code, True)
+
+    async def streaming_recognize(self, audio_chunks, options):
+        demuxer = WebMDemuxer()
+        vad = VoiceActivityDetector(silence_ms=self.endpoint_silence_ms)
+        digest = hashlib.sha256()
+        speaking = False
+        async for chunk in audio_chunks:
+            digest.update(chunk)
+            endpoint = False
+            for packet in demuxer.feed(chunk):
+                if vad.process(packet) in (SPEECH_END, MAX_LENGTH):
+                    endpoint = True
+                    vad.reset()
+            speaking = speaking or bool(vad.speech_ms)
+            if endpoint:
+                await self.simulate()
+                yield Transcript(fake_transcript(digest.digest(), self.words), self.language_code, True)
+                digest = hashlib.sha256()
+                speaking = bool(vad.speech_ms)
+            elif speaking:
+                yield Transcript(fake_transcript(digest.digest(), self.words // 2 or 1), self.language_code, False)
+        if speaking:
+            await self.simulate()
+            yield Transcript(fake_transcript(digest.digest(), self.words), self.language_code, True)
+
+
+class FakeTranslationProvider(FakeProvider, TranslationProvider):
+    async def translate(self, texts, target_lang):
+        await self.simulate()
+        return [f"[{target_lang}] {text}" for text in texts]
+
+
+class FakeSynthesisProvider(FakeProvider, SynthesisProvider):
+    def __init__(self, rng, bytes_per_char=300, **kwargs):
+        super().__init__(rng, **kwargs)
+        self.bytes_per_char = bytes_per_char
+        self.voices = [
+            {
+                'name': name,
+                'language_codes': [name.rsplit('-', 2)[0]],
+                'ssml_gender': gender,
+                'natural_sample_rate_hertz': 24000,
+            }
+            for name, gender in FAKE_VOICES
+        ]
+        self.voice_names = {voice['name'] for voice in self.voices}
+
+    async def list_voices(self):
+        await self.simulate()
+        return self.voices
+
+    async def synthesize(self, request):
+        await self.simulate()
+        if request['voice_name'] and request['voice_name'] not in self.voice_names:
+            self.errors += 1
+            raise FakeUpstreamError(f"Voice '{request['voice_name']}' does not exist.")
+        # Deterministic filler of a realistic size for the text length and output profile
+        # (bytes_per_char is for 32 kbit/s MP3)
+        block = hashlib.sha256(request['text'].encode("utf-8")).digest()
+        bitrate = estimated_bitrate_kbps(request['audio_encoding'], request['sample_rate_hertz'])
+        size = max(1, len(request['text']) * self.bytes_per_char * bitrate // 32)
+        return (block * (size // len(block) + 1))[:size]
+
+
+def fake_providers(options=None):
+    options = options or {}
+    rng = random.Random(options.get("seed", 0))
+    return Providers(
+        speech=FakeSpeechProvider(rng, **options.get("speech", {})),
+        translation=FakeTranslationProvider(rng, **options.get("translation", {})),
+        synthesis=FakeSynthesisProvider(rng, **options.get("synthesis", {})),
+    )
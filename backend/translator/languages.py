@@ -0,0 +1,41 @@
+# backend/translator/languages.py
+"""Supported languages and how they map onto Speech-to-Text language codes."""
+
+# Target languages offered by the app (Translation API codes)
+SUPPORTED_LANGUAGES = ('en', 'sw', 'es', 'pt', 'zh', 'fr', 'hi')
+
+# Speech-to-Text recognition code for each of them
+STT_LANGUAGE_CODES = {
+    'en': 'en-US',
+    'sw': 'sw-KE',
+    'es': 'es-ES',
+    'pt': 'pt-BR',
+    'zh': 'cmn-Hans-CN',
+    'fr': 'fr-FR',
+    'hi': 'hi-IN',
+}
+
+# Speech-to-Text accepts at most this many alternative_language_codes
+MAX_ALTERNATIVE_LANGUAGES = 3
+
+
+def base_language(code):
+    """Translation-API language for a BCP-47 code reported by STT, e.g. 'en-us' -> 'en', 'cmn-hans-cn' -> 'zh'."""
+    if not code:
+        return None
+    base = code.split('-')[0].lower()
+    return 'zh' if base in ('cmn', 'yue') else base
+
+
+def recognition_languages(source_lang, target_lang):
+    """Primary STT language code and up to MAX_ALTERNATIVE_LANGUAGES alternatives.
+
+    The session's source language goes first, then the target language (people
+    often answer in it), then the other supported languages.
+    """
+    ordered = []
+    for lang in (source_lang, target_lang, *SUPPORTED_LANGUAGES):
+        code = STT_LANGUAGE_CODES.get(lang)
+        if code and code not in ordered:
+            ordered.append(code)
+    return ordered[0], ordered[1:1 + MAX_ALTERNATIVE_LANGUAGES]
@@ -0,0 +1,25 @@
+# backend/translator/lifespan.py
+"""ASGI lifespan handler: warms up the shared Google Cloud clients and loads the
+TTS voice catalog at startup (see readiness.py); writes out pending trial usage
+and closes the Paystack connection pool at shutdown.
+
+Servers that don't send lifespan events (e.g. daphne) fall back to warming up
+on the first /ready/ probe or WebSocket connection, see TranslateConsumer.connect.
+"""
+from .entitlements import usage_flusher
+from .payments import paystack
+from .readiness import readiness
+
+
+class LifespanApp:
+    async def __call__(self, scope, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await readiness.ensure_ready()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await usage_flusher.drain()
+                await paystack.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
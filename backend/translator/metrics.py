@@ -0,0 +1,294 @@
+# backend/translator/metrics.py
+"""Low-overhead metrics and per-stage timing spans for the translation pipeline.
+
+Counters, gauges and histograms live in-process and are rendered in the
+Prometheus text format by the /metrics/ view. Each stage of an utterance is
+timed with `span()`, which also attaches the duration to the utterance's trace
+so that unusually slow utterances can be logged with their full breakdown.
+Spans outside an utterance (auth, payment verification, ...) carry the session
+id set by `set_session()` and are logged on their own when slow or failed.
+Recording a span costs two perf_counter() calls and a few dict operations, so
+this is meant to stay on in production.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import math
+import time
+import weakref
+from contextlib import contextmanager
+
+from django.conf import settings
+
+slow_log = logging.getLogger("femseek.slow_utterances")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def render(self):
+        return self.header() + [f"{self.name}{_format_labels(key)} {value}" for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        self._values[_label_key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]  # bucket counts, count, sum
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[0][index] += 1
+                break
+        state[1] += 1
+        state[2] += value
+
+    def render(self):
+        lines = self.header()
+        for key, (counts, count, total) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._stats = {}  # name -> callable returning a dict of numbers
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation):
+        return self.register(Counter(name, documentation))
+
+    def gauge(self, name, documentation):
+        return self.register(Gauge(name, documentation))
+
+    def histogram(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, buckets))
+
+    def register_stats(self, name, collect):
+        """Exports the numeric values of `collect()` as a gauge labelled by stat name."""
+        self._stats[name] = collect
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, collect in self._stats.items():
+            try:
+                stats = collect()
+            except Exception as e:
+                print(f"Collecting {name} stats failed: {e}")
+                continue
+            lines.append(f"# TYPE femseek_{name} gauge")
+            for stat, value in stats.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)) and not math.isnan(value):
+                    lines.append(f'femseek_{name}{{stat="{stat}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram("femseek_stage_seconds", "Duration of each pipeline stage.")
+utterance_seconds = registry.histogram(
+    "femseek_utterance_seconds", "Time from utterance finalization to its last result being queued."
+)
+utterances_total = registry.counter("femseek_utterances_total", "Utterances processed, by outcome.")
+utterances_dropped = registry.counter(
+    "femseek_utterances_dropped_total",
+    "Utterances (or buffered audio) dropped, by policy: the pipeline was full (drop_oldest, drop_newest), "
+    "the deadline passed (deadline), or a session's audio buffer overflowed (buffer_trim, buffer_full).",
+)
+stages_skipped = registry.counter(
+    "femseek_stages_skipped_total", "Pipeline stages skipped because they weren't needed, by stage and reason."
+)
+upstream_errors = registry.counter("femseek_upstream_errors_total", "Failed pipeline stages, by stage.")
+audio_bytes_sent = registry.counter(
+    "femseek_audio_bytes_total", "Synthesized audio bytes sent to clients, by output profile."
+)
+audio_delivery_seconds = registry.histogram(
+    "femseek_audio_delivery_seconds",
+    "Time from sending synthesized audio until the client acknowledged all of it, by output profile.",
+)
+audio_profile_choices = registry.counter(
+    "femseek_audio_profile_choices_total", "Output profiles chosen for connections, by profile and source."
+)
+loop_lag_seconds = registry.histogram(
+    "femseek_event_loop_lag_seconds", "How late a periodic event-loop tick ran.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+
+# --- Tracing ---
+
+_current_trace = contextvars.ContextVar("femseek_utterance_trace", default=None)
+_current_session = contextvars.ContextVar("femseek_session", default=None)
+
+
+def set_session(session_id):
+    """Tags the spans of the current task (and tasks started from it) with a session id."""
+    _current_session.set(session_id)
+
+
+class UtteranceTrace:
+    """Collects the spans of one utterance; logs them if the utterance was slow."""
+
+    def __init__(self, session_id, utterance_id):
+        self.session_id = session_id
+        self.utterance_id = utterance_id
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def finish(self, outcome):
+        elapsed = time.perf_counter() - self.started
+        utterance_seconds.observe(elapsed)
+        utterances_total.inc(outcome=outcome)
+        if settings.SLOW_UTTERANCE_MS and elapsed * 1000 >= settings.SLOW_UTTERANCE_MS:
+            slow_log.warning(json.dumps({
+                'session': self.session_id,
+                'utterance': self.utterance_id,
+                'outcome': outcome,
+                'total_ms': round(elapsed * 1000, 1),
+                'spans': [
+                    {'stage': stage, 'start_ms': round(start * 1000, 1), 'ms': round(duration * 1000, 1), 'error': error}
+                    for stage, start, duration, error in self.spans
+                ],
+            }))
+
+
+@contextmanager
+def utterance_trace(session_id, utterance_id):
+    """Makes spans inside the block (and tasks started from it) part of one utterance's trace."""
+    current = _current_trace.get()
+    if current is not None and (current.session_id, current.utterance_id) == (session_id, utterance_id):
+        yield current
+        return
+    trace = UtteranceTrace(session_id, utterance_id)
+    token = _current_trace.set(trace)
+    outcome = "ok"
+    try:
+        yield trace
+    except asyncio.CancelledError:
+        outcome = "cancelled"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        _current_trace.reset(token)
+        trace.finish(outcome)
+
+
+@contextmanager
+def span(stage):
+    """Times one stage; failures are counted as upstream errors for that stage.
+
+    Inside utterance_trace() the span is also recorded on that utterance's trace,
+    which carries the session and utterance ids. Other spans are logged with the
+    session id when they fail or take longer than SLOW_UTTERANCE_MS.
+    """
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        error = type(e).__name__
+        upstream_errors.inc(stage=stage)
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        stage_seconds.observe(duration, stage=stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.spans.append((stage, started - trace.started, duration, error))
+        elif settings.SLOW_UTTERANCE_MS and (error or duration * 1000 >= settings.SLOW_UTTERANCE_MS):
+            slow_log.warning(json.dumps({
+                'session': _current_session.get(),
+                'stage': stage,
+                'ms': round(duration * 1000, 1),
+                'error': error,
+            }))
+
+
+# --- Event loop lag ---
+
+_lag_monitors = weakref.WeakKeyDictionary()
+
+
+async def _monitor_loop_lag(interval):
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        loop_lag_seconds.observe(max(0.0, loop.time() - expected))
+
+
+def ensure_loop_monitor(interval=0.25):
+    """Starts measuring event-loop lag on the current loop (once per loop)."""
+    loop = asyncio.get_running_loop()
+    if loop not in _lag_monitors:
+        _lag_monitors[loop] = loop.create_task(_monitor_loop_lag(interval))
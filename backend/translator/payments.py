@@ -0,0 +1,213 @@
+# backend/translator/payments.py
+"""Paystack payment verification and subscription activation.
+
+Verification used to run a blocking `requests.get` on the default executor with
+a new connection every time. The client below keeps one pooled httpx
+AsyncClient per event loop (httpx clients are bound to the loop they were
+created on), so verifications reuse warm TLS connections and don't take threads
+away from the rest of the worker. A reference whose outcome is final is cached,
+and concurrent verifications of the same reference share one request, so a
+retried payment_verification message or a webhook for an already verified
+transaction is answered locally.
+
+The webhook (see views.paystack_webhook) feeds the same cache and activates the
+subscription on its own; connected sessions of that user are told over their
+channel-layer group, so they don't have to poll.
+
+httpx is imported with the first client rather than with this module, which
+every worker loads at boot.
+"""
+import asyncio
+import hashlib
+import hmac
+import weakref
+from collections import OrderedDict
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from users.cache import user_cache
+from users.models import User
+
+from . import metrics
+from .entitlements import entitlements
+
+# Transactions in these states won't change any more; other states (ongoing, pending,
+# abandoned, ...) are verified again on the next request
+FINAL_STATUSES = ('success', 'failed', 'reversed')
+
+
+class PaymentError(Exception):
+    """Paystack couldn't be reached or sent a response we can't use; worth retrying."""
+
+
+class Verification:
+    def __init__(self, reference, status, message='', email=None, amount=None):
+        self.reference = reference
+        self.status = status
+        self.message = message
+        self.email = email
+        self.amount = amount
+
+    @property
+    def ok(self):
+        return self.status == 'success'
+
+    @property
+    def final(self):
+        return self.status in FINAL_STATUSES
+
+    @classmethod
+    def from_transaction(cls, reference, data):
+        customer = data.get('customer') or {}
+        message = data.get('gateway_response') or f"transaction {data.get('status')}"
+        return cls(reference, data.get('status'), message, customer.get('email'), data.get('amount'))
+
+    def belongs_to(self, email):
+        return bool(self.email) and self.email.strip().lower() == email.strip().lower()
+
+
+def user_group(user_id):
+    """The channel-layer group every session of a user joins."""
+    return f"user.{user_id}"
+
+
+class PaystackClient:
+    def __init__(self, base_url, secret_key, timeout=10.0, max_connections=20, cache_size=4096):
+        self.base_url = base_url.rstrip('/')
+        self.secret_key = secret_key or ''
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.cache_size = cache_size
+        self._clients = weakref.WeakKeyDictionary()  # event loop -> httpx.AsyncClient
+        self._verified = OrderedDict()  # reference -> final Verification, oldest first
+        self._inflight = {}  # (loop, reference) -> task
+        self.requests = 0
+        self.cache_hits = 0
+        self.joined = 0
+        self.failures = 0
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            import httpx
+
+            client = self._clients[loop] = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={'Authorization': f"Bearer {self.secret_key}"},
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+        return client
+
+    async def verify(self, reference):
+        """Returns the Verification of `reference`, from the cache if its outcome is final."""
+        cached = self._verified.get(reference)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        key = (asyncio.get_running_loop(), reference)
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(self._fetch(reference))
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.joined += 1
+        # Shielded so one caller giving up doesn't cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def _fetch(self, reference):
+        import httpx
+
+        self.requests += 1
+        try:
+            with metrics.span('payment'):
+                response = await self._client().get(f"/transaction/verify/{reference}")
+            if response.status_code >= 500:
+                raise PaymentError(f"Paystack returned HTTP {response.status_code}")
+            body = response.json()
+        except httpx.HTTPError as e:
+            self.failures += 1
+            raise PaymentError(f"Network error: {e}") from e
+        except ValueError as e:
+            self.failures += 1
+            raise PaymentError(f"Invalid JSON response from Paystack: {response.text[:200]}") from e
+        except PaymentError:
+            self.failures += 1
+            raise
+
+        if not body.get('status') or not isinstance(body.get('data'), dict):
+            # e.g. an unknown reference; not cached, the transaction may still appear
+            return Verification(reference, None, body.get('message', 'Unknown error'))
+        return self.remember(Verification.from_transaction(reference, body['data']))
+
+    def remember(self, verification):
+        """Caches a final outcome (from a verify call or a webhook) and returns it."""
+        if verification.final:
+            self._verified[verification.reference] = verification
+            self._verified.move_to_end(verification.reference)
+            while len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        return verification
+
+    def valid_signature(self, body, signature):
+        """Checks a webhook's X-Paystack-Signature: the HMAC-SHA512 of the raw body."""
+        if not self.secret_key or not signature:
+            return False
+        expected = hmac.new(self.secret_key.encode(), body, hashlib.sha512).hexdigest()
+        return hmac.compare_digest(expected, signature)
+
+    async def aclose(self):
+        """Closes the connection pool of the current event loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'cache_hits': self.cache_hits,
+            'joined': self.joined,
+            'failures': self.failures,
+            'cached_references': len(self._verified),
+            'inflight': len(self._inflight),
+        }
+
+
+async def activate_subscription(user, reference):
+    """Marks `user` as subscribed (idempotently) and tells all of their sessions."""
+    if not user.is_subscribed or user.trial_sessions_count:
+        user.is_subscribed = True
+        user.trial_sessions_count = 0  # Reset trial count on subscription
+        with metrics.span('db_save'):
+            await user.asave(update_fields=['is_subscribed', 'trial_sessions_count'])
+        print(f"Payment {reference} verified for {user.email}. User is now subscribed.")
+    entitlements.invalidate(user)
+    await user_cache.invalidate(user)
+    channel_layer = get_channel_layer()
+    if channel_layer is not None:
+        await channel_layer.group_send(user_group(user.pk), {'type': 'subscription.activated', 'reference': reference})
+
+
+async def activate_subscription_for(verification):
+    """Webhook path: finds the user by the transaction's customer email."""
+    if not verification.email:
+        return False
+    try:
+        user = await User.objects.aget(email__iexact=verification.email)
+    except User.DoesNotExist:
+        print(f"Paystack payment {verification.reference} for unknown email {verification.email}.")
+        return False
+    await activate_subscription(user, verification.reference)
+    return True
+
+
+paystack = PaystackClient(
+    settings.PAYSTACK_BASE_URL,
+    settings.PAYSTACK_SECRET_KEY,
+    timeout=settings.PAYSTACK_TIMEOUT,
+    max_connections=settings.PAYSTACK_MAX_CONNECTIONS,
+)
+
+metrics.registry.register_stats('paystack', paystack.stats)
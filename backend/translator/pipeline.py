@@ -0,0 +1,146 @@
+# backend/translator/pipeline.py
+"""Per-connection utterance pipeline.
+
+Each finalized utterance becomes an UtteranceJob that starts processing right
+away, so STT/translation/TTS of one utterance overlap with the capture and STT
+of the next. Jobs write their output into a private outbox, and a single
+delivery task drains the outboxes strictly in sequence order, so the client
+always receives results in the order the utterances were spoken.
+"""
+import asyncio
+import json
+from collections import deque, namedtuple
+
+from . import metrics
+
+DROP_OLDEST = "drop_oldest"  # Cancel the oldest utterance that hasn't started delivering
+DROP_NEWEST = "drop_newest"  # Refuse the utterance that was just submitted
+OVERFLOW_POLICIES = (DROP_OLDEST, DROP_NEWEST)
+
+_CLOSED = object()
+
+# Outbox marker: the synthesized audio that follows is about to go out (see UtteranceJob.audio_sent)
+AudioSent = namedtuple("AudioSent", ["audio_id", "size", "profile"])
+
+
+class UtteranceJob:
+    """One utterance moving through the pipeline, with its own ordered outbox."""
+
+    def __init__(self, seq):
+        self.seq = seq
+        self.task = None
+        self.dropped = False
+        self.delivering = False
+        self._outbox = asyncio.Queue()
+
+    async def send(self, text_data=None, bytes_data=None):
+        await self._outbox.put((text_data, bytes_data))
+
+    async def send_json(self, message):
+        """Queues a JSON message for the client, tagged with this utterance's sequence number."""
+        await self.send(text_data=json.dumps({**message, 'seq': self.seq}))
+
+    async def send_error(self, message):
+        await self.send_json({'type': 'error', 'message': message})
+
+    async def audio_sent(self, audio_id, size, profile):
+        """Announces the audio sent next, so its delivery can be timed until the client's ack."""
+        await self._outbox.put(AudioSent(audio_id, size, profile))
+
+    def close(self):
+        self._outbox.put_nowait(_CLOSED)
+
+
+class UtterancePipeline:
+    """Bounded, ordered work queue of utterances for a single WebSocket connection."""
+
+    def __init__(self, send, max_depth=3, overflow=DROP_OLDEST, on_audio=None):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self._send = send
+        self._on_audio = on_audio  # on_audio(audio_id, size, profile) as the audio goes out
+        self.max_depth = max_depth
+        self.overflow = overflow
+        self._next_seq = 1
+        self._jobs = deque()  # Jobs not yet fully delivered, in sequence order
+        self._wakeup = asyncio.Event()
+        self._delivery_task = asyncio.create_task(self._deliver())
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def submit(self, process):
+        """Starts `process(job)` for a new utterance; returns the job, or None if it was dropped."""
+        if len(self._jobs) >= self.max_depth and not self._make_room():
+            seq = self._take_seq()
+            print(f"Utterance pipeline full ({self.max_depth}); dropping new utterance #{seq}.")
+            metrics.utterances_dropped.inc(policy=self.overflow)
+            asyncio.create_task(self._send(text_data=json.dumps({
+                'type': 'utterance_dropped', 'seq': seq, 'reason': 'queue_full',
+            })))
+            return None
+
+        job = UtteranceJob(self._take_seq())
+        job.task = asyncio.create_task(self._run(job, process))
+        self._jobs.append(job)
+        self._wakeup.set()
+        return job
+
+    def _take_seq(self):
+        seq = self._next_seq
+        self._next_seq += 1
+        return seq
+
+    def _make_room(self):
+        if self.overflow == DROP_NEWEST:
+            return False
+        for job in self._jobs:
+            if not job.delivering and not job.dropped:
+                print(f"Utterance pipeline full ({self.max_depth}); dropping oldest utterance #{job.seq}.")
+                metrics.utterances_dropped.inc(policy=self.overflow)
+                job.dropped = True
+                job.task.cancel()
+                self._jobs.remove(job)
+                asyncio.create_task(self._send(text_data=json.dumps({
+                    'type': 'utterance_dropped', 'seq': job.seq, 'reason': 'queue_full',
+                })))
+                return True
+        return False
+
+    async def _run(self, job, process):
+        try:
+            await process(job)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Error processing utterance #{job.seq}: {e}")
+            await job.send_error(f"Failed to process translation: {e}. Please try again.")
+        finally:
+            job.close()
+
+    async def _deliver(self):
+        while True:
+            if not self._jobs:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            job = self._jobs[0]
+            job.delivering = True
+            while True:
+                item = await job._outbox.get()
+                if item is _CLOSED:
+                    break
+                if isinstance(item, AudioSent):
+                    if self._on_audio is not None:
+                        self._on_audio(*item)
+                    continue
+                text_data, bytes_data = item
+                await self._send(text_data=text_data, bytes_data=bytes_data)
+            self._jobs.popleft()
+
+    def close(self):
+        """Cancels all in-flight utterances and the delivery task."""
+        for job in self._jobs:
+            job.task.cancel()
+        self._jobs.clear()
+        self._delivery_task.cancel()
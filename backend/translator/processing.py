@@ -0,0 +1,241 @@
+# backend/translator/processing.py
+"""STT -> translation -> TTS orchestration for a single utterance.
+
+An UtteranceProcessor carries a snapshot of the session's settings (source and
+target language, audio transport and output profile, incremental and text-only
+mode) and writes its output to a job with the UtteranceJob interface (send / send_json / send_error). The job is
+either a pipeline job of the WebSocket consumer itself or, when translation
+workers are enabled, a RemoteJob in a background worker that relays the output
+back over the channel layer (see translator/workers.py).
+"""
+import asyncio
+import base64
+
+from django.conf import settings
+
+from . import metrics
+from .audio_profiles import DEFAULT_PROFILE, PROFILES_BY_NAME
+from .batching import translation_batcher
+from .cache import translation_cache
+from .languages import base_language, recognition_languages
+from .scheduler import DeadlineExceeded, scheduler
+from .segmentation import split_clauses
+from .tts_cache import synthesis_key, tts_cache
+from .voices import voice_catalog
+
+
+class UtteranceProcessor:
+    def __init__(self, providers, target_lang='en', audio_transport='json', incremental=False,
+                 source_lang=None, text_only=False, audio_profile=DEFAULT_PROFILE.name):
+        self.providers = providers
+        self.target_lang = target_lang
+        self.audio_transport = audio_transport
+        # TTS output encoding and sample rate (see audio_profiles.py)
+        self.audio_profile = PROFILES_BY_NAME[audio_profile]
+        self.incremental = incremental
+        # The session's (last detected or declared) source language; updated by process_audio
+        # with the language STT detected for this utterance
+        self.source_lang = source_lang
+        self.detected_lang = None
+        self.text_only = text_only
+
+    def recognition_options(self):
+        # Use WEBM_OPUS as specified in frontend
+        # STT detects the spoken language among the primary and alternative codes
+        language_code, alternatives = recognition_languages(
+            self.source_lang or settings.DEFAULT_SOURCE_LANG, self.target_lang
+        )
+        return {
+            'encoding': 'WEBM_OPUS',
+            'sample_rate_hertz': 48000,
+            'language_code': language_code,
+            'alternative_language_codes': alternatives,
+            # Enable automatic punctuation for better transcription quality
+            'enable_automatic_punctuation': True,
+        }
+
+    async def process_audio(self, job, audio_data):
+        """Transcribes a finished utterance and translates it; returns True if audio was sent."""
+        try:
+            # 1. Speech-to-Text (STT)
+            print("Sending audio to STT...")
+            async with scheduler.slot('stt'):
+                with metrics.span('stt'):
+                    transcript = await self.providers.speech.recognize(audio_data, self.recognition_options())
+
+            if transcript is None:
+                print("No speech detected or no alternatives found.")
+                await job.send_json({'type': 'transcription_update', 'text': ''}) # Clear input area
+                return False # Ignore if no speech was detected
+
+            transcribed_text = transcript.text
+            self.detected_lang = base_language(transcript.language_code)
+            if self.detected_lang:
+                self.source_lang = self.detected_lang
+            print(f"Transcribed text ({self.detected_lang or 'unknown language'}): {transcribed_text}")
+            await job.send_json({
+                'type': 'transcription_update',
+                'text': transcribed_text,
+                'is_final': True,
+                'language': self.detected_lang,
+            })
+        except DeadlineExceeded as e:
+            await self.drop_late_utterance(job, e)
+            return False
+        except Exception as e:
+            print(f"An error occurred during speech recognition: {e}")
+            await job.send_error(f"Failed to process translation: {e}. Please try again.")
+            return False
+
+        return await self.translate_and_speak(job, transcribed_text)
+
+    async def translate_text(self, text, target_lang):
+        """Returns the translation of `text`, from the cache when possible."""
+        if self.source_lang == target_lang:
+            # Already in the target language
+            metrics.stages_skipped.inc(stage='translate', reason='same_language')
+            return text
+
+        cached = await translation_cache.get(text, target_lang)
+        if cached is not None:
+            print(f"Translation cache hit for {target_lang}: {text}")
+            return cached
+
+        # Batched with other sessions' requests for the same language into one API call,
+        # which takes the scheduler slot; this request only has to be admitted
+        print(f"Translating to {target_lang}: {text}")
+        await scheduler.admit('translate')
+        with metrics.span('translate'):
+            translated_text = await translation_batcher.translate(text, target_lang)
+        await translation_cache.set(text, target_lang, translated_text)
+        return translated_text
+
+    def synthesis_request(self, text, target_lang):
+        # Most natural available voice for the language: Neural2, WaveNet or Standard (see voices.py)
+        voice = voice_catalog.voice_for(target_lang)
+        return {
+            'text': text,
+            'language_code': voice.language_code,
+            'ssml_gender': voice.ssml_gender,
+            'voice_name': voice.name,
+            'audio_encoding': self.audio_profile.encoding,
+            'sample_rate_hertz': self.audio_profile.sample_rate_hertz,
+            # Adjust speaking rate, pitch for naturalness
+            'speaking_rate': 1.0, # 1.0 is normal
+            'pitch': 0.0, # 0.0 is normal
+        }
+
+    async def synthesize(self, text, target_lang):
+        """Returns synthesized speech for `text`, from the content-addressed cache when possible."""
+        request = self.synthesis_request(text, target_lang)
+        key = synthesis_key(request)
+        cached = await tts_cache.get(key)
+        if cached is not None:
+            print("TTS cache hit.")
+            return cached
+
+        print("Synthesizing speech...")
+        async with scheduler.slot('tts'):
+            with metrics.span('tts'):
+                audio_content = await self.providers.synthesis.synthesize(request)
+        await tts_cache.set(key, audio_content)
+        return audio_content
+
+    async def send_audio(self, job, text, audio_content, audio_id, message_type='translation_result', **extra):
+        """Sends translated text and audio in the transport negotiated by the client.
+
+        The client acknowledges `audio_id` once it has all of the audio, which
+        times its delivery (see LinkEstimator).
+        """
+        profile = self.audio_profile
+        extra.update(audio_id=audio_id, profile=profile.name, mime_type=profile.mime_type)
+        if self.audio_transport != 'binary':
+            encoded = base64.b64encode(audio_content).decode('utf-8')
+            await job.audio_sent(audio_id, len(encoded), profile.name)
+            await job.send_json({
+                'type': message_type,
+                'text': text,
+                'audio': encoded,
+                **extra,
+            })
+            return
+
+        # Binary: a small JSON header, then the raw audio split into frames the client
+        # can start playing before the last one arrives
+        chunk_size = settings.AUDIO_FRAME_BYTES
+        audio = memoryview(audio_content)
+        await job.audio_sent(audio_id, len(audio), profile.name)
+        await job.send_json({
+            'type': message_type,
+            'text': text,
+            'length': len(audio),
+            'frames': -(-len(audio) // chunk_size),
+            **extra,
+        })
+        for offset in range(0, len(audio), chunk_size):
+            await job.send(bytes_data=bytes(audio[offset:offset + chunk_size]))
+
+    async def translate_and_speak_incrementally(self, job, transcribed_text, target_lang):
+        """Translates and synthesizes each clause concurrently, streaming the audio out in order."""
+        clauses = split_clauses(transcribed_text, min_chars=settings.INCREMENTAL_MIN_CLAUSE_CHARS)
+
+        async def speak_clause(clause):
+            translated = await self.translate_text(clause, target_lang)
+            return translated, await self.synthesize(translated, target_lang)
+
+        tasks = [asyncio.create_task(speak_clause(clause)) for clause in clauses]
+        translated_clauses = []
+        try:
+            for index, task in enumerate(tasks):
+                translated, audio_content = await task
+                translated_clauses.append(translated)
+                await self.send_audio(
+                    job, translated, audio_content, f"{job.seq}.{index}",
+                    message_type='translation_segment', segment=index, segments=len(tasks),
+                )
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        separator = '' if target_lang == 'zh' else ' '
+        await job.send_json({
+            'type': 'utterance_complete',
+            'text': separator.join(translated_clauses),
+            'segments': len(tasks),
+        })
+        print(f"Translation sent to frontend in {len(tasks)} segments.")
+
+    async def translate_and_speak(self, job, transcribed_text):
+        """Translates a finished transcript and sends back the audio; returns True on success."""
+        try:
+            if self.text_only:
+                translated_text = await self.translate_text(transcribed_text, self.target_lang)
+                metrics.stages_skipped.inc(stage='tts', reason='text_only')
+                await job.send_json({'type': 'translation_result', 'text': translated_text, 'text_only': True})
+                print("Translation sent to frontend (text only).")
+            elif self.incremental:
+                await self.translate_and_speak_incrementally(job, transcribed_text, self.target_lang)
+            else:
+                # 2. Google Translation API (cached)
+                translated_text = await self.translate_text(transcribed_text, self.target_lang)
+                print(f"Translated text: {translated_text}")
+
+                # 3. Google Text-to-Speech (TTS), skipped entirely on a cache hit
+                audio_content = await self.synthesize(translated_text, self.target_lang)
+
+                # Send the final result back to the client
+                await self.send_audio(job, translated_text, audio_content, str(job.seq))
+                print("Translation sent to frontend.")
+            return True
+        except DeadlineExceeded as e:
+            await self.drop_late_utterance(job, e)
+            return False
+        except Exception as e:
+            print(f"An error occurred during translation: {e}")
+            await job.send_error(f"Failed to process translation: {e}. Please try again.")
+            return False
+
+    async def drop_late_utterance(self, job, reason):
+        print(f"Dropping utterance #{job.seq}: {reason}")
+        metrics.utterances_dropped.inc(policy='deadline')
+        await job.send_json({'type': 'utterance_dropped', 'reason': 'deadline'})
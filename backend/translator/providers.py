@@ -0,0 +1,190 @@
+# backend/translator/providers.py
+"""Provider abstraction for the three upstream APIs of the translation pipeline.
+
+The consumer only talks to a SpeechProvider, TranslationProvider and
+SynthesisProvider, using plain Python values (bytes, strings, dicts). The
+Google implementations below translate those into SDK requests; the fakes in
+translator/fakes.py let the pipeline run and be benchmarked without any cloud
+credentials. Select the implementation with settings.TRANSLATOR_PROVIDER.
+"""
+import asyncio
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+# A recognition result: the text, the language it was recognized in (if known) and
+# whether the recognizer considers it final.
+Transcript = namedtuple("Transcript", ["text", "language_code", "is_final"])
+
+Providers = namedtuple("Providers", ["speech", "translation", "synthesis"])
+
+
+class SpeechProvider(ABC):
+    """Speech-to-Text. `options` is a dict of recognition settings (see UtteranceProcessor.recognition_options)."""
+
+    @abstractmethod
+    async def recognize(self, audio, options):
+        """Recognizes a complete utterance (bytes-like, often a memoryview).
+
+        Returns a Transcript, or None if nothing was said.
+        """
+
+    @abstractmethod
+    async def streaming_recognize(self, audio_chunks, options):
+        """Async generator of Transcripts (interim and final) for an async iterable of audio chunks."""
+        yield
+
+
+class TranslationProvider(ABC):
+    @abstractmethod
+    async def translate(self, texts, target_lang):
+        """Translates a list of texts; returns the translations in the same order."""
+
+
+class SynthesisProvider(ABC):
+    """Text-to-Speech. `request` is a plain dict, see UtteranceProcessor.synthesis_request."""
+
+    @abstractmethod
+    async def synthesize(self, request):
+        """Returns the synthesized audio bytes."""
+
+    @abstractmethod
+    async def list_voices(self):
+        """Returns the available voices as dicts: name, language_codes, ssml_gender, natural_sample_rate_hertz."""
+
+
+class GoogleSpeechProvider(SpeechProvider):
+    def _config(self, options):
+        from google.cloud.speech_v1 import RecognitionConfig
+
+        return RecognitionConfig(
+            encoding=RecognitionConfig.AudioEncoding[options['encoding']],
+            sample_rate_hertz=options['sample_rate_hertz'],
+            language_code=options['language_code'],
+            alternative_language_codes=options.get('alternative_language_codes', []),
+            enable_automatic_punctuation=options.get('enable_automatic_punctuation', True),
+        )
+
+    async def recognize(self, audio, options):
+        from .clients import registry
+
+        client = await registry.speech()  # Also loads the SDK, off the event loop
+        from google.cloud.speech_v1 import RecognitionAudio
+
+        # The request message needs its own bytes; this is the only copy of the utterance
+        response = await client.recognize(
+            config=self._config(options), audio=RecognitionAudio(content=bytes(audio))
+        )
+        if not response.results or not response.results[0].alternatives:
+            return None
+        result = response.results[0]
+        return Transcript(result.alternatives[0].transcript, result.language_code or None, True)
+
+    async def streaming_recognize(self, audio_chunks, options):
+        from .clients import registry
+
+        client = await registry.speech()
+        from google.cloud import speech
+
+        async def requests():
+            # The first request carries the config, every following one a chunk of audio
+            yield speech.StreamingRecognizeRequest(
+                streaming_config=speech.StreamingRecognitionConfig(
+                    config=self._config(options),
+                    interim_results=True,
+                )
+            )
+            async for chunk in audio_chunks:
+                yield speech.StreamingRecognizeRequest(audio_content=chunk)
+
+        responses = await client.streaming_recognize(requests=requests())
+        async for response in responses:
+            for result in response.results:
+                if result.alternatives:
+                    yield Transcript(result.alternatives[0].transcript, result.language_code or None, result.is_final)
+
+
+class GoogleTranslationProvider(TranslationProvider):
+    def __init__(self, max_workers=8):
+        # The v2 client is synchronous; a dedicated pool keeps it off the default executor
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="translate")
+
+    async def translate(self, texts, target_lang):
+        from .clients import registry
+
+        client = await registry.translate()
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(
+            self._executor, lambda: client.translate(texts, target_language=target_lang)
+        )
+        return [result['translatedText'] for result in results]
+
+
+class GoogleSynthesisProvider(SynthesisProvider):
+    async def synthesize(self, request):
+        from .clients import registry
+
+        client = await registry.tts()
+        from google.cloud import texttospeech
+
+        synthesis_input = texttospeech.SynthesisInput(text=request['text'])
+        voice_params = texttospeech.VoiceSelectionParams(
+            language_code=request['language_code'],
+            ssml_gender=texttospeech.SsmlVoiceGender[request['ssml_gender']],
+            name=request['voice_name'] or '',  # Unset: Google picks a voice for the language
+        )
+        audio_config = texttospeech.AudioConfig(
+            audio_encoding=texttospeech.AudioEncoding[request['audio_encoding']],
+            sample_rate_hertz=request['sample_rate_hertz'],
+            speaking_rate=request['speaking_rate'],
+            pitch=request['pitch'],
+        )
+        response = await client.synthesize_speech(
+            input=synthesis_input, voice=voice_params, audio_config=audio_config
+        )
+        return response.audio_content
+
+    async def list_voices(self):
+        from .clients import registry
+
+        response = await (await registry.tts()).list_voices()
+        return [
+            {
+                'name': voice.name,
+                'language_codes': list(voice.language_codes),
+                'ssml_gender': voice.ssml_gender.name,
+                'natural_sample_rate_hertz': voice.natural_sample_rate_hertz,
+            }
+            for voice in response.voices
+        ]
+
+
+_providers = None
+
+
+def get_providers():
+    """Returns the configured providers, creating them on first use."""
+    global _providers
+    if _providers is None:
+        if settings.TRANSLATOR_PROVIDER == 'fake':
+            from .fakes import fake_providers
+            _providers = fake_providers(settings.FAKE_PROVIDER_OPTIONS)
+        elif settings.TRANSLATOR_PROVIDER == 'google':
+            _providers = Providers(
+                speech=GoogleSpeechProvider(),
+                translation=GoogleTranslationProvider(max_workers=settings.TRANSLATION_EXECUTOR_WORKERS),
+                synthesis=GoogleSynthesisProvider(),
+            )
+        else:
+            raise ValueError(f"Unknown TRANSLATOR_PROVIDER: {settings.TRANSLATOR_PROVIDER}")
+    return _providers
+
+
+def ensure_warm():
+    """Starts warming up the shared Google clients (no-op for other providers)."""
+    if settings.TRANSLATOR_PROVIDER == 'google' and settings.GOOGLE_CLIENT_WARMUP:
+        from .clients import registry
+        return registry.ensure_warm()
+    return None
@@ -0,0 +1,88 @@
+# backend/translator/readiness.py
+"""Startup phases and readiness of this worker.
+
+A new instance used to take sessions as soon as it listened, and its first
+sessions then waited for the Google client libraries to import, authenticate
+and open their channels. `readiness` runs that warm-up (providers, Google
+clients, TTS voice catalog) once per event loop, timing each phase, and the
+/ready/ endpoint only answers 200 once it succeeded, so the load balancer keeps
+traffic away until then. asgi.py adds the boot phases that run before there is
+an event loop (Django setup, loading the ASGI application).
+"""
+import asyncio
+import time
+import weakref
+
+from django.conf import settings
+
+from . import metrics
+from .providers import ensure_warm, get_providers
+from .voices import voice_catalog
+
+# A failed warm-up is retried by the next connection or probe, but not more often than this
+RETRY_SECONDS = 10
+
+
+class Readiness:
+    def __init__(self):
+        self.phases = {}  # phase -> seconds, in the order the phases ran
+        self.ready = False
+        self._warmups = weakref.WeakKeyDictionary()  # event loop -> warm-up task
+        self._failed_at = None
+
+    def record(self, phase, seconds):
+        self.phases[phase] = seconds
+
+    async def _timed(self, phase, awaitable):
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.record(phase, time.perf_counter() - started)
+
+    def _clients_warm(self):
+        if settings.TRANSLATOR_PROVIDER != 'google' or not settings.GOOGLE_CLIENT_WARMUP:
+            return True
+        from .clients import registry
+        return registry.warmed_up()
+
+    async def warm_up(self):
+        started = time.perf_counter()
+        try:
+            get_providers()
+            self.record('providers', time.perf_counter() - started)
+            warm_up = ensure_warm()
+            if warm_up is not None:
+                await self._timed('google_clients', warm_up)
+            # The voice catalog falls back to default voices, so it doesn't gate readiness
+            refresh = voice_catalog.ensure_fresh()
+            if refresh is not None:
+                await self._timed('voices', refresh)
+        except Exception as e:
+            print(f"Warm-up failed: {e}")
+        self.ready = self._clients_warm()
+        if self.ready:
+            print(f"Worker ready after a {time.perf_counter() - started:.2f}s warm-up.")
+        else:
+            self._failed_at = time.monotonic()
+
+    def ensure_ready(self):
+        """Starts the warm-up of the current loop unless it ran or is running; returns its task."""
+        loop = asyncio.get_running_loop()
+        task = self._warmups.get(loop)
+        retry = (task is not None and task.done() and not self.ready
+                 and time.monotonic() - self._failed_at >= RETRY_SECONDS)
+        if task is None or retry:
+            task = self._warmups[loop] = loop.create_task(self.warm_up())
+        return task
+
+    def stats(self):
+        return {
+            'ready': int(self.ready),
+            **{f"{phase}_seconds": round(seconds, 3) for phase, seconds in self.phases.items()},
+        }
+
+
+readiness = Readiness()
+
+metrics.registry.register_stats('startup', readiness.stats)
@@ -0,0 +1,260 @@
+# backend/translator/scheduler.py
+"""Process-wide fair-share scheduler for upstream API calls.
+
+Sessions used to call STT/Translation/TTS as fast as pauses arrived, so a spike
+ran into the upstream quotas and slowed everyone down alike. Every upstream
+call now goes through `scheduler.slot(api)`:
+
+* each API has a concurrency limit and a token-bucket rate budget,
+* each user has a token bucket of their own, so one chatty client can't use
+  up the shared budget,
+* waiting calls are served by priority class (subscribers before trial users)
+  and, within a class, round-robin across users (start-time fair queuing),
+* a call still queued when its utterance's deadline passes is dropped with
+  DeadlineExceeded instead of producing a translation nobody is waiting for.
+
+Who is calling is carried by a contextvar Ticket, set once per utterance with
+`use_ticket()`; calls made outside of any ticket are only subject to the API
+limits. Translation requests are merged into batches across sessions (see
+batching.py): each request only passes `scheduler.admit()` (its deadline and
+its user's budget), and the API slot is taken by the batch's upstream call.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from collections import namedtuple
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+
+# Priority classes, served in this order
+SUBSCRIBER = 0
+TRIAL = 1
+
+# Who an upstream call is made for; deadline is a time.time() timestamp or None.
+# A call made for several users at once (a batch) has user_id None.
+Ticket = namedtuple("Ticket", ["user_id", "priority", "deadline"])
+
+DEFAULT_API_LIMITS = {
+    'stt': {'concurrency': 32, 'rate': 50, 'burst': 50},
+    'translate': {'concurrency': 32, 'rate': 100, 'burst': 100},
+    'tts': {'concurrency': 32, 'rate': 50, 'burst': 50},
+}
+
+_current_ticket = contextvars.ContextVar("femseek_scheduler_ticket", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The utterance can no longer be delivered within its latency target."""
+
+
+@contextmanager
+def use_ticket(ticket):
+    """Schedules the upstream calls inside the block (and tasks started from it) for `ticket`."""
+    token = _current_ticket.set(ticket)
+    try:
+        yield ticket
+    finally:
+        _current_ticket.reset(token)
+
+
+def current_ticket():
+    """The Ticket set by the enclosing use_ticket() block, or None."""
+    return _current_ticket.get()
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """Takes a token and returns 0, or returns the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def idle(self):
+        return self.tokens + (time.monotonic() - self.updated) * self.rate >= self.burst
+
+
+class _Waiter:
+    def __init__(self, future, deadline):
+        self.future = future
+        self.deadline = deadline
+
+
+class APIQueue:
+    """Concurrency slots and rate budget of one upstream API, with a fair queue in front."""
+
+    def __init__(self, name, concurrency=32, rate=0, burst=None):
+        self.name = name
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst or rate) if rate else None
+        self.active = 0
+        self._heap = []  # (priority, virtual start tag, seq, waiter)
+        self._seq = itertools.count()
+        self._vclock = 0.0  # Tag of the last dispatched call
+        self._user_tags = {}  # user id -> tag of that user's last queued call
+        self._timer = None
+        self.dispatched = 0
+        self.dropped = 0
+        self.wait_seconds = 0.0
+
+    def enqueue(self, ticket):
+        future = asyncio.get_running_loop().create_future()
+        waiter = _Waiter(future, ticket.deadline if ticket else None)
+        if ticket is None:
+            priority, tag = SUBSCRIBER, self._vclock
+        else:
+            # Each call starts after the user's previous one, so users take turns
+            priority = ticket.priority
+            tag = max(self._vclock, self._user_tags.get(ticket.user_id, 0.0)) + 1
+            self._user_tags[ticket.user_id] = tag
+        heapq.heappush(self._heap, (priority, tag, next(self._seq), waiter))
+        self.dispatch()
+        return waiter
+
+    def _timer_fired(self):
+        self._timer = None
+        self.dispatch()
+
+    def dispatch(self):
+        while self._heap and self.active < self.concurrency:
+            _, tag, _, waiter = self._heap[0]
+            if waiter.future.done():  # Gave up waiting
+                heapq.heappop(self._heap)
+                continue
+            if waiter.deadline is not None and time.time() > waiter.deadline:
+                heapq.heappop(self._heap)
+                self.dropped += 1
+                waiter.future.set_exception(DeadlineExceeded(f"{self.name} call missed its deadline"))
+                continue
+            if self.bucket is not None:
+                delay = self.bucket.take()
+                if delay:
+                    # A pending timer already fires when the next token is due
+                    if self._timer is None:
+                        self._timer = asyncio.get_running_loop().call_later(delay, self._timer_fired)
+                    return
+            heapq.heappop(self._heap)
+            self._vclock = max(self._vclock, tag)
+            self.active += 1
+            self.dispatched += 1
+            waiter.future.set_result(None)
+        if not self._heap:
+            # Nobody is waiting, so no user can be ahead of the clock any more
+            self._user_tags.clear()
+
+    def release(self):
+        self.active -= 1
+        self.dispatch()
+
+    def stats(self):
+        return {
+            'active': self.active,
+            'waiting': sum(1 for *_, waiter in self._heap if not waiter.future.done()),
+            'dispatched': self.dispatched,
+            'dropped': self.dropped,
+            'wait_seconds': round(self.wait_seconds, 3),
+        }
+
+
+class Scheduler:
+    def __init__(self, api_limits=None, user_rate=5.0, user_burst=15):
+        self.apis = {name: APIQueue(name, **limits) for name, limits in (api_limits or {}).items()}
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self._user_buckets = {}  # user id -> TokenBucket
+
+    def _user_bucket(self, user_id):
+        bucket = self._user_buckets.get(user_id)
+        if bucket is None:
+            if len(self._user_buckets) > 10000:
+                # Full buckets carry no state worth keeping
+                self._user_buckets = {uid: b for uid, b in self._user_buckets.items() if not b.idle()}
+            bucket = self._user_buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+        return bucket
+
+    async def _wait_for_user_budget(self, ticket):
+        if not self.user_rate:
+            return
+        bucket = self._user_bucket(ticket.user_id)
+        while True:
+            delay = bucket.take()
+            if not delay:
+                return
+            if ticket.deadline is not None and time.time() + delay > ticket.deadline:
+                raise DeadlineExceeded("User rate budget exhausted until after the deadline")
+            await asyncio.sleep(delay)
+
+    async def admit(self, api):
+        """Checks the ticket's deadline and waits for its user's budget, without taking an `api` slot.
+
+        For requests that are merged into one upstream call, which takes the slot instead.
+        """
+        ticket = _current_ticket.get()
+        queue = self.apis.get(api)
+        if queue is None or ticket is None:
+            return
+        if ticket.deadline is not None and time.time() > ticket.deadline:
+            queue.dropped += 1
+            raise DeadlineExceeded(f"Deadline passed before the {api} call")
+        if ticket.user_id is not None:
+            await self._wait_for_user_budget(ticket)
+
+    @asynccontextmanager
+    async def slot(self, api):
+        """Waits for this ticket's turn to call `api`, and holds a concurrency slot for the block."""
+        ticket = _current_ticket.get()
+        queue = self.apis.get(api)
+        if queue is None:
+            yield
+            return
+        await self.admit(api)
+
+        started = time.monotonic()
+        waiter = queue.enqueue(ticket)
+        future = waiter.future
+        try:
+            timeout = None if waiter.deadline is None else max(0.0, waiter.deadline - time.time())
+            await asyncio.wait({future}, timeout=timeout)
+        except BaseException:
+            # Cancelled while queued: give back the slot if it was granted meanwhile
+            if future.done() and not future.cancelled() and future.exception() is None:
+                queue.release()
+            future.cancel()
+            raise
+        if not future.done():
+            future.cancel()  # The dispatcher skips cancelled waiters
+            queue.dropped += 1
+            raise DeadlineExceeded(f"Deadline passed while waiting for {api}")
+        future.result()  # Raises DeadlineExceeded if the dispatcher dropped us
+        queue.wait_seconds += time.monotonic() - started
+        try:
+            yield
+        finally:
+            queue.release()
+
+    def stats(self):
+        stats = {}
+        for name, queue in self.apis.items():
+            for stat, value in queue.stats().items():
+                stats[f"{name}_{stat}"] = value
+        stats['tracked_users'] = len(self._user_buckets)
+        return stats
+
+
+scheduler = Scheduler(
+    api_limits={**DEFAULT_API_LIMITS, **settings.API_LIMITS},
+    user_rate=settings.USER_CALL_RATE,
+    user_burst=settings.USER_CALL_BURST,
+)
@@ -0,0 +1,30 @@
+# backend/translator/segmentation.py
+"""Splits transcripts into clauses for incremental translation and synthesis."""
+import re
+
+# Sentence ends and clause separators, including CJK and Devanagari punctuation.
+# Each match is one clause with its closing punctuation and trailing whitespace.
+_CLAUSE = re.compile(r"[^.!?;:,。！？；，、।]*(?:[.!?;:,。！？；，、।]+\s*|$)")
+
+
+def split_clauses(text, min_chars=25):
+    """Returns the clauses of `text`, merging short fragments into their neighbour.
+
+    Very short pieces ("Yes,", "Well,") are not worth a separate round trip and
+    translate badly without context, so clauses are accumulated until they
+    reach `min_chars`.
+    """
+    clauses = []
+    current = ""
+    # Pieces keep their original trailing whitespace, so joining them restores the text
+    for piece in _CLAUSE.findall(text.strip()):
+        current += piece
+        if len(current.strip()) >= min_chars:
+            clauses.append(current)
+            current = ""
+    if current.strip():
+        if clauses:
+            clauses[-1] += current
+        else:
+            clauses.append(current)
+    return [clause.strip() for clause in clauses]
@@ -0,0 +1,486 @@
+# backend/translator/tests.py
+import asyncio
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase
+
+from bench.fixtures import build_fixture
+from users.models import User
+from . import metrics
+from .admission import AdmissionController
+from .batching import TranslationBatcher, batch_ticket
+from .entitlements import Entitlement, UsageFlusher
+from .pipeline import DROP_NEWEST, DROP_OLDEST, UtterancePipeline
+from .processing import UtteranceProcessor
+from .providers import Transcript
+from .scheduler import SUBSCRIBER, TRIAL, DeadlineExceeded, Scheduler, Ticket, use_ticket
+from .voices import Voice, VoiceCatalog
+from .webm import UtteranceBuffer, WebMDemuxer
+
+
+class StreamingRestartTests(SimpleTestCase):
+    def packets(self, data):
+        return WebMDemuxer().feed(data)
+
+    def restart(self, data, chunk_size, restart_at):
+        """Feeds `data` in chunks and resumes at chunk `restart_at`; returns (stream, chunk_start, block_ends)."""
+        chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+        demuxer = WebMDemuxer()
+        for chunk in chunks[:restart_at + 1]:
+            chunk_start = demuxer.position
+            block_ends = [end for _, end in demuxer.feed_with_offsets(chunk)]
+        resumed = demuxer.resume(chunk, chunk_start, block_ends)
+        self.assertTrue(resumed.startswith(demuxer.init_segment))
+        return resumed + b"".join(chunks[restart_at + 1:]), chunk_start, block_ends
+
+    def assertResumesAtFirstBlockEnd(self, data, chunk_size, restart_at):
+        stream, chunk_start, block_ends = self.restart(data, chunk_size, restart_at)
+        # Every block that ends after the chunk's first block end is kept, none is lost
+        expected = [packet for packet, end in WebMDemuxer().feed_with_offsets(data) if end > block_ends[0]]
+        self.assertTrue(expected)
+        self.assertEqual(self.packets(stream), expected)
+        return chunk_start, block_ends
+
+    def test_resume_mid_block(self):
+        """A streaming STT restart at a chunk that begins inside a SimpleBlock yields a decodable stream."""
+        data = build_fixture(utterances=2, seed=3)[0]
+        # Arbitrary chunk boundaries, so chunks start in the middle of blocks
+        chunk_start, block_ends = self.assertResumesAtFirstBlockEnd(data, 997, restart_at=20)
+
+        # The bytes at the chunk's start are the inside of a block: naive restarts lose sync
+        demuxer = WebMDemuxer()
+        demuxer.feed(data[:chunk_start])
+        self.assertEqual(self.packets(demuxer.header_for(chunk_start) + data[chunk_start:]), [])
+
+    def test_resume_keeps_every_block_of_the_chunk(self):
+        """A large restart chunk, spanning Clusters, loses only the block it starts inside of."""
+        data = build_fixture(utterances=2, seed=5)[0]
+        chunk_start, block_ends = self.assertResumesAtFirstBlockEnd(data, 8000, restart_at=1)
+        self.assertGreater(len(block_ends), 50)
+        demuxer = WebMDemuxer()
+        demuxer.feed(data)
+        self.assertGreater(len([start for start, _ in demuxer.clusters if chunk_start < start < block_ends[-1]]), 1)
+
+    def test_resume_without_block_end(self):
+        demuxer = WebMDemuxer()
+        data = build_fixture(utterances=1, seed=1)[0]
+        demuxer.feed(data[:5000])
+        chunk_start = demuxer.position
+        self.assertIsNone(demuxer.resume(data[5000:5010], chunk_start, []))
+        self.assertEqual(demuxer.resume(data[:5000], 0, []), data[:5000])
+
+
+class VoiceCatalogTests(SimpleTestCase):
+    VOICES = [{'name': 'fr-FR-Neural2-A', 'language_codes': ['fr-FR'], 'ssml_gender': 'FEMALE'}]
+
+    def test_concurrent_saves_leave_a_whole_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            catalog = VoiceCatalog(path=os.path.join(directory, 'voices.json'))
+            voices = self.VOICES * 2000
+            threads = [threading.Thread(target=catalog._save_to_disk, args=(voices, i)) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(os.listdir(directory), ['voices.json'])
+            self.assertEqual(len(catalog._read_from_disk()[0]), len(voices))
+
+    async def test_ensure_fresh_loads_saved_catalog(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'voices.json')
+            VoiceCatalog(path=path)._save_to_disk(self.VOICES, time.time())
+            catalog = VoiceCatalog(path=path)
+            await catalog.ensure_fresh()
+            self.assertEqual(catalog.voice_for('fr'), Voice('fr-FR', 'fr-FR-Neural2-A', 'FEMALE'))
+            self.assertEqual(catalog.refreshes, 0)
+            self.assertIsNone(catalog.ensure_fresh())
+
+
+class SpanTests(SimpleTestCase):
+    def test_session_spans_carry_the_session_id(self):
+        def auth():
+            metrics.set_session('session-1')
+            with self.assertLogs('femseek.slow_utterances') as logs, self.assertRaises(ValueError):
+                with metrics.span('auth'):
+                    raise ValueError("bad token")
+            return logs.records
+
+        records = contextvars.copy_context().run(auth)
+        logged = json.loads(records[0].getMessage())
+        self.assertEqual(logged['session'], 'session-1')
+        self.assertEqual((logged['stage'], logged['error']), ('auth', 'ValueError'))
+
+
+class RecordingTranslation:
+    """Translation provider that records its calls; texts in `failing` make a call fail."""
+
+    def __init__(self, failing=()):
+        self.calls = []
+        self.failing = set(failing)
+
+    async def translate(self, texts, target_lang):
+        self.calls.append(list(texts))
+        await asyncio.sleep(0)
+        if self.failing.intersection(texts):
+            raise ValueError("bad input")
+        return [f"{text} [{target_lang}]" for text in texts]
+
+
+class TranslationBatcherTests(SimpleTestCase):
+    def setUp(self):
+        self.translation = RecordingTranslation(failing={'bad'})
+        self.scheduler = Scheduler(api_limits={'translate': {'concurrency': 1}}, user_rate=0)
+        patches = [
+            mock.patch('translator.batching.get_providers', return_value=SimpleNamespace(translation=self.translation)),
+            mock.patch('translator.batching.scheduler', self.scheduler),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.batcher = TranslationBatcher(window_ms=5, max_batch=32)
+
+    async def request(self, text, user_id, priority=TRIAL, deadline=None):
+        with use_ticket(Ticket(user_id, priority, deadline)):
+            return await self.batcher.translate(text, 'fr')
+
+    async def test_one_scheduler_slot_per_upstream_call(self):
+        texts = ['hello', 'thank you', 'hello', 'water']
+        results = await asyncio.gather(*(self.request(text, user) for user, text in enumerate(texts)))
+        self.assertEqual(results, [f"{text} [fr]" for text in texts])
+        # Identical texts are sent once, and the batch took one slot for all four callers
+        self.assertEqual(self.translation.calls, [['hello', 'thank you', 'water']])
+        self.assertEqual(self.scheduler.apis['translate'].dispatched, 1)
+
+    async def test_failed_batch_is_retried_per_text(self):
+        results = await asyncio.gather(
+            self.request('hello', 1), self.request('bad', 2), self.request('water', 3), return_exceptions=True
+        )
+        self.assertEqual(results[0], "hello [fr]")
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], "water [fr]")
+        self.assertEqual(self.batcher.fallbacks, 1)
+        self.assertEqual(self.scheduler.apis['translate'].dispatched, 4)
+
+    async def test_cancelled_caller_leaves_the_batch_intact(self):
+        gone = asyncio.ensure_future(self.request('hello', 1))
+        staying = asyncio.ensure_future(self.request('water', 2))
+        await asyncio.sleep(0)
+        gone.cancel()
+        self.assertEqual(await staying, "water [fr]")
+        self.assertTrue(gone.cancelled())
+        self.assertEqual(self.translation.calls, [['hello', 'water']])
+
+    def test_batch_ticket_serves_the_most_urgent_caller_until_the_last_deadline(self):
+        now = time.time()
+        ticket = batch_ticket([Ticket(1, TRIAL, now + 1), Ticket(2, SUBSCRIBER, now + 5)])
+        self.assertEqual(ticket, Ticket(None, SUBSCRIBER, now + 5))
+        self.assertIsNone(batch_ticket([Ticket(1, TRIAL, now), None]))
+
+
+class SchedulerTests(SimpleTestCase):
+    async def test_users_take_turns_and_subscribers_go_first(self):
+        scheduler = Scheduler(api_limits={'stt': {'concurrency': 1}}, user_rate=0)
+        order = []
+        release = asyncio.Event()
+
+        async def call(name, ticket):
+            with use_ticket(ticket):
+                async with scheduler.slot('stt'):
+                    order.append(name)
+                    await release.wait()
+
+        # The first call holds the only slot while the others queue up behind it
+        first = asyncio.ensure_future(call('first', None))
+        await asyncio.sleep(0)
+        calls = [
+            call('a1', Ticket('a', TRIAL, None)),
+            call('a2', Ticket('a', TRIAL, None)),
+            call('a3', Ticket('a', TRIAL, None)),
+            call('b1', Ticket('b', TRIAL, None)),
+            call('s1', Ticket('s', SUBSCRIBER, None)),
+        ]
+        queued = [asyncio.ensure_future(c) for c in calls]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(first, *queued)
+        self.assertEqual(order, ['first', 's1', 'a1', 'b1', 'a2', 'a3'])
+
+    async def test_queued_call_is_dropped_at_its_deadline(self):
+        scheduler = Scheduler(api_limits={'tts': {'concurrency': 1}}, user_rate=0)
+        holding = asyncio.Event()
+        done = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot('tts'):
+                holding.set()
+                await done.wait()
+
+        holder = asyncio.ensure_future(hold())
+        await holding.wait()
+        with use_ticket(Ticket('a', TRIAL, time.time() + 0.05)):
+            with self.assertRaises(DeadlineExceeded):
+                async with scheduler.slot('tts'):
+                    pass
+        done.set()
+        await holder
+        stats = scheduler.stats()
+        self.assertEqual((stats['tts_dropped'], stats['tts_dispatched'], stats['tts_active']), (1, 1, 0))
+
+    async def test_rate_limit_keeps_one_timer(self):
+        scheduler = Scheduler(api_limits={'translate': {'concurrency': 8, 'rate': 100, 'burst': 1}}, user_rate=0)
+
+        async def call():
+            async with scheduler.slot('translate'):
+                pass
+
+        await asyncio.gather(*(call() for _ in range(5)))
+        self.assertEqual(scheduler.apis['translate'].dispatched, 5)
+        self.assertIsNone(scheduler.apis['translate']._timer)
+
+
+class UtterancePipelineTests(SimpleTestCase):
+    def setUp(self):
+        self.sent = []
+
+    async def send(self, text_data=None, bytes_data=None):
+        self.sent.append(json.loads(text_data) if text_data else bytes_data)
+
+    def blocked(self, release, text):
+        async def process(job):
+            await release.wait()
+            await job.send_json({'type': 'translation_result', 'text': text})
+        return process
+
+    async def test_results_are_delivered_in_utterance_order(self):
+        audio = []
+        pipeline = UtterancePipeline(self.send, max_depth=3, on_audio=lambda *item: audio.append(item))
+        slow, fast = asyncio.Event(), asyncio.Event()
+
+        async def speak(job):
+            await fast.wait()
+            await job.audio_sent(7, 3, 'mp3_24k')
+            await job.send(bytes_data=b'abc')
+
+        first = pipeline.submit(self.blocked(slow, 'first'))
+        pipeline.submit(speak)
+        pipeline.submit(self.blocked(fast, 'third'))
+        fast.set()  # The later utterances finish first
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.sent, [])
+        self.assertEqual(audio, [])
+        slow.set()
+        await first.task
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.sent, [
+            {'type': 'translation_result', 'text': 'first', 'seq': 1},
+            b'abc',
+            {'type': 'translation_result', 'text': 'third', 'seq': 3},
+        ])
+        self.assertEqual(audio, [(7, 3, 'mp3_24k')])
+        self.assertEqual(len(pipeline), 0)
+        pipeline.close()
+
+    async def test_drop_oldest_skips_the_utterance_being_delivered(self):
+        pipeline = UtterancePipeline(self.send, max_depth=2, overflow=DROP_OLDEST)
+        release = asyncio.Event()
+        pipeline.submit(self.blocked(release, 'one'))
+        second = pipeline.submit(self.blocked(release, 'two'))
+        await asyncio.sleep(0)  # The delivery task starts on the first utterance
+        self.assertIsNotNone(pipeline.submit(self.blocked(release, 'three')))
+        self.assertTrue(second.dropped)
+        release.set()
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.sent, [
+            {'type': 'utterance_dropped', 'seq': 2, 'reason': 'queue_full'},
+            {'type': 'translation_result', 'text': 'one', 'seq': 1},
+            {'type': 'translation_result', 'text': 'three', 'seq': 3},
+        ])
+        pipeline.close()
+
+    async def test_drop_newest_refuses_the_new_utterance(self):
+        pipeline = UtterancePipeline(self.send, max_depth=1, overflow=DROP_NEWEST)
+        release = asyncio.Event()
+        pipeline.submit(self.blocked(release, 'one'))
+        self.assertIsNone(pipeline.submit(self.blocked(release, 'two')))
+        release.set()
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.sent, [
+            {'type': 'utterance_dropped', 'seq': 2, 'reason': 'queue_full'},
+            {'type': 'translation_result', 'text': 'one', 'seq': 1},
+        ])
+        pipeline.close()
+
+
+class UsageFlusherTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create(name="Alice", email="alice@example.com", usage_purpose="travel")
+        self.bob = User.objects.create(name="Bob", email="bob@example.com", usage_purpose="work")
+
+    async def counts(self):
+        return {user.email: user.trial_sessions_count async for user in User.objects.order_by('email')}
+
+    async def test_drain_writes_every_increment(self):
+        flusher = UsageFlusher(interval=60)
+        flusher.add(self.alice.pk)
+        flusher.add(self.alice.pk)
+        flusher.add(self.bob.pk)
+        self.assertEqual(flusher.pending(self.alice.pk), 2)
+        await flusher.drain()
+        self.assertEqual(await self.counts(), {'alice@example.com': 2, 'bob@example.com': 1})
+        self.assertEqual((flusher.pending(self.alice.pk), flusher.stats()['rows']), (0, 2))
+        flusher._task.cancel()
+
+    async def test_failed_write_is_kept_and_retried(self):
+        flusher = UsageFlusher(interval=60)
+        flusher.add(self.alice.pk)
+        real_filter = User.objects.filter
+        calls = []
+
+        def flaky_filter(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise OperationalError("database is unavailable")
+            return real_filter(*args, **kwargs)
+
+        with mock.patch.object(User.objects, 'filter', side_effect=flaky_filter):
+            await flusher.flush()
+            self.assertEqual(flusher.pending(self.alice.pk), 1)
+            self.assertEqual(flusher.stats()['failures'], 1)
+            await flusher.drain()
+        self.assertEqual(await self.counts(), {'alice@example.com': 1, 'bob@example.com': 0})
+        self.assertEqual(flusher.pending(self.alice.pk), 0)
+        flusher._task.cancel()
+
+    async def test_reloaded_row_does_not_roll_back_unflushed_usage(self):
+        entitlement = Entitlement(self.alice.pk)
+        entitlement.apply(self.alice)
+        entitlement.trial_sessions_count = 2  # Counted here, not written yet
+        entitlement.merge(self.alice, pending=0)  # A stale row from the user cache
+        self.assertEqual(entitlement.trial_sessions_count, 2)
+
+
+class FakeSession:
+    def __init__(self, buffered=0):
+        self.buffered = buffered
+
+    def buffered_bytes(self):
+        return self.buffered
+
+
+class AdmissionTests(SimpleTestCase):
+    async def test_session_cap_waits_for_a_free_slot(self):
+        controller = AdmissionController(max_sessions=1, poll_interval=0.01)
+        first, second = FakeSession(), FakeSession()
+        self.assertTrue(await controller.admit(first))
+        self.assertFalse(await controller.admit(second, wait=0.02))
+        waiting = asyncio.ensure_future(controller.admit(second, wait=1))
+        await asyncio.sleep(0.02)
+        controller.release(first)
+        self.assertTrue(await waiting)
+        self.assertEqual(controller.stats()['rejected'], 1)
+        self.assertEqual(controller.stats()['active'], 1)
+
+    async def test_buffered_bytes_cap(self):
+        controller = AdmissionController(max_buffered_bytes=1000)
+        hog = FakeSession(buffered=600)
+        self.assertTrue(await controller.admit(hog))
+        self.assertTrue(await controller.admit(FakeSession()))
+        hog.buffered = 1000  # Its capture buffer grew
+        self.assertFalse(controller.has_room())
+        self.assertFalse(await controller.admit(FakeSession()))
+
+
+class AudioBufferBoundsTests(SimpleTestCase):
+    def test_garbage_stream_is_rejected_with_bounded_memory(self):
+        demuxer = WebMDemuxer()
+        garbage = b"\x1a\x45\xdf\xa3\x84" + bytes(range(256)) * 40
+        with self.assertRaises(ValueError):
+            for _ in range(0, 200 * 1024, len(garbage)):
+                demuxer.feed(garbage)
+                self.assertLessEqual(demuxer.pending_bytes, 64 * 1024)
+        self.assertEqual(demuxer.pending_bytes, 0)
+
+    def test_trim_keeps_a_decodable_stream(self):
+        data = build_fixture(utterances=2, seed=3)[0]
+        buffer = UtteranceBuffer(WebMDemuxer())
+        buffer.feed(data)
+        self.assertTrue(buffer.trim(len(data) // 2))
+        self.assertLessEqual(len(buffer), len(data) // 2)
+        packets = WebMDemuxer().feed(bytes(buffer.buffer))
+        self.assertTrue(packets)
+        self.assertEqual(packets, WebMDemuxer().feed(data)[-len(packets):])
+
+
+class RecordingJob:
+    seq = 1
+
+    def __init__(self):
+        self.messages = []
+
+    async def send_json(self, message):
+        self.messages.append(message)
+
+    async def send_error(self, message):
+        self.messages.append({'type': 'error', 'message': message})
+
+    async def audio_sent(self, audio_id, size, profile):
+        pass
+
+
+class FixedSpeech:
+    def __init__(self, text, language_code):
+        self.transcript = Transcript(text, language_code, True)
+
+    async def recognize(self, audio, options):
+        return self.transcript
+
+
+class SilentSynthesis:
+    def __init__(self):
+        self.requests = []
+
+    async def synthesize(self, request):
+        self.requests.append(request)
+        return b"audio"
+
+
+class SourceLanguageTests(SimpleTestCase):
+    def setUp(self):
+        self.translation = RecordingTranslation()
+        patch = mock.patch(
+            'translator.batching.get_providers', return_value=SimpleNamespace(translation=self.translation)
+        )
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def processor(self, text, language_code, **options):
+        self.synthesis = SilentSynthesis()
+        providers = SimpleNamespace(speech=FixedSpeech(text, language_code), synthesis=self.synthesis)
+        return UtteranceProcessor(providers, target_lang='fr', **options)
+
+    async def test_speech_in_the_target_language_is_not_translated(self):
+        processor = self.processor("bonjour tout le monde, source test", 'fr-FR', text_only=True)
+        job = RecordingJob()
+        self.assertTrue(await processor.process_audio(job, b"webm"))
+        self.assertEqual(processor.source_lang, 'fr')
+        self.assertEqual(self.translation.calls, [])
+        self.assertEqual(job.messages[-1]['text'], "bonjour tout le monde, source test")
+
+    async def test_text_only_skips_synthesis(self):
+        processor = self.processor("good morning friend, source test", 'en-US', text_only=True)
+        job = RecordingJob()
+        self.assertTrue(await processor.process_audio(job, b"webm"))
+        self.assertEqual(job.messages[0]['language'], 'en')
+        self.assertEqual(self.translation.calls, [["good morning friend, source test"]])
+        self.assertEqual(job.messages[-1], {
+            'type': 'translation_result', 'text': "good morning friend, source test [fr]", 'text_only': True,
+        })
+        self.assertEqual(self.synthesis.requests, [])
@@ -0,0 +1,194 @@
+# backend/translator/tts_cache.py
+"""Content-addressed cache for synthesized speech.
+
+TTS is the slowest and most expensive stage, and identical requests (same text,
+voice and audio config) come up all the time. Audio is stored under the SHA-256
+of the full synthesis request in two tiers:
+
+* memory: LRU bounded by total bytes, for the hottest phrases;
+* disk: one file per entry, LRU-evicted by total bytes.
+
+Disk I/O runs in a worker thread so it never blocks the event loop.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+def synthesis_key(request):
+    """Hashes the complete synthesis request (text, voice and audio config) into a cache key."""
+    canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ByteLRU:
+    """LRU index that tracks total size and reports which keys to evict."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._sizes = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._sizes
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def touch(self, key):
+        self._sizes.move_to_end(key)
+
+    def add(self, key, size):
+        """Records `key`; returns the keys evicted to stay within max_bytes."""
+        self.remove(key)
+        self._sizes[key] = size
+        self.total_bytes += size
+        evicted = []
+        while self.total_bytes > self.max_bytes and len(self._sizes) > 1:
+            old_key, old_size = self._sizes.popitem(last=False)
+            self.total_bytes -= old_size
+            evicted.append(old_key)
+        return evicted
+
+    def remove(self, key):
+        size = self._sizes.pop(key, None)
+        if size is not None:
+            self.total_bytes -= size
+
+
+class TTSAudioCache:
+    """Memory + disk cache of synthesized audio keyed by synthesis_key()."""
+
+    def __init__(self, memory_bytes, disk_dir=None, disk_bytes=0):
+        self._memory = {}
+        self._memory_lru = ByteLRU(memory_bytes)
+        self.disk_dir = disk_dir
+        self._disk_lru = ByteLRU(disk_bytes)
+        self._disk_lock = threading.Lock()
+        self._disk_loaded = False
+        self._pending_writes = set()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.audio")
+
+    def _load_disk_index(self):
+        # Rebuild the LRU from what a previous worker left on disk, oldest first
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if name.endswith(".audio"):
+                    stat = os.stat(os.path.join(root, name))
+                    entries.append((stat.st_mtime, name[:-len(".audio")], stat.st_size))
+        for _, key, size in sorted(entries):
+            for evicted in self._disk_lru.add(key, size):
+                self._unlink(evicted)
+        self._disk_loaded = True
+
+    def _unlink(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+        self.evictions += 1
+
+    def _disk_read(self, key):
+        with self._disk_lock:
+            if not self._disk_loaded:
+                self._load_disk_index()
+            if key not in self._disk_lru:
+                return None
+            self._disk_lru.touch(key)
+        path = self._path(key)
+        try:
+            # A plain read: the bytes go into the memory tier anyway, so mapping the file
+            # and copying it out would only add a syscall
+            with open(path, "rb") as f:
+                data = f.read()
+            if not data:
+                raise ValueError(f"Empty cache file: {path}")
+            os.utime(path)  # Keep on-disk recency for the next index rebuild
+            return data
+        except (FileNotFoundError, ValueError):
+            with self._disk_lock:
+                self._disk_lru.remove(key)
+            return None
+
+    def _disk_write(self, key, audio):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)  # Atomic, so readers never see partial audio
+        with self._disk_lock:
+            if not self._disk_loaded:
+                self._load_disk_index()
+            for evicted in self._disk_lru.add(key, len(audio)):
+                self._unlink(evicted)
+
+    def _remember(self, key, audio):
+        self._memory[key] = audio
+        for evicted in self._memory_lru.add(key, len(audio)):
+            del self._memory[evicted]
+            self.evictions += 1
+
+    async def get(self, key):
+        audio = self._memory.get(key)
+        if audio is not None:
+            self._memory_lru.touch(key)
+            self.hits += 1
+            return audio
+        if self.disk_dir:
+            try:
+                audio = await asyncio.to_thread(self._disk_read, key)
+            except OSError as e:
+                print(f"TTS disk cache read failed: {e}")
+                audio = None
+            if audio is not None:
+                self.disk_hits += 1
+                self._remember(key, audio)
+                return audio
+        self.misses += 1
+        return None
+
+    async def _persist(self, key, audio):
+        try:
+            await asyncio.to_thread(self._disk_write, key, audio)
+        except OSError as e:
+            print(f"TTS disk cache write failed: {e}")
+
+    async def set(self, key, audio):
+        """Stores audio in memory now and writes it to disk in the background."""
+        self._remember(key, audio)
+        if self.disk_dir:
+            task = asyncio.create_task(self._persist(key, audio))
+            self._pending_writes.add(task)
+            task.add_done_callback(self._pending_writes.discard)
+
+    def stats(self):
+        return {
+            'memory_entries': len(self._memory_lru),
+            'memory_bytes': self._memory_lru.total_bytes,
+            'disk_entries': len(self._disk_lru),
+            'disk_bytes': self._disk_lru.total_bytes,
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+tts_cache = TTSAudioCache(
+    memory_bytes=settings.TTS_CACHE_MEMORY_BYTES,
+    disk_dir=settings.TTS_CACHE_DIR,
+    disk_bytes=settings.TTS_CACHE_DISK_BYTES,
+)
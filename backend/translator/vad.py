@@ -0,0 +1,166 @@
+# backend/translator/vad.py
+"""Server-side voice activity detection over the incoming Opus stream.
+
+MediaRecorder keeps sending a chunk every second even while nobody speaks, so
+"no frame for N seconds" is not a usable silence signal. Instead every Opus
+packet is decoded and classified over fixed 20 ms windows using short-term
+energy and zero-crossing rate against an adaptive noise floor.
+
+Decoding needs `opuslib` (and the system libopus). Without it the detector
+falls back to classifying packets by their size per millisecond: Opus spends
+very few bytes on silence, so this works well for VBR MediaRecorder streams.
+
+The windows are measured with `audioop` (C, up to Python 3.12); on newer
+Pythons a slower pure-Python loop does the same.
+"""
+import array
+import math
+import warnings
+
+try:
+    import opuslib
+except Exception:  # ImportError, or a plain Exception when libopus is missing
+    opuslib = None
+
+try:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        import audioop
+except ImportError:  # Removed in Python 3.13
+    audioop = None
+
+SAMPLE_RATE = 48000
+WINDOW_MS = 20
+WINDOW_SAMPLES = SAMPLE_RATE * WINDOW_MS // 1000
+
+# Events returned by VoiceActivityDetector.process()
+SPEECH_END = "speech_end"  # Speech followed by enough silence: finalize the utterance
+MAX_LENGTH = "max_length"  # Utterance hit the length cap: finalize it anyway
+IDLE = "idle"              # A long stretch without any speech: the buffer can be dropped
+
+# Frame duration in ms for each of the 32 Opus TOC configurations (RFC 6716, section 3.1)
+_TOC_FRAME_MS = [10, 20, 40, 60] * 3 + [10, 20] * 2 + [2.5, 5, 10, 20] * 4
+
+
+def packet_duration_ms(packet):
+    """Returns the audio duration of an Opus packet from its TOC byte."""
+    if not packet:
+        return 0
+    toc = packet[0]
+    frame_ms = _TOC_FRAME_MS[toc >> 3]
+    code = toc & 0x03
+    if code == 0:
+        frames = 1
+    elif code in (1, 2):
+        frames = 2
+    else:
+        frames = packet[1] & 0x3F if len(packet) > 1 else 0
+    return frame_ms * frames
+
+
+class EnergyClassifier:
+    """Energy / zero-crossing speech classifier for 16-bit mono PCM windows."""
+
+    def __init__(self, margin_db=12.0, min_energy_db=-55.0, max_zcr=0.35):
+        self.margin_db = margin_db
+        self.min_energy_db = min_energy_db
+        self.max_zcr = max_zcr
+        self.noise_floor_db = min_energy_db
+
+    def is_speech(self, pcm):
+        """Classifies a window of 16-bit native-endian PCM bytes."""
+        count = len(pcm) // 2
+        if not count:
+            return False
+        if audioop is not None:
+            energy = audioop.rms(pcm, 2) ** 2
+            crossings = audioop.cross(pcm, 2)
+        else:
+            samples = array.array('h', pcm)
+            energy = sum(s * s for s in samples) / count
+            crossings = sum(1 for a, b in zip(samples, samples[1:]) if (a < 0) != (b < 0))
+        energy_db = 10 * math.log10(energy / (32768.0 ** 2) + 1e-12)
+        zcr = crossings / count
+
+        speech = (
+            energy_db > self.min_energy_db
+            and energy_db > self.noise_floor_db + self.margin_db
+            and zcr < self.max_zcr  # Loud but extremely noisy windows are hiss, not voice
+        )
+        if not speech:
+            # Track the background level: fall quickly, rise slowly
+            rate = 0.5 if energy_db < self.noise_floor_db else 0.02
+            self.noise_floor_db += (energy_db - self.noise_floor_db) * rate
+        return speech
+
+
+class PacketSizeClassifier:
+    """Fallback classifier that looks only at Opus bitrate per packet."""
+
+    def __init__(self, min_bytes_per_ms=1.0):
+        self.min_bytes_per_ms = min_bytes_per_ms
+
+    def is_speech(self, packet):
+        duration = packet_duration_ms(packet)
+        if not duration:
+            return False
+        return len(packet) / duration >= self.min_bytes_per_ms
+
+
+class VoiceActivityDetector:
+    """Tracks speech/silence over a stream of Opus packets and reports utterance boundaries."""
+
+    def __init__(self, silence_ms=1500, max_utterance_ms=15000, idle_ms=5000):
+        self.silence_ms = silence_ms
+        self.max_utterance_ms = max_utterance_ms
+        self.idle_ms = idle_ms
+        if opuslib is not None:
+            self._decoder = opuslib.Decoder(SAMPLE_RATE, 1)
+            self._classifier = EnergyClassifier()
+        else:
+            self._decoder = None
+            self._classifier = PacketSizeClassifier()
+        self.reset()
+
+    @property
+    def decoding(self):
+        return self._decoder is not None
+
+    def reset(self):
+        """Starts a new utterance (the noise floor is kept)."""
+        self.speech_ms = 0
+        self.silence_ms_run = 0
+        self.utterance_ms = 0
+
+    def _classify(self, packet):
+        """Yields (duration_ms, is_speech) for each fixed window in the packet."""
+        if self._decoder is None:
+            yield packet_duration_ms(packet), self._classifier.is_speech(packet)
+            return
+        frame_size = int(SAMPLE_RATE * packet_duration_ms(packet) / 1000)
+        if not frame_size:
+            return
+        pcm = memoryview(self._decoder.decode(bytes(packet), frame_size))
+        window_bytes = WINDOW_SAMPLES * 2
+        for start in range(0, len(pcm), window_bytes):
+            window = pcm[start:start + window_bytes]
+            yield len(window) * 500 / SAMPLE_RATE, self._classifier.is_speech(window)
+
+    def process(self, packet):
+        """Feeds one Opus packet; returns SPEECH_END, MAX_LENGTH, IDLE or None."""
+        for duration, speech in self._classify(packet):
+            self.utterance_ms += duration
+            if speech:
+                self.speech_ms += duration
+                self.silence_ms_run = 0
+            else:
+                self.silence_ms_run += duration
+
+        if self.speech_ms:
+            if self.silence_ms_run >= self.silence_ms:
+                return SPEECH_END
+            if self.utterance_ms >= self.max_utterance_ms:
+                return MAX_LENGTH
+        elif self.utterance_ms >= self.idle_ms:
+            return IDLE
+        return None
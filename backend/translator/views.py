@@ -0,0 +1,53 @@
+# backend/translator/views.py
+import hmac
+import json
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .metrics import registry
+from .payments import Verification, activate_subscription_for, paystack
+from .readiness import readiness
+
+
+async def metrics_view(request):
+    """Prometheus scrape endpoint for the translation pipeline metrics.
+
+    Async so the registry is rendered on the event loop that updates it, not in a
+    thread while its dicts are changing.
+    """
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+            return HttpResponse(status=401)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+async def ready_view(request):
+    """Readiness probe: 503 until this worker's clients are warmed up (starting the warm-up), then 200."""
+    readiness.ensure_ready()
+    phases_ms = {phase: round(seconds * 1000, 1) for phase, seconds in readiness.phases.items()}
+    return JsonResponse({'ready': readiness.ready, 'phases_ms': phases_ms}, status=200 if readiness.ready else 503)
+
+
+@csrf_exempt
+@require_POST
+async def paystack_webhook(request):
+    """Paystack event webhook: activates the subscription as soon as a charge succeeds."""
+    if not paystack.valid_signature(request.body, request.headers.get('X-Paystack-Signature', '')):
+        return HttpResponse(status=401)
+    try:
+        event = json.loads(request.body)
+        data = event['data']
+        reference = data['reference']
+    except (ValueError, KeyError, TypeError):
+        return HttpResponse(status=400)
+
+    if event.get('event') == 'charge.success':
+        verification = paystack.remember(Verification.from_transaction(reference, data))
+        if verification.ok:
+            await activate_subscription_for(verification)
+    # Anything else is acknowledged so Paystack doesn't keep retrying it
+    return HttpResponse(status=200)
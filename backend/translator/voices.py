@@ -0,0 +1,185 @@
+# backend/translator/voices.py
+"""Catalog of the available TTS voices, indexed by language.
+
+Voice names used to be guessed as f"{lang}-Wavenet-A", which isn't a real voice
+for most of the languages we support (Swahili has no WaveNet voices, Chinese is
+"cmn-CN", ...), so synthesis failed after a wasted round trip. The catalog lists
+the voices once, keeps a copy on disk (VOICE_CATALOG_PATH) so restarts don't
+need the API, refreshes it every VOICE_CATALOG_REFRESH seconds in the
+background, and resolves each target language to the best available voice:
+Neural2, then WaveNet, then Standard, trying the preferred regions in order.
+Lookups are a dict access once a language has been resolved.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from .providers import get_providers
+
+# Resolved voice for a target language; name is None when the catalog has no voice for it
+# and Google should pick one for the language code.
+Voice = namedtuple("Voice", ["language_code", "name", "ssml_gender"])
+
+# Preferred TTS regions for each supported target language, best first
+LANGUAGE_REGIONS = {
+    'en': ('en-US', 'en-GB', 'en-AU', 'en-IN'),
+    'sw': ('sw-KE', 'sw-TZ'),
+    'es': ('es-ES', 'es-US'),
+    'pt': ('pt-BR', 'pt-PT'),
+    'zh': ('cmn-CN', 'cmn-TW'),
+    'fr': ('fr-FR', 'fr-CA'),
+    'hi': ('hi-IN',),
+}
+
+# Voice tiers we use, best first; other families (Studio, Chirp, ...) are ignored
+VOICE_TIERS = ('Neural2', 'Wavenet', 'Standard')
+
+
+def voice_tier(name):
+    """Rank of a voice name like 'en-US-Neural2-A' in VOICE_TIERS, or None."""
+    parts = name.split('-')
+    if len(parts) < 4 or parts[-2] not in VOICE_TIERS:
+        return None
+    return VOICE_TIERS.index(parts[-2])
+
+
+class VoiceCatalog:
+    def __init__(self, path=None, refresh_seconds=86400):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self.fetched_at = 0
+        self._by_language = {}  # lower-cased language code -> [voice dicts]
+        self._resolved = {}     # target language -> Voice
+        self._loaded = False
+        self._refresh_task = None
+        self.refreshes = 0
+        self.failures = 0
+
+    def _index(self, voices, fetched_at):
+        by_language = {}
+        for voice in voices:
+            for code in voice['language_codes']:
+                by_language.setdefault(code.lower(), []).append(voice)
+        self._by_language = by_language
+        self._resolved = {}
+        self.fetched_at = fetched_at
+
+    def _read_from_disk(self):
+        """The saved catalog as (voices, fetched_at), or None (blocking)."""
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            return data['voices'], data['fetched_at']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable voice catalog {self.path}: {e}")
+            return None
+
+    async def _load_from_disk(self):
+        saved = await asyncio.to_thread(self._read_from_disk)
+        if saved is not None and not self._loaded:
+            self._index(*saved)
+            print(f"Loaded {len(saved[0])} TTS voices from {self.path}.")
+        self._loaded = True
+
+    def _save_to_disk(self, voices, fetched_at):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        # Unique per writer: workers refreshing at the same time must not share a temp file
+        tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'fetched_at': fetched_at, 'voices': voices}, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    async def refresh(self):
+        """Lists the voices from the synthesis provider and replaces the index."""
+        try:
+            voices = await get_providers().synthesis.list_voices()
+        except Exception as e:
+            self.failures += 1
+            print(f"Could not list TTS voices: {e}")
+            return
+        fetched_at = time.time()
+        self._index(voices, fetched_at)
+        self._loaded = True  # A saved copy still being read is older
+        self.refreshes += 1
+        print(f"Voice catalog refreshed: {len(voices)} voices.")
+        if self.path:
+            try:
+                await asyncio.to_thread(self._save_to_disk, voices, fetched_at)
+            except OSError as e:
+                print(f"Could not write voice catalog {self.path}: {e}")
+
+    async def _load_and_refresh(self):
+        if not self._loaded:
+            await self._load_from_disk()
+        if time.time() - self.fetched_at >= self.refresh_seconds:
+            await self.refresh()
+
+    def ensure_fresh(self):
+        """Starts loading the saved copy and, if it is missing or stale, a refresh; returns the task or None.
+
+        Both run in the background, so the first connection doesn't read the file on the event loop.
+        """
+        if self._loaded and time.time() - self.fetched_at < self.refresh_seconds:
+            return None
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self._load_and_refresh())
+        return self._refresh_task
+
+    def _resolve(self, target_lang):
+        regions = [code.lower() for code in LANGUAGE_REGIONS.get(target_lang, ())]
+        # Unlisted languages (and regions): anything the catalog has for the base language
+        base = target_lang.lower() + '-'
+        others = sorted(code for code in self._by_language if code.startswith(base) and code not in regions)
+        candidates = []
+        for region_rank, code in enumerate(regions + others):
+            for voice in self._by_language.get(code, ()):
+                tier = voice_tier(voice['name'])
+                if tier is not None:
+                    candidates.append((tier, region_rank, voice['name'], code, voice))
+        if not candidates:
+            fallback = LANGUAGE_REGIONS.get(target_lang, (target_lang,))[0]
+            return Voice(fallback, None, 'SSML_VOICE_GENDER_UNSPECIFIED')
+        _, _, name, code, voice = min(candidates)
+        language_code = next(c for c in voice['language_codes'] if c.lower() == code)
+        return Voice(language_code, name, voice['ssml_gender'])
+
+    def voice_for(self, target_lang):
+        """The best available voice for a target language (e.g. 'zh' -> a cmn-CN voice).
+
+        Until the catalog is loaded (see ensure_fresh) Google picks a voice for the language.
+        """
+        voice = self._resolved.get(target_lang)
+        if voice is None:
+            voice = self._resolve(target_lang)
+            if self._loaded:
+                self._resolved[target_lang] = voice
+        return voice
+
+    def stats(self):
+        return {
+            'voices': len({voice['name'] for voices in self._by_language.values() for voice in voices}),
+            'languages': len(self._by_language),
+            'age_seconds': round(time.time() - self.fetched_at) if self.fetched_at else -1,
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+        }
+
+
+voice_catalog = VoiceCatalog(
+    path=settings.VOICE_CATALOG_PATH,
+    refresh_seconds=settings.VOICE_CATALOG_REFRESH,
+)
@@ -0,0 +1,307 @@
+# backend/translator/webm.py
+"""Minimal streaming WebM demuxer and framer for MediaRecorder audio.
+
+MediaRecorder sends one EBML header + Segment followed by an endless series of
+Clusters, split across WebSocket frames at arbitrary byte offsets; only the
+first frame carries the header. The demuxer keeps just enough state to pull the
+Opus packets out of SimpleBlocks as the bytes arrive, without ever holding more
+than one element in memory. Along the way it caches the init segment (everything
+before the first Cluster) and indexes recent Clusters with their timecodes.
+
+That is what UtteranceBuffer needs to cut the stream into standalone files:
+every utterance it hands out starts with the init segment and, when it begins
+in the middle of a Cluster, a Cluster header carrying that Cluster's timecode,
+so STT can decode each one on its own. Cuts fall on block boundaries, and the
+finished buffer is handed out as is, only the bytes after the cut are copied.
+"""
+from collections import deque
+
+# EBML element IDs (kept with their length marker bits, as they appear on the wire)
+SEGMENT_ID = 0x18538067
+CLUSTER_ID = 0x1F43B675
+TIMECODE_ID = 0xE7
+BLOCK_GROUP_ID = 0xA0
+BLOCK_ID = 0xA1
+SIMPLE_BLOCK_ID = 0xA3
+
+# Master elements whose children we want to walk into rather than skip
+CONTAINER_IDS = {SEGMENT_ID, CLUSTER_ID, BLOCK_GROUP_ID}
+BLOCK_IDS = {SIMPLE_BLOCK_ID, BLOCK_ID}
+# Elements read whole rather than skipped
+READ_IDS = BLOCK_IDS | {TIMECODE_ID}
+
+UNKNOWN_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+MAX_INIT_SEGMENT = 64 * 1024
+# Opus blocks are a few hundred bytes; a larger size means the stream is corrupt
+MAX_BLOCK_SIZE = 256 * 1024
+
+
+def read_vint(buf, pos, keep_marker=False):
+    """Reads an EBML variable-length integer at `pos`.
+
+    Returns (value, length), or None if `buf` doesn't hold the whole integer yet.
+    Element IDs are read with keep_marker=True, sizes without.
+    """
+    if pos >= len(buf):
+        return None
+    first = buf[pos]
+    if first == 0:
+        raise ValueError("Invalid EBML variable-length integer.")
+    length = 9 - first.bit_length()
+    if pos + length > len(buf):
+        return None
+    value = first if keep_marker else first & (0xFF >> length)
+    for byte in buf[pos + 1:pos + length]:
+        value = (value << 8) | byte
+    return value, length
+
+
+def is_unknown_size(value, length):
+    # All value bits set means "size unknown" (used by live Segment/Cluster elements)
+    return value == (1 << (7 * length)) - 1
+
+
+def read_uint(payload):
+    value = 0
+    for byte in payload:
+        value = (value << 8) | byte
+    return value
+
+
+def cluster_header(timecode):
+    """An unknown-size Cluster header followed by its Timecode element."""
+    value = timecode.to_bytes(max(1, (timecode.bit_length() + 7) // 8), "big")
+    return CLUSTER_ID.to_bytes(4, "big") + UNKNOWN_SIZE + bytes([TIMECODE_ID, 0x80 | len(value)]) + value
+
+
+def block_frames(payload):
+    """Returns the frames stored in a (Simple)Block payload.
+
+    MediaRecorder never laces audio, so laced blocks are skipped rather than split.
+    """
+    track = read_vint(payload, 0)
+    if track is None:
+        return []
+    header_length = track[1] + 3  # track number + int16 timecode + flags
+    if len(payload) <= header_length:
+        return []
+    flags = payload[header_length - 1]
+    if flags & 0x06:
+        return []
+    return [bytes(payload[header_length:])]
+
+
+class WebMDemuxer:
+    """Incrementally extracts Opus packets from a WebM byte stream."""
+
+    def __init__(self, max_clusters=64):
+        self._pending = bytearray()
+        self._skip = 0  # Bytes of an uninteresting element still to be discarded
+        self._consumed = 0  # Stream offset of _pending[0]
+        self._head = bytearray()  # Stream bytes seen before the first Cluster
+        self.init_segment = None  # EBML header + Segment info, once the first Cluster arrives
+        self.clusters = deque(maxlen=max_clusters)  # [stream offset, timecode] of recent Clusters
+
+    @property
+    def position(self):
+        """Total number of stream bytes fed so far."""
+        return self._consumed + len(self._pending)
+
+    @property
+    def pending_bytes(self):
+        """Stream bytes held until the element they belong to is complete."""
+        return len(self._pending) + (len(self._head) if self._head is not None else 0)
+
+    @property
+    def init_segment_length(self):
+        return len(self.init_segment) if self.init_segment is not None else None
+
+    def feed(self, data):
+        """Consumes the next chunk of the stream and returns the completed Opus packets."""
+        return [packet for packet, _ in self.feed_with_offsets(data)]
+
+    def feed_with_offsets(self, data):
+        """Like feed(), but returns (packet, stream offset where its block ends) pairs.
+
+        Raises ValueError if the stream can't be parsed; the demuxer is reset then,
+        so nothing of the bad stream stays in memory.
+        """
+        try:
+            return self._parse(data)
+        except ValueError:
+            self.reset()
+            raise
+
+    def _parse(self, data):
+        if self.init_segment is None:
+            if len(self._head) >= MAX_INIT_SEGMENT:
+                raise ValueError("No Cluster in the first 64 KB of the audio stream.")
+            self._head.extend(data)
+        self._pending.extend(data)
+        packets = []
+        pos = 0
+        buf = self._pending
+
+        while True:
+            if self._skip:
+                skipped = min(self._skip, len(buf) - pos)
+                self._skip -= skipped
+                pos += skipped
+                if self._skip:
+                    break
+
+            element_id = read_vint(buf, pos, keep_marker=True)
+            if element_id is None:
+                break
+            size = read_vint(buf, pos + element_id[1])
+            if size is None:
+                break
+            header_length = element_id[1] + size[1]
+
+            if element_id[0] == CLUSTER_ID:
+                offset = self._consumed + pos
+                if self.init_segment is None:
+                    self.init_segment = bytes(self._head[:offset])
+                    self._head = None
+                self.clusters.append([offset, None])
+            if element_id[0] in CONTAINER_IDS:
+                # Step into the container; its children follow directly in the stream
+                pos += header_length
+                continue
+            if is_unknown_size(*size):
+                raise ValueError(f"Unknown-size element {element_id[0]:#x} in audio stream.")
+
+            if element_id[0] in READ_IDS:
+                if size[0] > MAX_BLOCK_SIZE:
+                    raise ValueError(f"Element {element_id[0]:#x} of {size[0]} bytes in audio stream.")
+                end = pos + header_length + size[0]
+                if end > len(buf):
+                    break
+                payload = buf[pos + header_length:end]
+                if element_id[0] == TIMECODE_ID:
+                    if self.clusters:
+                        self.clusters[-1][1] = read_uint(payload)
+                else:
+                    block_end = self._consumed + end
+                    packets.extend((frame, block_end) for frame in block_frames(payload))
+                pos = end
+            else:
+                pos += header_length
+                self._skip = size[0]
+
+        del buf[:pos]
+        self._consumed += pos
+        if self.init_segment is None and len(self._head) > MAX_INIT_SEGMENT:
+            raise ValueError("No Cluster in the first 64 KB of the audio stream.")
+        return packets
+
+    def cluster_at(self, offset):
+        """The [offset, timecode] of the indexed Cluster containing stream `offset`, if any."""
+        for cluster in reversed(self.clusters):
+            if cluster[0] <= offset:
+                return cluster
+        return None
+
+    def header_for(self, offset):
+        """The bytes that make the stream from `offset` on a standalone WebM file."""
+        if self.init_segment is None or offset <= len(self.init_segment):
+            return b""  # The stream from here still carries its own header
+        cluster = self.cluster_at(offset)
+        if cluster is None or cluster[0] == offset or cluster[1] is None:
+            return self.init_segment
+        return self.init_segment + cluster_header(cluster[1])
+
+    def resume(self, chunk, chunk_start, block_ends):
+        """A standalone stream continuing from `chunk`, which was just fed at stream offset `chunk_start`.
+
+        `block_ends` are the block end offsets feed_with_offsets returned for the
+        chunk. The stream starts at the first one, since a chunk may begin in the
+        middle of a block but every block after it is complete: the result is
+        header_for(offset) plus the chunk's bytes from there on, or None if no
+        block ends in the chunk.
+        """
+        if chunk_start == 0:
+            return bytes(chunk)  # The start of the stream, header included
+        if not block_ends:
+            return None
+        offset = block_ends[0]
+        return self.header_for(offset) + bytes(chunk[offset - chunk_start:])
+
+    def reset(self):
+        self._pending.clear()
+        self._skip = 0
+        self._consumed = 0
+        self._head = bytearray()
+        self.init_segment = None
+        self.clusters.clear()
+
+
+class UtteranceBuffer:
+    """Capture buffer that cuts a session's WebM stream into standalone utterances.
+
+    The buffer holds a header prefix (see WebMDemuxer.header_for) followed by the
+    stream bytes from `start` on.
+    """
+
+    def __init__(self, demuxer):
+        self.demuxer = demuxer
+        self.buffer = bytearray()
+        self.start = 0  # Stream offset of the first stream byte after the prefix
+        self.prefix_length = 0
+
+    def __len__(self):
+        """Bytes held in memory, header prefix included."""
+        return len(self.buffer)
+
+    @property
+    def audio_bytes(self):
+        """Stream bytes captured since the last cut."""
+        return len(self.buffer) - self.prefix_length
+
+    def feed(self, data):
+        """Appends the next chunk of the stream; returns its (packet, block end offset) pairs."""
+        self.buffer.extend(data)
+        return self.demuxer.feed_with_offsets(data)
+
+    def cut(self, offset=None):
+        """Ends the current utterance at stream `offset` (default: everything fed so far).
+
+        Returns it as a memoryview over the old buffer, which is never written to
+        again; the bytes after `offset` start the next utterance.
+        """
+        if offset is None:
+            offset = self.demuxer.position
+        index = self.prefix_length + max(0, offset - self.start)
+        utterance = self.buffer
+        header = self.demuxer.header_for(offset)
+        self.buffer = bytearray(header)
+        with memoryview(utterance) as view:
+            self.buffer.extend(view[index:])
+        del utterance[index:]
+        self.start = offset
+        self.prefix_length = len(header)
+        return memoryview(utterance)
+
+    def discard(self, offset=None):
+        """Drops the captured audio up to `offset` (default: all of it)."""
+        self.cut(offset)
+
+    def trim(self, max_bytes):
+        """Drops the oldest whole Clusters (keeping the header) to get under `max_bytes`."""
+        init_length = self.demuxer.init_segment_length or 0
+        keep = min(init_length, self.prefix_length) if self.prefix_length else max(0, init_length - self.start)
+        for offset, _ in self.demuxer.clusters:
+            index = self.prefix_length + (offset - self.start)
+            if offset > self.start and index > keep and len(self.buffer) - (index - keep) <= max_bytes:
+                print(f"Audio buffer full; dropping the oldest {index - keep} bytes.")
+                del self.buffer[keep:index]
+                self.start = offset
+                self.prefix_length = keep
+                return True
+        return False
+
+    def reset(self):
+        self.demuxer.reset()
+        self.buffer = bytearray()
+        self.start = 0
+        self.prefix_length = 0
@@ -0,0 +1,129 @@
+# backend/translator/workers.py
+"""Background translation workers on the channel layer.
+
+With TRANSLATION_WORKERS_ENABLED, WebSocket consumers no longer run STT,
+translation and TTS in their own event loop. Each finalized utterance is sent
+to TRANSLATION_WORKER_CHANNEL, picked up by one of the worker processes
+
+    python manage.py runworker translation-worker
+
+and its output is relayed back, message by message, to the consumer's own
+channel name. Socket handling and API orchestration then scale separately, on
+as many processes or nodes as the shared (Redis) channel layer reaches.
+"""
+import asyncio
+import json
+
+from channels.consumer import AsyncConsumer
+from django.conf import settings
+
+from . import metrics
+from .processing import UtteranceProcessor
+from .providers import get_providers
+from .readiness import readiness
+from .scheduler import Ticket, use_ticket
+from .voices import voice_catalog
+
+
+def utterance_message(session_id, seq, reply_channel, processor, ticket, audio=None, text=None):
+    """The channel-layer message asking a worker to process one utterance."""
+    return {
+        'type': 'utterance.process',
+        'session': session_id,
+        'seq': seq,
+        'reply_channel': reply_channel,
+        'target_lang': processor.target_lang,
+        'audio_transport': processor.audio_transport,
+        'incremental': processor.incremental,
+        'source_lang': processor.source_lang,
+        'text_only': processor.text_only,
+        'audio_profile': processor.audio_profile.name,
+        # Scheduling: the worker's own scheduler serves it like a local utterance
+        'user': ticket.user_id,
+        'priority': ticket.priority,
+        'deadline': ticket.deadline,
+        'audio': audio,  # Finalized utterance audio, or
+        'text': text,    # an already transcribed (streaming STT) utterance
+    }
+
+
+class RemoteJob:
+    """Worker-side stand-in for an UtteranceJob that relays its output to the consumer."""
+
+    def __init__(self, channel_layer, reply_channel, seq):
+        self.channel_layer = channel_layer
+        self.reply_channel = reply_channel
+        self.seq = seq
+
+    async def send(self, text_data=None, bytes_data=None):
+        await self.channel_layer.send(self.reply_channel, {
+            'type': 'utterance.output',
+            'seq': self.seq,
+            'text': text_data,
+            'bytes': bytes_data,
+        })
+
+    async def send_json(self, message):
+        await self.send(text_data=json.dumps({**message, 'seq': self.seq}))
+
+    async def send_error(self, message):
+        await self.send_json({'type': 'error', 'message': message})
+
+    async def audio_sent(self, audio_id, size, profile):
+        await self.channel_layer.send(self.reply_channel, {
+            'type': 'utterance.audio',
+            'seq': self.seq,
+            'audio_id': audio_id,
+            'size': size,
+            'profile': profile,
+        })
+
+
+class TranslationWorkerConsumer(AsyncConsumer):
+    """Processes utterances sent to the worker channel, several at a time."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Messages are dispatched one after another, so each utterance runs in its own
+        # task; once all slots are busy we stop receiving and leave work to other workers
+        self.slots = asyncio.Semaphore(settings.TRANSLATION_WORKER_CONCURRENCY)
+        self.tasks = set()
+
+    async def utterance_process(self, message):
+        readiness.ensure_ready()
+        voice_catalog.ensure_fresh()
+        await self.slots.acquire()
+        task = asyncio.create_task(self.run(message))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def run(self, message):
+        job = RemoteJob(self.channel_layer, message['reply_channel'], message['seq'])
+        processor = UtteranceProcessor(
+            get_providers(),
+            target_lang=message['target_lang'],
+            audio_transport=message['audio_transport'],
+            incremental=message['incremental'],
+            source_lang=message['source_lang'],
+            text_only=message['text_only'],
+            audio_profile=message['audio_profile'],
+        )
+        ok = False
+        try:
+            ticket = Ticket(message['user'], message['priority'], message['deadline'])
+            with metrics.utterance_trace(message['session'], message['seq']), use_ticket(ticket):
+                if message['audio'] is not None:
+                    ok = await processor.process_audio(job, message['audio'])
+                else:
+                    ok = await processor.translate_and_speak(job, message['text'])
+        except Exception as e:
+            print(f"Worker failed on utterance #{message['seq']} of session {message['session']}: {e}")
+        finally:
+            self.slots.release()
+            try:
+                await self.channel_layer.send(message['reply_channel'], {
+                    'type': 'utterance.done', 'seq': message['seq'], 'ok': ok,
+                    'detected_lang': processor.detected_lang,
+                })
+            except Exception as e:
+                print(f"Could not report utterance #{message['seq']} as done: {e}")
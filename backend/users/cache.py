@@ -0,0 +1,127 @@
+# cache.py
+"""Users by email, shared by signup and WebSocket auth.
+
+A login burst (say, after a marketing push) used to cost one query per
+reconnect, plus several per repeat signup. Users are now cached per email in a
+short-lived in-process LRU, with an optional shared tier (any Django cache
+alias) so all workers benefit. Concurrent misses for the same email wait on a
+single query. Entries are dropped whenever the row changes: a payment, or trial
+usage written by the usage flusher.
+"""
+import asyncio
+import copy
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from translator.cache import TTLCache
+from .models import User
+
+class UserCache:
+    def __init__(self, max_entries=10000, ttl=60, shared_alias=None):
+        self.local = TTLCache(max_entries=max_entries, ttl=ttl)
+        self.ttl = ttl
+        self.shared = caches[shared_alias] if shared_alias else None
+        self._emails = TTLCache(max_entries=max_entries, ttl=ttl)  # user id -> email
+        self._loads = {}  # (loop, email) -> task loading that user
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.joined = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(email):
+        return f"femseek:user:{hashlib.sha256(email.encode('utf-8')).hexdigest()}"
+
+    async def get(self, email, load=True):
+        """Returns a private copy of the user with `email`, or None if there isn't one.
+
+        With load=False a cache miss returns None instead of querying the database.
+        """
+        key = self.make_key(email)
+        user = self.local.get(key)
+        if user is not None:
+            self.hits += 1
+            return copy.copy(user)
+        if self.shared is not None:
+            try:
+                user = await self.shared.aget(key)
+            except Exception as e:
+                print(f"Shared user cache read failed: {e}")
+            if user is not None:
+                self.shared_hits += 1
+                self._remember(key, user)
+                return copy.copy(user)
+        if not load:
+            self.misses += 1
+            return None
+
+        lookup_key = (asyncio.get_running_loop(), email)
+        lookup = self._loads.get(lookup_key)
+        if lookup is None:
+            self.misses += 1
+            lookup = self._loads[lookup_key] = asyncio.ensure_future(self._load(email))
+            lookup.add_done_callback(lambda _: self._loads.pop(lookup_key, None))
+        else:
+            self.joined += 1
+        user = await asyncio.shield(lookup)
+        return copy.copy(user) if user is not None else None
+
+    async def _load(self, email):
+        try:
+            user = await User.objects.aget(email=email)
+        except User.DoesNotExist:
+            return None
+        await self.set(user)
+        return user
+
+    def _remember(self, key, user):
+        self.local.set(key, copy.copy(user))
+        self._emails.set(user.pk, user.email)
+
+    async def set(self, user):
+        key = self.make_key(user.email)
+        self._remember(key, user)
+        if self.shared is not None:
+            try:
+                await self.shared.aset(key, user, timeout=self.ttl)
+            except Exception as e:
+                print(f"Shared user cache write failed: {e}")
+
+    async def invalidate(self, user):
+        """Drops `user` after its row changed."""
+        await self._invalidate_email(user.email)
+
+    async def invalidate_ids(self, user_ids):
+        for user_id in user_ids:
+            email = self._emails.get(user_id)
+            if email is not None:
+                await self._invalidate_email(email)
+
+    async def _invalidate_email(self, email):
+        key = self.make_key(email)
+        self.local.delete(key)
+        self.invalidations += 1
+        if self.shared is not None:
+            try:
+                await self.shared.adelete(key)
+            except Exception as e:
+                print(f"Shared user cache delete failed: {e}")
+
+    def stats(self):
+        return {
+            'entries': len(self.local),
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'joined': self.joined,
+            'invalidations': self.invalidations,
+        }
+
+user_cache = UserCache(
+    max_entries=settings.USER_CACHE_MAX_ENTRIES,
+    ttl=settings.USER_CACHE_TTL,
+    shared_alias=settings.USER_CACHE_SHARED_ALIAS,
+)
@@ -1,8 +1,44 @@
-from django.db import models
+from django.db import connections, models
 from django.utils import timezone
 import datetime
 
+class UserManager(models.Manager):
+    def _signup_query(self, name, email, usage_purpose):
+        # INSERT ... ON CONFLICT (email) DO UPDATE ... RETURNING (PostgreSQL, SQLite 3.35+):
+        # the no-op update makes the conflicting row come back, and only a freshly
+        # inserted row carries the created_at we just sent
+        user = self.model(name=name, email=email, usage_purpose=usage_purpose)
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        fields = [field for field in self.model._meta.concrete_fields if not field.primary_key]
+        values = [field.get_db_prep_save(field.pre_save(user, add=True), connection) for field in fields]
+        created_at = self.model._meta.get_field('created_at')
+        table = quote(self.model._meta.db_table)
+        sql = (
+            f"INSERT INTO {table} ({', '.join(quote(field.column) for field in fields)}) "
+            f"VALUES ({', '.join(['%s'] * len(fields))}) "
+            f"ON CONFLICT ({quote('email')}) DO UPDATE SET {quote('email')} = EXCLUDED.{quote('email')} "
+            f"RETURNING *, ({quote(created_at.column)} = %s) AS signup_created"
+        )
+        return self.raw(sql, values + [values[fields.index(created_at)]])
+
+    def signup(self, name, email, usage_purpose):
+        """Creates the user or fetches the existing one with that email, in one query.
+
+        Returns (user, created).
+        """
+        user = next(iter(self._signup_query(name, email, usage_purpose)))
+        return user, bool(user.signup_created)
+
+    async def asignup(self, name, email, usage_purpose):
+        async for user in self._signup_query(name, email, usage_purpose):
+            return user, bool(user.signup_created)
+
 class User(models.Model):
+    # Trial expires after 14 days or 3 sessions
+    TRIAL_DURATION = datetime.timedelta(days=14)
+    TRIAL_SESSIONS = 3
+
     name = models.CharField(max_length=255)
     email = models.EmailField(unique=True)
     usage_purpose = models.CharField(max_length=500)
@@ -13,13 +49,14 @@ class User(models.Model):
     trial_sessions_count = models.IntegerField(default=0)
     is_subscribed = models.BooleanField(default=False)
 
+    objects = UserManager()
+
     def is_trial_active(self):
-        # Trial expires after 14 days or 3 sessions
         if self.is_subscribed:
             return True # Subscribed users always have active access
         
-        is_within_14_days = timezone.now() < self.trial_start_date + datetime.timedelta(days=14)
-        has_sessions_left = self.trial_sessions_count < 3
+        is_within_14_days = timezone.now() < self.trial_start_date + self.TRIAL_DURATION
+        has_sessions_left = self.trial_sessions_count < self.TRIAL_SESSIONS
         
         return is_within_14_days and has_sessions_left
 
@@ -1 +1,11 @@
+# serializers.py
+from rest_framework import serializers
+from .models import User
 
+class UserSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ['name', 'email', 'usage_purpose']
+        # Uniqueness is enforced by the signup upsert; the default validator would
+        # cost an extra query per signup
+        extra_kwargs = {'email': {'validators': []}}
@@ -0,0 +1,72 @@
+# backend/users/tests.py
+import asyncio
+import json
+
+from django.test import AsyncClient, TestCase, override_settings
+
+from .cache import UserCache, user_cache
+from .models import User
+
+
+class SignupUpsertTests(TestCase):
+    def test_signup_creates_then_returns_the_existing_user(self):
+        user, created = User.objects.signup("Amina", "amina@example.com", "travel")
+        self.assertTrue(created)
+        again, created = User.objects.signup("Someone else", "amina@example.com", "work")
+        self.assertFalse(created)
+        self.assertEqual(again.pk, user.pk)
+        # The existing row is returned unchanged
+        self.assertEqual((again.name, again.usage_purpose), ("Amina", "travel"))
+        self.assertEqual(User.objects.count(), 1)
+
+    async def test_async_signup(self):
+        user, created = await User.objects.asignup("Juma", "juma@example.com", "school")
+        self.assertTrue(created)
+        self.assertEqual(user.trial_sessions_count, 0)
+        again, created = await User.objects.asignup("Juma", "juma@example.com", "school")
+        self.assertFalse(created)
+        self.assertEqual(again.pk, user.pk)
+
+
+@override_settings(ALLOWED_HOSTS=['testserver'])
+class SignupViewTests(TestCase):
+    def setUp(self):
+        user_cache.local.clear()
+
+    async def signup(self, client, email):
+        body = json.dumps({'name': "Wanjiru", 'email': email, 'usage_purpose': "family"})
+        return await client.post('/users/signup/', body, content_type='application/json')
+
+    async def test_repeat_signup_is_answered_from_the_cache(self):
+        client = AsyncClient()
+        response = await self.signup(client, "wanjiru@example.com")
+        self.assertEqual(response.status_code, 201)
+        hits = user_cache.hits
+        response = await self.signup(client, "wanjiru@example.com")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['email'], "wanjiru@example.com")
+        self.assertEqual(user_cache.hits, hits + 1)
+
+    async def test_invalid_body(self):
+        response = await AsyncClient().post('/users/signup/', 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class UserCacheTests(TestCase):
+    async def test_concurrent_misses_share_one_query(self):
+        await User.objects.acreate(name="Baraka", email="baraka@example.com", usage_purpose="work")
+        cache = UserCache()
+        users = await asyncio.gather(*(cache.get("baraka@example.com") for _ in range(5)))
+        self.assertEqual({user.email for user in users}, {"baraka@example.com"})
+        self.assertEqual((cache.misses, cache.joined), (1, 4))
+        # Callers get private copies
+        users[0].name = "Changed"
+        self.assertEqual((await cache.get("baraka@example.com")).name, "Baraka")
+
+    async def test_invalidated_ids_are_reloaded(self):
+        user = await User.objects.acreate(name="Neema", email="neema@example.com", usage_purpose="travel")
+        cache = UserCache()
+        await cache.get("neema@example.com")
+        await User.objects.filter(pk=user.pk).aupdate(trial_sessions_count=2)
+        await cache.invalidate_ids([user.pk])
+        self.assertEqual((await cache.get("neema@example.com")).trial_sessions_count, 2)
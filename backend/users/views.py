@@ -1,35 +1,33 @@
 # views.py
-from rest_framework import status
-from rest_framework.response import Response
-from rest_framework.views import APIView
-from .models import User
-from .serializers import UserSerializer
+import json
 
-class UserSignupView(APIView):
-    def post(self, request):
-        serializer = UserSerializer(data=request.data)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
-        # Handle case where user already exists but re-submits
-        if 'email' in serializer.errors and 'already exists' in str(serializer.errors['email']):
-            user = User.objects.get(email=request.data['email'])
-            return Response(UserSerializer(user).data, status=status.HTTP_200_OK)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 
-# serializers.py
-from rest_framework import serializers
+from .cache import user_cache
 from .models import User
+from .serializers import UserSerializer
 
-class UserSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = User
-        fields = ['name', 'email', 'usage_purpose']
+@csrf_exempt
+@require_POST
+async def signup(request):
+    """Creates the user, or returns the existing one when the email is already signed up.
 
-# urls.py
-from django.urls import path
-from .views import UserSignupView
+    A repeat signup is answered from the user cache; otherwise it costs a single
+    upsert query. Either way the user is cached for the WebSocket auth that follows.
+    """
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'message': 'Invalid JSON.'}, status=400)
+    serializer = UserSerializer(data=data)
+    if not serializer.is_valid():
+        return JsonResponse(serializer.errors, status=400)
 
-urlpatterns = [
-    path('signup/', UserSignupView.as_view(), name='signup'),
-]
+    user = await user_cache.get(serializer.validated_data['email'], load=False)
+    created = False
+    if user is None:
+        user, created = await User.objects.asignup(**serializer.validated_data)
+        await user_cache.set(user)
+    return JsonResponse(UserSerializer(user).data, status=201 if created else 200)
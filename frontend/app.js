@@ -8,12 +8,18 @@ document.addEventListener('DOMContentLoaded', () => {
     const API_BASE_URL = 'https://your-render-backend-url.onrender.com'; // TO BE REPLACED
     const WEBSOCKET_URL = 'wss://your-render-backend-url.onrender.com/ws/translate/'; // TO BE REPLACED
     const PAYSTACK_PUBLIC_KEY = 'pk_test_xxxxxxxxxxxxxxxxxxxxxxxxxxxx'; // Load from your .env and replace
+    const AUDIO_EXTENSIONS = { 'audio/mpeg': 'mp3', 'audio/ogg': 'ogg', 'audio/wav': 'wav' };
 
     // --- Global State & DOM Elements ---
     let mediaRecorder;
     let websocket;
     let userEmail;
-    let translatedAudioBlob;
+    let translatedAudioBlobs = []; // The latest translation's audio: one blob, or one per clause
+    let incomingAudio = null; // Translated audio currently arriving as binary frames
+    let segmentBlobs = []; // Audio of the clauses received so far for the current utterance
+    let audioMimeType = 'audio/mpeg'; // Format of the latest translated audio (the backend may switch profiles)
+    const playbackQueue = []; // Audio elements waiting for the previous one to finish
+    let nowPlaying = null;
 
     const welcomeScreen = document.getElementById('welcome-screen');
     const authScreen = document.getElementById('auth-screen');
@@ -81,6 +87,7 @@ document.addEventListener('DOMContentLoaded', () => {
             websocket.close(); // Close existing connection if any
         }
         websocket = new WebSocket(WEBSOCKET_URL);
+        websocket.binaryType = 'arraybuffer'; // Translated audio arrives as raw binary frames
 
         // 1. Connection Opened: Authenticate the user and set the target language.
         websocket.onopen = () => {
@@ -88,7 +95,11 @@ document.addEventListener('DOMContentLoaded', () => {
             websocket.send(JSON.stringify({
                 type: 'auth',
                 email: userEmail,
-                target_lang: targetLanguageSelect.value
+                target_lang: targetLanguageSelect.value,
+                audio_transport: 'binary',
+                incremental: true,
+                accept_codecs: playableCodecs(),
+                audio_profile: 'auto' // The backend picks the best profile the connection can keep up with
             }));
             // Only start mediaRecorder after successful auth with backend
             // The backend consumer logic for auth might take a moment,
@@ -102,6 +113,10 @@ document.addEventListener('DOMContentLoaded', () => {
 
         // 4. Message Received: Handle incoming data from the backend.
         websocket.onmessage = (event) => {
+            if (event.data instanceof ArrayBuffer) {
+                handleAudioFrame(event.data);
+                return;
+            }
             const data = JSON.parse(event.data);
             handleWebSocketMessage(data);
         };
@@ -156,24 +171,72 @@ document.addEventListener('DOMContentLoaded', () => {
         };
     };
 
+    // TTS codecs this browser can play, for the backend to choose from; MP3 always works
+    const playableCodecs = () => {
+        const probe = new Audio();
+        const codecs = ['MP3'];
+        if (probe.canPlayType('audio/ogg; codecs=opus')) codecs.unshift('OGG_OPUS');
+        return codecs;
+    };
+
+    // Tells the backend a translation's audio fully arrived, so it can estimate the link's bandwidth
+    const acknowledgeAudio = (audioId) => {
+        if (audioId !== undefined && websocket && websocket.readyState === WebSocket.OPEN) {
+            websocket.send(JSON.stringify({ type: 'audio_ack', audio_id: audioId }));
+        }
+    };
+
+    const decodeAudio = (data) => {
+        acknowledgeAudio(data.audio_id);
+        audioMimeType = data.mime_type || 'audio/mpeg';
+        const audioBytes = Uint8Array.from(atob(data.audio), (c) => c.charCodeAt(0)); // Decode base64 audio
+        return new Blob([audioBytes], { type: audioMimeType });
+    };
+
     const handleWebSocketMessage = (data) => {
         // This function acts as a router for messages from the backend
         switch (data.type) {
+            case 'ping': // Round-trip time probe for the audio profile choice
+                websocket.send(JSON.stringify({ type: 'pong', id: data.id }));
+                break;
             case 'transcription_update': // Real-time transcription
                 inputArea.textContent = data.text;
                 break;
             case 'translation_result': // Final translated text and audio
                 outputArea.textContent = data.text;
-                const audioData = atob(data.audio); // Decode base64 audio
-                const audioBytes = new Uint8Array(audioData.length);
-                for (let i = 0; i < audioData.length; i++) {
-                    audioBytes[i] = audioData.charCodeAt(i);
+                if (data.text_only) {
+                    break;
+                }
+                if (data.audio === undefined) {
+                    // Binary transport: raw audio frames follow this header
+                    startAudioStream(data);
+                    break;
                 }
-                translatedAudioBlob = new Blob([audioBytes], { type: 'audio/mpeg' });
-                const audio = new Audio(URL.createObjectURL(translatedAudioBlob));
-                audio.play();
+                translatedAudioBlobs = [decodeAudio(data)];
+                playAudio(new Audio(URL.createObjectURL(translatedAudioBlobs[0])));
                 downloadBtn.disabled = false;
                 break;
+            case 'translation_segment': // One translated clause of a longer utterance
+                if (data.segment === 0) {
+                    outputArea.textContent = '';
+                    segmentBlobs = [];
+                }
+                outputArea.textContent = `${outputArea.textContent} ${data.text}`.trim();
+                if (data.audio === undefined) {
+                    startAudioStream(data);
+                } else {
+                    const segmentBlob = decodeAudio(data);
+                    segmentBlobs.push(segmentBlob);
+                    playAudio(new Audio(URL.createObjectURL(segmentBlob)));
+                }
+                break;
+            case 'utterance_complete': // All clauses of the utterance have been sent
+                outputArea.textContent = data.text;
+                assembleUtteranceAudio(segmentBlobs).then((blobs) => {
+                    translatedAudioBlobs = blobs;
+                    downloadBtn.disabled = false;
+                });
+                break;
             case 'payment_required': // Trial has expired
                 if (mediaRecorder && mediaRecorder.state === 'recording') {
                     mediaRecorder.stop();
@@ -188,6 +251,21 @@ document.addEventListener('DOMContentLoaded', () => {
                     mediaRecorder.stop();
                 }
                 break;
+            case 'utterance_dropped': // Backend was too far behind and skipped an utterance
+                console.warn(`Utterance #${data.seq} was dropped (${data.reason}).`);
+                break;
+            case 'queued': // Server is busy; the session starts once a slot frees up
+                inputArea.textContent = data.message;
+                break;
+            case 'server_busy': // No slot freed up in time; the backend closes the connection
+                if (mediaRecorder && mediaRecorder.state === 'recording') {
+                    mediaRecorder.stop();
+                }
+                alert(data.message);
+                break;
+            case 'payment_success': // Subscription is active (verified here or via the Paystack webhook)
+                console.log(data.message);
+                break;
             case 'auth_success': // Optional: Backend sends success after auth
                 console.log('Authentication successful with backend.');
                 // You could perform actions here if needed
@@ -195,19 +273,147 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     };
 
+    // --- Binary Audio Playback ---
+    // Frames are appended to a MediaSource as they arrive so playback starts before the
+    // last byte; browsers without MediaSource support for the format play the full blob.
+    const startAudioStream = (header) => {
+        const stream = { header, frames: [], received: 0, pending: [], sourceBuffer: null, mediaSource: null };
+        incomingAudio = stream;
+        downloadBtn.disabled = true;
+
+        if (window.MediaSource && MediaSource.isTypeSupported(header.mime_type)) {
+            stream.mediaSource = new MediaSource();
+            const audio = new Audio(URL.createObjectURL(stream.mediaSource));
+            stream.mediaSource.addEventListener('sourceopen', () => {
+                stream.sourceBuffer = stream.mediaSource.addSourceBuffer(header.mime_type);
+                stream.sourceBuffer.addEventListener('updateend', () => pumpAudioStream(stream));
+                pumpAudioStream(stream);
+            });
+            playAudio(audio);
+        }
+        if (header.length === 0) {
+            finishAudioStream(stream);
+        }
+    };
+
+    const pumpAudioStream = (stream) => {
+        const { sourceBuffer, mediaSource } = stream;
+        if (!sourceBuffer || sourceBuffer.updating) return;
+        if (stream.pending.length > 0) {
+            sourceBuffer.appendBuffer(stream.pending.shift());
+        } else if (stream.received >= stream.header.length && mediaSource.readyState === 'open') {
+            mediaSource.endOfStream();
+        }
+    };
+
+    const handleAudioFrame = (frame) => {
+        const stream = incomingAudio;
+        if (!stream) return;
+        stream.frames.push(frame);
+        stream.pending.push(frame);
+        stream.received += frame.byteLength;
+        pumpAudioStream(stream);
+        if (stream.received >= stream.header.length) {
+            finishAudioStream(stream);
+        }
+    };
+
+    const finishAudioStream = (stream) => {
+        incomingAudio = null;
+        acknowledgeAudio(stream.header.audio_id);
+        audioMimeType = stream.header.mime_type;
+        const blob = new Blob(stream.frames, { type: audioMimeType });
+        if (!stream.mediaSource) {
+            playAudio(new Audio(URL.createObjectURL(blob)));
+        }
+        if (stream.header.type === 'translation_segment') {
+            segmentBlobs.push(blob); // The download is assembled on utterance_complete
+            return;
+        }
+        translatedAudioBlobs = [blob];
+        downloadBtn.disabled = false;
+    };
+
+    // Compressed clauses can't simply be concatenated into one playable file, so they are
+    // downloaded one file per clause; PCM clauses are rebuilt into a single WAV file.
+    const assembleUtteranceAudio = async (blobs) => {
+        if (blobs.length < 2 || !blobs.every((blob) => blob.type === 'audio/wav')) {
+            return blobs;
+        }
+        const clauses = await Promise.all(blobs.map(async (blob) => parseWav(await blob.arrayBuffer())));
+        if (clauses.some((clause) => !clause || clause.format.byteLength !== clauses[0].format.byteLength)) {
+            return blobs;
+        }
+        const format = new Uint8Array(clauses[0].format);
+        if (!clauses.every((clause) => new Uint8Array(clause.format).every((byte, i) => byte === format[i]))) {
+            return blobs; // Different sample rates: the profile changed mid-utterance
+        }
+        const dataLength = clauses.reduce((total, clause) => total + clause.samples.byteLength, 0);
+        const header = new DataView(new ArrayBuffer(20));
+        const writeTag = (view, offset, tag) => [...tag].forEach((c, i) => view.setUint8(offset + i, c.charCodeAt(0)));
+        writeTag(header, 0, 'RIFF');
+        header.setUint32(4, 4 + 8 + format.byteLength + 8 + dataLength, true);
+        writeTag(header, 8, 'WAVE');
+        writeTag(header, 12, 'fmt ');
+        header.setUint32(16, format.byteLength, true);
+        const dataHeader = new DataView(new ArrayBuffer(8));
+        writeTag(dataHeader, 0, 'data');
+        dataHeader.setUint32(4, dataLength, true);
+        const parts = [header, format, dataHeader, ...clauses.map((clause) => clause.samples)];
+        return [new Blob(parts, { type: 'audio/wav' })];
+    };
+
+    // The 'fmt ' and 'data' chunks of a RIFF/WAVE file, or null if it isn't one
+    const parseWav = (buffer) => {
+        const view = new DataView(buffer);
+        const tag = (offset) => String.fromCharCode(...new Uint8Array(buffer, offset, 4));
+        if (buffer.byteLength < 12 || tag(0) !== 'RIFF' || tag(8) !== 'WAVE') return null;
+        let format = null;
+        for (let offset = 12; offset + 8 <= buffer.byteLength; ) {
+            const size = view.getUint32(offset + 4, true);
+            const body = offset + 8;
+            if (tag(offset) === 'fmt ') {
+                format = buffer.slice(body, body + size);
+            } else if (tag(offset) === 'data') {
+                return format && { format, samples: buffer.slice(body, Math.min(body + size, buffer.byteLength)) };
+            }
+            offset = body + size + (size % 2); // Chunks are padded to an even length
+        }
+        return null;
+    };
+
+    // Plays translations one after another instead of talking over each other
+    const playAudio = (audio) => {
+        if (nowPlaying) {
+            playbackQueue.push(audio);
+            return;
+        }
+        nowPlaying = audio;
+        const playNext = () => {
+            nowPlaying = null;
+            if (playbackQueue.length > 0) playAudio(playbackQueue.shift());
+        };
+        audio.addEventListener('ended', playNext, { once: true });
+        audio.addEventListener('error', playNext, { once: true });
+        audio.play().catch(playNext);
+    };
+
     // --- Download & Payment ---
     downloadBtn.addEventListener('click', () => {
-        if (!translatedAudioBlob) return;
+        if (translatedAudioBlobs.length === 0) return;
         const filenameInput = document.getElementById('audio-filename');
         const filename = filenameInput.value.trim() || `femseek-translation-${Date.now()}`;
         
-        const url = URL.createObjectURL(translatedAudioBlob);
-        const a = document.createElement('a');
-        a.href = url;
-        a.download = `${filename}.mp3`;
-        document.body.appendChild(a);
-        a.click();
-        window.URL.revokeObjectURL(url);
+        translatedAudioBlobs.forEach((blob, i) => {
+            const url = URL.createObjectURL(blob);
+            const a = document.createElement('a');
+            a.href = url;
+            const name = translatedAudioBlobs.length > 1 ? `${filename}-${i + 1}` : filename;
+            a.download = `${name}.${AUDIO_EXTENSIONS[blob.type.split(';')[0]] || 'mp3'}`;
+            document.body.appendChild(a);
+            a.click();
+            window.URL.revokeObjectURL(url);
+        });
     });
 
     const triggerPaystackPopup = () => {